@@ -1,9 +1,18 @@
 import sys
 import unittest
+from pathlib import Path
 
+import click
+from flask import current_app
 from flask.cli import FlaskGroup
 
+from openfuelservice.benchmark.fixtures import load_fixtures
+from openfuelservice.benchmark.micro import micro_benchmarks, run_micro_benchmarks, format_micro_report
+from openfuelservice.benchmark.replay import AppTarget, HttpTarget, run_benchmark, format_report, write_report
 from openfuelservice.server import create_app, temp_folder, ofs_settings
+from openfuelservice.server.base_calculations.data_provider import write_reference_snapshot, reference_snapshot_file, \
+    serving_bundle_file
+from openfuelservice.server.config import BenchmarkConfig
 from openfuelservice.server.db_import import parser
 from openfuelservice.server.db_import.models import *
 from openfuelservice.server.drivers.carfueldata_driver import LatestCars
@@ -14,6 +23,7 @@ from openfuelservice.server.drivers.misc_driver import EnvirocarWikiMatcher, Car
 from openfuelservice.server.drivers.wikipedia_driver import get_wikipedia_car_data, ProcessWikipediaCarTexts
 from openfuelservice.server.statistics.misc_statistics import EnvirocarAverageCategoryStatistics, \
     CFDAverageCategoryStatistics
+from openfuelservice.server.utils.database.catalogue import build_catalogue
 from openfuelservice.server.utils.database.database_tools import DBSetup, clear_tables
 from openfuelservice.server.utils.database.queries import get_relevevant_brands
 from openfuelservice.server.utils.matching.tf.create_models import ManufacturerANNModelCollection
@@ -23,6 +33,8 @@ from openfuelservice.server.utils.misc import file_management
 app = create_app()
 cli = FlaskGroup(create_app=create_app)
 server_mode = ofs_settings['general']['server_mode']
+benchmark_settings = ofs_settings.get('benchmark', dict())
+micro_settings = benchmark_settings.get('micro', dict())
 
 
 @cli.command()
@@ -111,6 +123,80 @@ def match_data():
     cfd_ev_statistics = CFDAverageCategoryStatistics().calculate()
     parser.parse_misc(cfd_av_category_stats=cfd_ev_statistics)
 
+    # Serialize the brands, cars and categories of the matched data
+    parser.parse_catalogue(catalogue=build_catalogue())
+    parser.update_reference_snapshot()
+
+
+@cli.command()
+def import_catalogue():
+    """Builds the serialized responses of the brands, cars and categories requests"""
+    parser.parse_catalogue(catalogue=build_catalogue())
+    parser.update_reference_snapshot()
+
+
+@cli.command()
+def write_snapshot():
+    """Writes the reference snapshot the workers map with the 'snapshot' data backend"""
+    write_reference_snapshot()
+    print('Reference snapshot written to {}'.format(reference_snapshot_file))
+
+
+@cli.command()
+@click.option('--path', default=None, help='Path of the bundle. The serving_bundle_file setting if not set')
+def export_bundle(path):
+    """Exports everything the api reads into one file for nodes with the 'bundle' data backend"""
+    path = Path(path) if path is not None else serving_bundle_file
+    write_reference_snapshot(path=path)
+    print('Serving bundle written to {}'.format(path))
+
+
+@cli.command()
+@click.option('--routes', default=benchmark_settings.get('routes', 200), help='Number of measured route requests')
+@click.option('--concurrency', default=benchmark_settings.get('concurrency', 4), help='Number of concurrent clients')
+@click.option('--warmup', default=benchmark_settings.get('warmup', 10), help='Route requests before the measurement')
+@click.option('--seed', default=benchmark_settings.get('seed', 42), help='Seed of the fixture data and the routes')
+@click.option('--url', default=None, help='Base url of a running server. The app of this process is used if not set')
+@click.option('--report', default=None, help='Path of the json report')
+@click.option('--skip-fixtures', is_flag=True, help='Keep the data of the benchmark database')
+def benchmark(routes, concurrency, warmup, seed, url, report, skip_fixtures):
+    """Replays synthetic cross-border routes and reports throughput, latencies and sql statements.
+    Run with APP_SETTINGS=openfuelservice.server.config.BenchmarkConfig."""
+    if current_app.config['SQLALCHEMY_DATABASE_URI'] != BenchmarkConfig.SQLALCHEMY_DATABASE_URI:
+        print("The benchmark only runs against the benchmark database. "
+              "Set APP_SETTINGS=openfuelservice.server.config.BenchmarkConfig")
+        return 1
+    if not skip_fixtures:
+        load_fixtures(seed=seed)
+    target = HttpTarget(url=url) if url is not None else AppTarget(app=current_app._get_current_object())
+    benchmark_report = run_benchmark(target=target, routes=routes, concurrency=concurrency, warmup=warmup, seed=seed)
+    print(format_report(benchmark_report))
+    if report is not None:
+        write_report(benchmark_report, path=report)
+    return 0
+
+
+@cli.command()
+@click.option('--benchmark', 'benchmarks', multiple=True, type=click.Choice(micro_benchmarks),
+              help='Micro benchmark to run, can be repeated. All are run if not set')
+@click.option('--vertices', multiple=True, type=int, help='Number of route vertices, can be repeated')
+@click.option('--countries', multiple=True, type=int, help='Number of crossed countries, can be repeated')
+@click.option('--categories', multiple=True, type=int, help='Number of vehicle categories, can be repeated')
+@click.option('--repeat', default=micro_settings.get('repeat', 5), help='Timed calls per case')
+@click.option('--seed', default=benchmark_settings.get('seed', 42), help='Seed of the fixture data and the routes')
+@click.option('--report', default=None, help='Path of the json report')
+def microbenchmark(benchmarks, vertices, countries, categories, repeat, seed, report):
+    """Measures the base calculations on in memory fixture data without any database."""
+    micro_report = run_micro_benchmarks(benchmarks=list(benchmarks) or micro_benchmarks,
+                                        vertices=list(vertices) or micro_settings.get('vertices', [100, 1000]),
+                                        countries=list(countries) or micro_settings.get('countries', [1, 2]),
+                                        categories=list(categories) or micro_settings.get('categories', [1]),
+                                        repeat=repeat, seed=seed)
+    print(format_micro_report(micro_report))
+    if report is not None:
+        write_report(micro_report, path=report)
+    return 0
+
 
 @cli.command()
 def calculate_av_data():
@@ -119,6 +205,7 @@ def calculate_av_data():
     parser.parse_misc(ec_av_category_stats=ec_ev_statistics)
     cfd_ev_statistics = CFDAverageCategoryStatistics().calculate()
     parser.parse_misc(cfd_av_category_stats=cfd_ev_statistics)
+    parser.update_reference_snapshot()
 
 
 @cli.command()
@@ -149,6 +236,10 @@ def import_data():
         latest_carfueldata_cars = LatestCars().get_data()
         parser.parse_cfd(cfd_data=latest_carfueldata_cars)
 
+        # Serialize the brands, cars and categories
+        parser.parse_catalogue(catalogue=build_catalogue())
+        parser.update_reference_snapshot()
+
         # Clean the temp folder
         file_management.clean_directory(temp_folder)
     else:
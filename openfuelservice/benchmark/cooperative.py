@@ -0,0 +1,74 @@
+"""
+Replays the route corpus in one process patched by gevent like a gunicorn gevent worker, once with the blocking and
+once with the cooperative database access. The routes are split in PostGIS, so every request waits for the database.
+The monkey patching has to come before every other import, so it runs as a module and not as a manage.py command:
+
+    APP_SETTINGS=openfuelservice.server.config.BenchmarkConfig python -m openfuelservice.benchmark.cooperative
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import click
+
+from openfuelservice.benchmark.fixtures import load_fixtures
+from openfuelservice.benchmark.micro import route_splitting
+from openfuelservice.benchmark.replay import AppTarget, run_benchmark, format_report, write_report
+from openfuelservice.server import create_app, ofs_settings
+from openfuelservice.server.config import BenchmarkConfig
+from openfuelservice.server.utils.database.cooperative import set_cooperative
+
+benchmark_settings = ofs_settings.get('benchmark', dict())
+cooperative_modes = ['blocking', 'cooperative']
+
+
+def run_cooperative_benchmark(app, routes: int, concurrency: int, warmup: int, seed: int) -> dict:
+    """
+    The patched threads of the replay are greenlets, so the concurrent clients share the worker like the requests
+    of a gevent worker do.
+
+    :return: Returns the replay report of every mode and the throughput of the cooperative mode relative to the
+    blocking one
+    """
+    reports = dict()
+    target = AppTarget(app=app)
+    with route_splitting('database'):
+        for mode in cooperative_modes:
+            set_cooperative(mode == 'cooperative')
+            reports[mode] = run_benchmark(target=target, routes=routes, concurrency=concurrency, warmup=warmup,
+                                          seed=seed)
+            reports[mode]['configuration']['mode'] = mode
+    set_cooperative(False)
+    blocking, cooperative = reports['blocking']['throughput_rps'], reports['cooperative']['throughput_rps']
+    return {'modes': reports, 'speedup': round(cooperative / blocking, 2) if blocking and cooperative else None}
+
+
+@click.command()
+@click.option('--routes', default=benchmark_settings.get('routes', 200), help='Number of measured route requests')
+@click.option('--concurrency', default=20, help='Number of concurrent greenlets')
+@click.option('--warmup', default=benchmark_settings.get('warmup', 10), help='Route requests before the measurement')
+@click.option('--seed', default=benchmark_settings.get('seed', 42), help='Seed of the fixture data and the routes')
+@click.option('--report', default=None, help='Path of the json report')
+@click.option('--skip-fixtures', is_flag=True, help='Keep the data of the benchmark database')
+def cooperative_benchmark(routes, concurrency, warmup, seed, report, skip_fixtures):
+    """Compares the route throughput of a gevent worker with blocking and cooperative database access."""
+    app = create_app()
+    if app.config['SQLALCHEMY_DATABASE_URI'] != BenchmarkConfig.SQLALCHEMY_DATABASE_URI:
+        print("The benchmark only runs against the benchmark database. "
+              "Set APP_SETTINGS=openfuelservice.server.config.BenchmarkConfig")
+        return 1
+    with app.app_context():
+        if not skip_fixtures:
+            load_fixtures(seed=seed)
+        cooperative_report = run_cooperative_benchmark(app=app, routes=routes, concurrency=concurrency,
+                                                       warmup=warmup, seed=seed)
+    for mode in cooperative_modes:
+        print('{}:\n{}\n'.format(mode, format_report(cooperative_report['modes'][mode])))
+    print('cooperative throughput x{} of the blocking one'.format(cooperative_report['speedup']))
+    if report is not None:
+        write_report(cooperative_report, path=report)
+    return 0
+
+
+if __name__ == '__main__':
+    cooperative_benchmark()
@@ -0,0 +1,74 @@
+import numpy
+
+from openfuelservice.benchmark.fixtures import fixture_extent
+from openfuelservice.server import allowed_fuel_types, category_list
+from openfuelservice.server.utils.misc.geometries import wgs84_geod
+
+# Route lengths in km and the average distance in km between two route points
+corpus_lengths = (80, 900)
+corpus_point_spacing = 0.5
+
+
+def build_route(random: numpy.random.RandomState, extent: (float, float, float, float)) -> [[float, float]]:
+    """
+    Random drive through the extent that keeps its direction for a while and turns like a road would.
+
+    :param random: Seeded random state
+    :param extent: min_lng, min_lat, max_lng and max_lat the route stays in
+    :return: Returns the lngLat coordinates of the route
+    """
+    min_lng, min_lat, max_lng, max_lat = extent
+    length_km = random.uniform(*corpus_lengths)
+    points = max(2, int(length_km / corpus_point_spacing))
+    step_m = length_km * 1000 / (points - 1)
+    lng, lat = random.uniform(min_lng, max_lng), random.uniform(min_lat, max_lat)
+    azimuth = random.uniform(-180, 180)
+    coordinates = [[round(lng, 6), round(lat, 6)]]
+    for turn in random.normal(0, 8, points - 1):
+        azimuth += turn
+        next_lng, next_lat, _ = wgs84_geod.fwd(lng, lat, azimuth, step_m)
+        if not (min_lng <= next_lng <= max_lng and min_lat <= next_lat <= max_lat):
+            # Turn around at the edge of the fixture countries
+            azimuth += 180
+            next_lng, next_lat, _ = wgs84_geod.fwd(lng, lat, azimuth, step_m)
+        lng, lat = next_lng, next_lat
+        coordinates.append([round(lng, 6), round(lat, 6)])
+    return coordinates
+
+
+def build_filters(random: numpy.random.RandomState) -> dict:
+    filters = {
+        'data_source': str(random.choice(['cfd', 'ec'])),
+        'fuel_type': str(random.choice(allowed_fuel_types)),
+        'vehicle_type': 'car',
+        'vehicle_categories': ['all']
+    }
+    if random.uniform() < 0.5:
+        categories = sorted(category_list['car_categories'])
+        filters['vehicle_categories'] = sorted(random.choice(categories, size=random.randint(1, 4), replace=False))
+        filters['vehicle_categories'] = [str(category) for category in filters['vehicle_categories']]
+    if random.uniform() < 0.3:
+        filters['driving_speed'] = str(random.choice([60, 90, 120]))
+    return filters
+
+
+def build_corpus(size: int, seed: int = 42) -> [dict]:
+    """
+    Builds the same route requests for the same seed, so two benchmark runs replay identical requests.
+
+    :param size: Number of route requests
+    :param seed: Seed of the routes and filters
+    :return: Returns the json bodies of the route requests
+    """
+    random = numpy.random.RandomState(seed)
+    extent = fixture_extent()
+    corpus = []
+    for _ in range(size):
+        corpus.append({
+            'request': 'route',
+            'geometry': {
+                'geojson': {'type': 'LineString', 'coordinates': build_route(random=random, extent=extent)},
+                'filters': build_filters(random=random)
+            }
+        })
+    return corpus
@@ -0,0 +1,196 @@
+import zlib
+from datetime import date, timedelta
+
+import numpy
+from shapely.geometry import Polygon, mapping
+
+from openfuelservice.server import db, category_list, allowed_fuel_types
+from openfuelservice.server.db_import import parser
+from openfuelservice.server.db_import.envirocar.import_envirocar import EnvirocarImporter
+from openfuelservice.server.db_import.wikipedia.objects import CarCategoryObject
+from openfuelservice.server.statistics.objects import AverageEnviroCarCategoryStatisticObject, \
+    AverageCFDCategoryStatisticObject
+
+# The fixture countries tile a grid of cells from west to east and south to north. Their borders are jagged, so the
+# route splitting has to clip like it does at real borders. The names and codes are real, the shapes are not.
+fixture_countries = [
+    ('France', 'FR', 'FRA', 250, 'EUR', 'Euro'),
+    ('Luxembourg', 'LU', 'LUX', 442, 'EUR', 'Euro'),
+    ('Germany', 'DE', 'DEU', 276, 'EUR', 'Euro'),
+    ('Czech Republic', 'CZ', 'CZE', 203, 'CZK', 'Czech Koruna'),
+    ('Switzerland', 'CH', 'CHE', 756, 'CHF', 'Swiss Franc'),
+    ('Belgium', 'BE', 'BEL', 56, 'EUR', 'Euro'),
+    ('Austria', 'AT', 'AUT', 40, 'EUR', 'Euro'),
+    ('Poland', 'PL', 'POL', 616, 'PLN', 'Zloty'),
+    ('Italy', 'IT', 'ITA', 380, 'EUR', 'Euro'),
+    ('Netherlands', 'NL', 'NLD', 528, 'EUR', 'Euro'),
+    ('Slovenia', 'SI', 'SVN', 705, 'EUR', 'Euro'),
+    ('Denmark', 'DK', 'DNK', 208, 'DKK', 'Danish Krone')
+]
+fixture_grid = dict(min_lng=2.0, min_lat=45.0, columns=4, rows=3, cell_width=3.0, cell_height=2.0)
+fixture_border_points = 24
+fixture_border_jitter = 0.05
+fixture_price_weeks = 4
+fixture_years = range(2010, 2019)
+fixture_ec_phenomenons = {'CO2': 'kg/h', 'Consumption': 'l/h', 'Speed': 'km/h'}
+# Average values of a medium car. Every category is scaled by its own factor.
+fixture_cfd_phenomenons = {
+    'co2_g_per_km': 130.0,
+    'metric_combined': 5.5,
+    'metric_extra_urban': 4.6,
+    'metric_urban_cold': 7.0,
+    'emissions_co_mg_per_km': 300.0,
+    'emissions_nox_mg_per_km': 40.0,
+    'thc_emissions_mg_per_km': 45.0,
+    'thc_plus_nox_emissions_mg_per_km': 85.0,
+    'noise_level_dB_a_': 70.0
+}
+
+
+def fixture_extent() -> (float, float, float, float):
+    """
+    :return: Returns the min_lng, min_lat, max_lng and max_lat of the fixture countries
+    """
+    return (fixture_grid['min_lng'], fixture_grid['min_lat'],
+            fixture_grid['min_lng'] + fixture_grid['columns'] * fixture_grid['cell_width'],
+            fixture_grid['min_lat'] + fixture_grid['rows'] * fixture_grid['cell_height'])
+
+
+def border(start: (float, float), end: (float, float), seed: int) -> [(float, float)]:
+    """
+    Jagged border between two grid corners, without the end corner. Both neighbours of a border get the same points,
+    so the countries still tile the grid without gaps. Borders on the edge of the grid stay straight.
+
+    :param start: lngLat of the first corner
+    :param end: lngLat of the second corner
+    :param seed: Seed of the fixture data
+    """
+    first, last = sorted([start, end])
+    random = numpy.random.RandomState(zlib.crc32(repr((first, last, seed)).encode('utf-8')))
+    steps = numpy.linspace(0, 1, fixture_border_points + 2)
+    # The jitter fades out towards the corners, so neighbouring borders never cross
+    offsets = random.uniform(-fixture_border_jitter, fixture_border_jitter, len(steps)) * numpy.sin(steps * numpy.pi)
+    min_lng, min_lat, max_lng, max_lat = fixture_extent()
+    if first[0] == last[0] in (min_lng, max_lng) or first[1] == last[1] in (min_lat, max_lat):
+        offsets = numpy.zeros(len(steps))
+    lngs = first[0] + (last[0] - first[0]) * steps
+    lats = first[1] + (last[1] - first[1]) * steps
+    if first[0] == last[0]:
+        lngs = lngs + offsets
+    else:
+        lats = lats + offsets
+    points = list(zip(lngs.tolist(), lats.tolist()))
+    if (first, last) != (start, end):
+        points.reverse()
+    return points[:-1]
+
+
+def build_countries(seed: int) -> dict:
+    """
+    :return: Returns the fixture countries in the format of the CountryData driver
+    """
+    countries = dict()
+    for index, (name, alpha_2, alpha_3, numeric, currency_code, currency_name) in enumerate(fixture_countries):
+        column, row = index % fixture_grid['columns'], index // fixture_grid['columns']
+        min_lng = fixture_grid['min_lng'] + column * fixture_grid['cell_width']
+        min_lat = fixture_grid['min_lat'] + row * fixture_grid['cell_height']
+        max_lng = min_lng + fixture_grid['cell_width']
+        max_lat = min_lat + fixture_grid['cell_height']
+        corners = [(min_lng, min_lat), (max_lng, min_lat), (max_lng, max_lat), (min_lng, max_lat)]
+        shell = []
+        for corner in range(len(corners)):
+            shell.extend(border(start=corners[corner], end=corners[(corner + 1) % len(corners)], seed=seed))
+        countries[name] = {
+            'ISO3166-1-Alpha-2': alpha_2,
+            'ISO3166-1-Alpha-3': alpha_3,
+            'ISO3166-1-numeric': numeric,
+            'ISO4217-currency_alphabetic_code': currency_code,
+            'ISO4217-currency_name': currency_name,
+            'geom': mapping(Polygon(shell))
+        }
+    return countries
+
+
+def fixture_price(euro_ttc: float, diesel_ttc: float) -> dict:
+    return {
+        'taux': 1,
+        'euro_price': 1,
+        'euro_unit': 'liter',
+        'euro_quantity': 1000,
+        'euro_ht': round(euro_ttc * 0.45, 2),
+        'euro_ttc': round(euro_ttc, 2),
+        'diesel_unit': 'liter',
+        'diesel_quantity': 1000,
+        'diesel_ht': round(diesel_ttc * 0.5, 2),
+        'diesel_ttc': round(diesel_ttc, 2)
+    }
+
+
+def build_prices(seed: int, latest: date = date(2018, 12, 10)) -> dict:
+    """
+    :return: Returns weekly fixture prices of every country and the general prices in the format of the ESData driver
+    """
+    random = numpy.random.RandomState(seed)
+    dates = [latest - timedelta(weeks=week) for week in reversed(range(fixture_price_weeks))]
+    country_prices = dict()
+    for country in fixture_countries:
+        euro_ttc, diesel_ttc = random.uniform(1250, 1650), random.uniform(1150, 1500)
+        country_prices[country[1]] = {price_date: fixture_price(euro_ttc=euro_ttc + random.uniform(-30, 30),
+                                                                diesel_ttc=diesel_ttc + random.uniform(-30, 30))
+                                      for price_date in dates}
+    general_prices = {price_date: fixture_price(euro_ttc=1450 + random.uniform(-20, 20),
+                                                diesel_ttc=1320 + random.uniform(-20, 20)) for price_date in dates}
+    return {'country_prices': country_prices, 'general_prices': general_prices}
+
+
+def build_statistics(seed: int) -> ([AverageEnviroCarCategoryStatisticObject], [AverageCFDCategoryStatisticObject]):
+    """
+    :return: Returns the envirocar and carfueldata average statistics of every category and enabled fuel type
+    """
+    random = numpy.random.RandomState(seed)
+    ec_statistics = []
+    cfd_statistics = []
+    for category_short_eu in sorted(category_list['car_categories']):
+        category_factor = random.uniform(0.7, 1.6)
+        for fuel_type in allowed_fuel_types:
+            fuel_factor = 0.85 if fuel_type == 'diesel' else 1.0
+            consumption = 4.0 * category_factor * fuel_factor
+            averages = {'Speed': (0.0, 52.0, 135.0),
+                        'Consumption': (0.4 * category_factor, consumption, 3 * consumption),
+                        'CO2': (1.0 * category_factor, 2.4 * consumption, 7.2 * consumption)}
+            for phenomenon in fixture_ec_phenomenons:
+                minimum, average, maximum = averages[phenomenon]
+                ec_statistics.append(AverageEnviroCarCategoryStatisticObject(
+                    category_short_eu=category_short_eu, vehicle_type='car', fuel_type=fuel_type,
+                    phenomenon=phenomenon, max=maximum, average=average, min=minimum,
+                    measurements=int(random.randint(1000, 50000)), numb_sensors=int(random.randint(3, 60))))
+            for year in fixture_years:
+                for phenomenon in fixture_cfd_phenomenons:
+                    cfd_statistics.append(AverageCFDCategoryStatisticObject(
+                        phenomenon=phenomenon, category_short_eu=category_short_eu, vehicle_type='car',
+                        fuel_type=fuel_type,
+                        value=fixture_cfd_phenomenons[phenomenon] * category_factor * fuel_factor *
+                              random.uniform(0.9, 1.1),
+                        numb_cars=int(random.randint(1, 40)), year=year))
+    return ec_statistics, cfd_statistics
+
+
+def load_fixtures(seed: int = 42):
+    """
+    Recreates every table of the connected database and imports the fixture countries, prices and category
+    statistics with the regular importers. The route requests of the benchmark only need these.
+
+    :param seed: Seed of the generated prices, statistics and borders
+    """
+    db.drop_all()
+    db.create_all()
+    parser.parse_countries(build_countries(seed=seed))
+    parser.parse_eurostat(eurostat_data=build_prices(seed=seed))
+    categories = category_list['car_categories']
+    parser.parse_wikipedia(wikicar_categories=[
+        CarCategoryObject(category_name_de=categories[category]['de'], category_name_en=categories[category]['en'],
+                          category_short_eu=category) for category in categories])
+    EnvirocarImporter().import_phenomenons({name: {'name': name, 'unit': unit} for name, unit in
+                                            fixture_ec_phenomenons.items()})
+    ec_statistics, cfd_statistics = build_statistics(seed=seed)
+    parser.parse_misc(ec_av_category_stats=ec_statistics, cfd_av_category_stats=cfd_statistics)
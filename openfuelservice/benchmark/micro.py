@@ -0,0 +1,307 @@
+import hashlib
+import time
+from contextlib import contextmanager
+
+import numpy
+from geoalchemy2.shape import from_shape
+from shapely.geometry import LineString, shape
+
+from openfuelservice.benchmark.fixtures import build_countries, build_prices, build_statistics, fixture_grid, \
+    fixture_ec_phenomenons, fixture_extent
+from openfuelservice.server import category_list
+from openfuelservice.server.base_calculations import objects, use_data_provider, parse_fuel_models
+from openfuelservice.server.base_calculations.cfd import DistanceCalculation
+from openfuelservice.server.base_calculations.data_provider import MemoryDataProvider, get_data_provider, \
+    EnvirocarStatisticRow, CFDStatisticRow
+from openfuelservice.server.base_calculations.envirocar import AdvancedDistanceCalculation
+from openfuelservice.server.base_calculations.fuel_model_registry import fuel_model_registry
+from openfuelservice.server.base_calculations.route_cache import route_data_versions
+from openfuelservice.server.db_import.countries.country_grid import CountryGrid
+from openfuelservice.server.db_import.eurostat.objects import CountryPriceExtended, GeneralPrice
+from openfuelservice.server.db_import.models import CarCategoryModel, CarfuelDataCarModel
+from openfuelservice.server.objects import Filters
+from openfuelservice.server.utils.misc.geometries import true_linestring_length
+
+micro_benchmarks = ['linestring_length', 'price_model', 'route', 'fuel_models', 'calculation']
+# 'database' isn't measured, without PostgreSQL the in memory provider would only measure its own stand-in
+micro_splittings = ['index', 'python']
+micro_data_sources = ['ec', 'cfd', 'car']
+micro_fuel_type = 'gasoline'
+# Spread of the route vertices around the straight line between the country centres as share of the vertex spacing,
+# so the routes wiggle without crossing themselves
+micro_route_noise = 0.25
+
+
+def price_value(price: dict, fuel: str, value: str) -> float:
+    return price['{}_{}'.format(fuel, value)] / price['{}_quantity'.format(fuel)]
+
+
+def build_country_price(price_date, price: dict, country_alpha_2: str = None, geom=None) -> CountryPriceExtended or \
+        GeneralPrice:
+    """
+    Converts a fixture price to the price objects of the queries with the prices per liter.
+    """
+    values = dict(date=price_date, euro_price=1, euro_ht=price_value(price, 'euro', 'ht'),
+                  euro_ttc=price_value(price, 'euro', 'ttc'), diesel_ht=price_value(price, 'diesel', 'ht'),
+                  diesel_ttc=price_value(price, 'diesel', 'ttc'), euro_unit=price['euro_unit'], euro_quantity=1,
+                  diesel_unit=price['diesel_unit'], diesel_quantity=1)
+    if country_alpha_2 is None:
+        return GeneralPrice(**values)
+    return CountryPriceExtended(country_alpha_2=country_alpha_2, taux=price['taux'], geom=geom, **values)
+
+
+def build_cfd_cars(ec_statistics: list) -> [CarfuelDataCarModel]:
+    """
+    :return: Returns one car per category and fuel type with the average consumption and emissions of the category
+    """
+    cfd_cars = []
+    consumptions = {(row.category_short_eu, row.fuel_type): row.average for row in ec_statistics if
+                    row.phenomenon_name == 'Consumption'}
+    for (category_short_eu, fuel_type), consumption in sorted(consumptions.items()):
+        cfd_cars.append(CarfuelDataCarModel(
+            hash_id=hashlib.md5('{}-{}'.format(category_short_eu, fuel_type).encode('utf-8')).hexdigest(),
+            manufacturer='Fixture', model=category_short_eu, fuel_type=fuel_type,
+            metric_combined=consumption * 1.4, co2_g_per_km=consumption * 33, emissions_co_mg_per_km=300.0,
+            emissions_nox_mg_per_km=40.0, thc_emissions_mg_per_km=45.0, categories=[category_short_eu]))
+    return cfd_cars
+
+
+def build_memory_provider(seed: int = 42) -> MemoryDataProvider:
+    """
+    Builds the fixture data of the replay benchmark in memory, so the base calculations run without any database.
+
+    :param seed: Seed of the generated prices, statistics and borders
+    """
+    countries = build_countries(seed=seed)
+    prices = build_prices(seed=seed)
+    country_prices = []
+    country_geometries = dict()
+    for name in countries:
+        country_alpha_2 = countries[name]['ISO3166-1-Alpha-2']
+        country_geometries[country_alpha_2] = shape(countries[name]['geom'])
+        latest_date = max(prices['country_prices'][country_alpha_2])
+        country_prices.append(build_country_price(price_date=latest_date,
+                                                  price=prices['country_prices'][country_alpha_2][latest_date],
+                                                  country_alpha_2=country_alpha_2,
+                                                  geom=from_shape(country_geometries[country_alpha_2], srid=4326)))
+    latest_date = max(prices['general_prices'])
+    general_price = build_country_price(price_date=latest_date, price=prices['general_prices'][latest_date])
+    ec_statistics, cfd_statistics = build_statistics(seed=seed)
+    ec_rows = [EnvirocarStatisticRow(category_short_eu=statistic.category_short_eu, fuel_type=statistic.fuel_type,
+                                     phenomenon_name=statistic.phenomenon, min=statistic.min,
+                                     average=statistic.average, max=statistic.max,
+                                     measurements=statistic.measurements, numb_sensors=statistic.numb_sensors,
+                                     unit=fixture_ec_phenomenons[statistic.phenomenon]) for statistic in ec_statistics]
+    cfd_rows = [CFDStatisticRow(category_short_eu=statistic.category_short_eu, fuel_type=statistic.fuel_type,
+                                phenomenon_name=statistic.phenomenon, value=statistic.value,
+                                numb_cars=statistic.numb_cars, year=statistic.year) for statistic in cfd_statistics]
+    categories = category_list['car_categories']
+    min_lng, min_lat, max_lng, max_lat = fixture_extent()
+    return MemoryDataProvider(
+        country_prices=country_prices, general_price=general_price, ec_statistics=ec_rows, cfd_statistics=cfd_rows,
+        categories=[CarCategoryModel(category_short_eu=category, category_name_de=categories[category]['de'],
+                                     category_name_en=categories[category]['en']) for category in categories],
+        cfd_cars=build_cfd_cars(ec_statistics=ec_rows),
+        data_versions={name: 1 for name in route_data_versions},
+        country_grid=CountryGrid.build(country_geometries=country_geometries, origin=(min_lng, min_lat),
+                                       extent=(max_lng - min_lng, max_lat - min_lat)))
+
+
+def cell_centre(cell: int) -> (float, float):
+    column, row = cell % fixture_grid['columns'], cell // fixture_grid['columns']
+    return (fixture_grid['min_lng'] + (column + 0.5) * fixture_grid['cell_width'],
+            fixture_grid['min_lat'] + (row + 0.5) * fixture_grid['cell_height'])
+
+
+def snake_cells() -> [int]:
+    """
+    :return: Returns the fixture countries row by row, every other row backwards, so neighbours in the list share a
+    border
+    """
+    cells = []
+    for row in range(fixture_grid['rows']):
+        columns = list(range(fixture_grid['columns']))
+        if row % 2 == 1:
+            columns.reverse()
+        cells.extend(row * fixture_grid['columns'] + column for column in columns)
+    return cells
+
+
+def build_micro_route(vertices: int, countries: int, seed: int = 42) -> LineString:
+    """
+    Builds a route through exactly the given number of fixture countries.
+
+    :param vertices: Number of route vertices
+    :param countries: Number of crossed countries, at most the number of fixture countries
+    :param seed: Seed of the vertex noise
+    """
+    cells = snake_cells()
+    if not 1 <= countries <= len(cells):
+        raise ValueError('Between 1 and {} countries can be crossed'.format(len(cells)))
+    if countries == 1:
+        lng, lat = cell_centre(cells[0])
+        waypoints = numpy.array([[lng - fixture_grid['cell_width'] / 4, lat],
+                                 [lng + fixture_grid['cell_width'] / 4, lat]])
+    else:
+        waypoints = numpy.array([cell_centre(cell) for cell in cells[:countries]])
+    distances = numpy.concatenate([[0], numpy.cumsum(numpy.hypot(*numpy.diff(waypoints, axis=0).T))])
+    steps = numpy.linspace(0, distances[-1], max(vertices, 2))
+    coordinates = numpy.column_stack([numpy.interp(steps, distances, waypoints[:, 0]),
+                                      numpy.interp(steps, distances, waypoints[:, 1])])
+    # Shift the vertices sideways only, so they keep their order along the route
+    directions = numpy.diff(waypoints, axis=0) / numpy.diff(distances)[:, None]
+    segments = numpy.clip(numpy.searchsorted(distances, steps, side='right') - 1, 0, len(directions) - 1)
+    normals = numpy.column_stack([-directions[segments, 1], directions[segments, 0]])
+    random = numpy.random.RandomState(seed)
+    offsets = random.uniform(-micro_route_noise, micro_route_noise, len(steps)) * (steps[1] - steps[0])
+    offsets[[0, -1]] = 0
+    coordinates += normals * offsets[:, None]
+    return LineString(coordinates)
+
+
+def micro_categories(categories: int) -> [str]:
+    return sorted(category_list['car_categories'])[:categories]
+
+
+def build_filters(data_source: str, categories: [str], provider: MemoryDataProvider) -> Filters:
+    filters = {'data_source': 'ec' if data_source == 'ec' else 'cfd', 'fuel_type': micro_fuel_type,
+               'vehicle_type': 'car', 'vehicle_categories': categories}
+    if data_source == 'car':
+        filters['cfd_ids'] = [cfd_car.hash_id for cfd_car in provider.cfd_cars.values() if
+                              cfd_car.fuel_type == micro_fuel_type and cfd_car.categories[0] in categories]
+    return Filters(filters)
+
+
+@contextmanager
+def route_splitting(splitting: str):
+    previous = objects.route_splitting
+    objects.route_splitting = splitting
+    try:
+        yield
+    finally:
+        objects.route_splitting = previous
+
+
+def measure(run, setup=None, repeat: int = 5, warmup: int = 1) -> dict:
+    """
+    Times the run function. The setup runs before every call and isn't timed, its result is passed to the run.
+
+    :return: Returns the min, median and mean of the timed calls in milliseconds
+    """
+    timings = []
+    for index in range(warmup + repeat):
+        if setup is not None:
+            argument = setup()
+            start = time.perf_counter()
+            run(argument)
+        else:
+            start = time.perf_counter()
+            run()
+        if index >= warmup:
+            timings.append(time.perf_counter() - start)
+    timings = numpy.asarray(timings) * 1000
+    return {'runs': repeat, 'min_ms': round(float(timings.min()), 3),
+            'median_ms': round(float(numpy.median(timings)), 3), 'mean_ms': round(float(timings.mean()), 3)}
+
+
+def build_calculation(data_source: str, geom: LineString, filters: Filters, fuel_models: list):
+    if data_source == 'ec':
+        return AdvancedDistanceCalculation(geom=geom, filters=filters, fuel_models=fuel_models)
+    return DistanceCalculation(geom=geom, filters=filters, fuel_models=fuel_models)
+
+
+def run_calculation(data_source: str, calculation) -> dict:
+    if data_source == 'ec':
+        return calculation.calculate_cost()
+    elif data_source == 'car':
+        return calculation.calculate_individual_cfd_cost()
+    return calculation.calculate_category_cost()
+
+
+def micro_cases(benchmark: str, vertices: [int], countries: [int], categories: [int]) -> [dict]:
+    if benchmark == 'linestring_length':
+        return [{'vertices': vertex_count} for vertex_count in vertices]
+    elif benchmark == 'price_model':
+        return [{'splitting': splitting, 'vertices': vertex_count, 'countries': country_count} for splitting in
+                micro_splittings for vertex_count in vertices for country_count in countries]
+    elif benchmark == 'route':
+        return [{'vertices': vertex_count, 'countries': country_count} for vertex_count in vertices for
+                country_count in countries]
+    elif benchmark == 'fuel_models':
+        return [{'data_source': data_source, 'categories': category_count} for data_source in micro_data_sources for
+                category_count in categories]
+    elif benchmark == 'calculation':
+        return [{'data_source': data_source, 'vertices': vertex_count, 'countries': country_count,
+                 'categories': category_count} for data_source in micro_data_sources for vertex_count in vertices for
+                country_count in countries for category_count in categories]
+    raise ValueError('Unknown micro benchmark {}'.format(benchmark))
+
+
+def run_case(benchmark: str, case: dict, provider: MemoryDataProvider, repeat: int, seed: int) -> dict:
+    """
+    Measures a single case of a micro benchmark. Routes and fuel models are built before the measurement unless
+    building them is what the case measures.
+    """
+    geom = build_micro_route(vertices=case['vertices'], countries=case.get('countries', 1), seed=seed) \
+        if 'vertices' in case else None
+    if benchmark == 'linestring_length':
+        return measure(lambda: true_linestring_length(linestring=geom), repeat=repeat)
+    elif benchmark == 'price_model':
+        with route_splitting(case['splitting']):
+            return measure(lambda: objects.parse_price_model(line_string=geom), repeat=repeat)
+    filters = build_filters(data_source=case.get('data_source', 'ec'),
+                            categories=micro_categories(categories=case.get('categories', 1)), provider=provider)
+    if benchmark == 'route':
+        return measure(lambda: objects.Route(geom=geom, filters=filters), repeat=repeat)
+    elif benchmark == 'fuel_models':
+        return measure(lambda _: parse_fuel_models(filters=filters, data_source=filters.data_source),
+                       setup=fuel_model_registry.clear, repeat=repeat)
+    fuel_models = parse_fuel_models(filters=filters, data_source=filters.data_source)
+    # The route parts cache their lengths, so every call gets a new calculation
+    return measure(lambda calculation: run_calculation(data_source=case['data_source'], calculation=calculation),
+                   setup=lambda: build_calculation(data_source=case['data_source'], geom=geom, filters=filters,
+                                                   fuel_models=fuel_models), repeat=repeat)
+
+
+def run_micro_benchmarks(benchmarks: [str], vertices: [int], countries: [int], categories: [int], repeat: int = 5,
+                         seed: int = 42) -> dict:
+    """
+    Measures the base calculations on in memory fixture data. The data provider of the worker is replaced for the
+    run and restored afterwards.
+
+    :param benchmarks: Names of the micro benchmarks to run
+    :param vertices: Vertex counts of the routes
+    :param countries: Numbers of countries the routes cross
+    :param categories: Numbers of requested vehicle categories
+    :param repeat: Timed calls per case
+    :param seed: Seed of the fixture data and the routes
+    :return: Returns the report with one result per case
+    """
+    previous_provider = get_data_provider()
+    provider = build_memory_provider(seed=seed)
+    use_data_provider(provider)
+    results = []
+    try:
+        for benchmark in benchmarks:
+            for case in micro_cases(benchmark=benchmark, vertices=vertices, countries=countries,
+                                    categories=categories):
+                result = {'benchmark': benchmark}
+                result.update(case)
+                result.update(run_case(benchmark=benchmark, case=case, provider=provider, repeat=repeat, seed=seed))
+                results.append(result)
+    finally:
+        use_data_provider(previous_provider)
+    configuration = {'benchmarks': benchmarks, 'vertices': vertices, 'countries': countries,
+                     'categories': categories, 'repeat': repeat, 'seed': seed}
+    return {'configuration': configuration, 'results': results}
+
+
+def format_micro_report(report: dict) -> str:
+    lines = []
+    for result in report['results']:
+        case = ' '.join('{}={}'.format(key, result[key]) for key in
+                        ['splitting', 'data_source', 'vertices', 'countries', 'categories'] if key in result)
+        lines.append('{:<18} {:<56} min {:>10.3f} ms  median {:>10.3f} ms'.format(result['benchmark'], case,
+                                                                                result['min_ms'],
+                                                                                result['median_ms']))
+    return '\n'.join(lines)
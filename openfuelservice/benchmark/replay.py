@@ -0,0 +1,215 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from openfuelservice.benchmark.corpus import build_corpus
+from openfuelservice.server.base_calculations.route_cache import route_cache
+
+route_path = '/fuel?request=route'
+
+
+class RequestResult(object):
+    def __init__(self, status_code: int, latency: float, sql_statements: int or None, stage_timings: dict):
+        """
+        :param status_code: HTTP status of the response
+        :param latency: Seconds until the whole response was received
+        :param sql_statements: Number of sql statements of the request. None if they can't be counted.
+        :param stage_timings: Seconds per processing stage of the Server-Timing header
+        """
+        self.status_code: int = status_code
+        self.latency: float = latency
+        self.sql_statements: int = sql_statements
+        self.stage_timings: dict = stage_timings
+
+
+def parse_server_timing(header: str) -> dict:
+    """
+    :return: Returns the seconds of every stage of a Server-Timing header
+    """
+    stage_timings = dict()
+    for metric in header.split(','):
+        parameters = [parameter.strip() for parameter in metric.split(';')]
+        for parameter in parameters[1:]:
+            if parameter.startswith('dur='):
+                stage_timings[parameters[0]] = float(parameter[4:]) / 1000
+    return stage_timings
+
+
+class AppTarget(object):
+    def __init__(self, app: Flask):
+        """
+        Sends the requests to the app in this process. The sql statements of every request are counted.
+
+        :param app: The app connected to the benchmark database
+        """
+        self.app: Flask = app
+        self.name: str = 'in-process'
+        self._local = threading.local()
+        self._cache_statistics: dict = None
+
+    def count_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.statements = getattr(self._local, 'statements', 0) + 1
+
+    def start(self):
+        route_cache.clear()
+        self._cache_statistics = route_cache.statistics()
+        event.listen(Engine, 'before_cursor_execute', self.count_statement)
+
+    def stop(self) -> dict:
+        """
+        :return: Returns the route cache hits and misses of the replay
+        """
+        event.remove(Engine, 'before_cursor_execute', self.count_statement)
+        cache_statistics = route_cache.statistics()
+        return {name: cache_statistics[name] - self._cache_statistics[name] for name in ['hits', 'misses']}
+
+    def send(self, body: dict) -> RequestResult:
+        self._local.statements = 0
+        start = time.perf_counter()
+        response = self.app.test_client().post(route_path, json=body)
+        latency = time.perf_counter() - start
+        return RequestResult(status_code=response.status_code, latency=latency,
+                             sql_statements=self._local.statements,
+                             stage_timings=parse_server_timing(response.headers.get('Server-Timing', '')))
+
+
+class HttpTarget(object):
+    def __init__(self, url: str, timeout: float = 60):
+        """
+        Sends the requests to a running server, e.g. gunicorn. The sql statements can't be counted from here.
+
+        :param url: Base url of the server, e.g. http://127.0.0.1:5000
+        :param timeout: Seconds to wait for a response
+        """
+        self.url: str = url.rstrip('/')
+        self.name: str = self.url
+        self.timeout: float = timeout
+
+    def start(self):
+        pass
+
+    def stop(self) -> None:
+        return None
+
+    def send(self, body: dict) -> RequestResult:
+        request = urllib.request.Request(self.url + route_path, data=json.dumps(body).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status_code, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            error.read()
+            status_code, headers = error.code, error.headers
+        latency = time.perf_counter() - start
+        return RequestResult(status_code=status_code, latency=latency, sql_statements=None,
+                             stage_timings=parse_server_timing(headers.get('Server-Timing', '')))
+
+
+def replay(corpus: [dict], target: AppTarget or HttpTarget, concurrency: int) -> ([RequestResult], float):
+    """
+    Sends every request of the corpus once with the given number of concurrent clients.
+
+    :return: Returns the results in the order of the corpus and the seconds the whole replay took
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(target.send, corpus))
+        duration = time.perf_counter() - start
+    return results, duration
+
+
+def summarize(values: [float], scale: float = 1.0) -> dict or None:
+    if len(values) == 0:
+        return None
+    values = numpy.asarray(values, dtype=float) * scale
+    return {
+        'mean': round(float(values.mean()), 2),
+        'p50': round(float(numpy.percentile(values, 50)), 2),
+        'p90': round(float(numpy.percentile(values, 90)), 2),
+        'p99': round(float(numpy.percentile(values, 99)), 2),
+        'max': round(float(values.max()), 2)
+    }
+
+
+def build_report(results: [RequestResult], duration: float, configuration: dict, route_cache_counts: dict = None) \
+        -> dict:
+    """
+    Builds a report with sorted keys and rounded numbers, so the reports of two runs can be diffed line by line.
+    Latencies, sql statements and stage timings only include the successful requests.
+    """
+    succeeded = [result for result in results if result.status_code == 200]
+    status_codes = dict()
+    for result in results:
+        status_codes[str(result.status_code)] = status_codes.get(str(result.status_code), 0) + 1
+    stages = sorted(set(stage for result in succeeded for stage in result.stage_timings))
+    sql_statements = [result.sql_statements for result in succeeded if result.sql_statements is not None]
+    sql_summary = summarize(sql_statements)
+    if sql_summary is not None:
+        sql_summary['total'] = int(sum(sql_statements))
+    return {
+        'configuration': configuration,
+        'duration_s': round(duration, 2),
+        'throughput_rps': round(len(results) / duration, 2) if duration > 0 else None,
+        'requests': {'total': len(results), 'failed': len(results) - len(succeeded), 'status_codes': status_codes},
+        'latency_ms': summarize([result.latency for result in succeeded], scale=1000),
+        'sql_statements': sql_summary,
+        'stages_ms': {stage: summarize([result.stage_timings[stage] for result in succeeded
+                                        if stage in result.stage_timings], scale=1000) for stage in stages},
+        'route_cache': route_cache_counts
+    }
+
+
+def format_report(report: dict) -> str:
+    configuration = report['configuration']
+    lines = ['{} routes, concurrency {}, seed {}, target {}'.format(configuration['routes'],
+                                                                   configuration['concurrency'],
+                                                                   configuration['seed'], configuration['target']),
+             'throughput {} routes/s in {} s, {} failed'.format(report['throughput_rps'], report['duration_s'],
+                                                               report['requests']['failed'])]
+    for name, summary in [('latency ms', report['latency_ms']), ('sql per route', report['sql_statements'])] + \
+            [('stage {} ms'.format(stage), report['stages_ms'][stage]) for stage in report['stages_ms']]:
+        if summary is not None:
+            lines.append('{:<24} {}'.format(name, '  '.join('{} {}'.format(key, summary[key]) for key in
+                                                            ['mean', 'p50', 'p90', 'p99', 'max', 'total']
+                                                            if key in summary)))
+    return '\n'.join(lines)
+
+
+def write_report(report: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, sort_keys=True, indent=2)
+        report_file.write('\n')
+
+
+def run_benchmark(target: AppTarget or HttpTarget, routes: int, concurrency: int, warmup: int, seed: int) -> dict:
+    """
+    Replays the route corpus of the seed against the target after sending the warmup routes one by one. The warmup
+    routes are a different corpus, so they don't fill the route cache with the measured routes.
+
+    :param target: The app or the server to send the requests to
+    :param routes: Number of measured route requests
+    :param concurrency: Number of concurrent clients
+    :param warmup: Number of route requests before the measurement
+    :param seed: Seed of the route corpus
+    :return: Returns the report of the replay
+    """
+    for body in build_corpus(size=warmup, seed=seed + 1):
+        target.send(body)
+    corpus = build_corpus(size=routes, seed=seed)
+    target.start()
+    results, duration = replay(corpus=corpus, target=target, concurrency=concurrency)
+    route_cache_counts = target.stop()
+    configuration = {'routes': routes, 'concurrency': concurrency, 'warmup': warmup, 'seed': seed,
+                     'target': target.name}
+    return build_report(results=results, duration=duration, configuration=configuration,
+                        route_cache_counts=route_cache_counts)
@@ -9,6 +9,8 @@ from flask import Flask, g, jsonify
 from flask_bootstrap import Bootstrap
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 from openfuelservice.server.api import api_exceptions
 
@@ -56,6 +58,8 @@ wiki_category_table = ofs_settings['general']['wikipedia_category_table']
 cfd_tables = ofs_settings['statistics_provider']['carfueldata_provider']['table_names']
 countries_table = ofs_settings['general']['countries_table']
 hash_table = ofs_settings['general']['hash_table']
+data_version_table = ofs_settings['general']['data_version_table']
+catalogue_snapshot_table = ofs_settings['general']['catalogue_snapshot_table']
 
 # if "TESTING" in os.environ:
 #     ec_tables_testing = list()
@@ -97,6 +101,10 @@ def create_app(script_info=None):
     # set up extensions
     db.init_app(app)
 
+    from openfuelservice.server.utils.database.cooperative import init_cooperative_database
+    if init_cooperative_database(enabled=app.config.get('GEVENT_WAIT_CALLBACK', False)):
+        logger.info('The database is accessed cooperatively with gevent')
+
     Bootstrap(app)
 
     # register blueprints
@@ -105,6 +113,37 @@ def create_app(script_info=None):
 
     Swagger(app, template_file='api/ofs_post.yml')
 
+    from openfuelservice.server.utils.processing import timing
+    if timing.stage_timing:
+        # Measures the time of every sql statement of every engine
+        if not event.contains(Engine, 'before_cursor_execute', timing.before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', timing.before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', timing.after_cursor_execute)
+            event.listen(Engine, 'handle_error', timing.handle_error)
+
+        @app.before_request
+        def start_stage_timing():
+            g.request_start = time.perf_counter()
+
+        @app.after_request
+        def finish_stage_timing(response):
+            if 'request_start' not in g:
+                return response
+            request_start = g.request_start
+            stage_timings = g.setdefault('stage_timings', dict())
+            stage_timings['total'] = time.perf_counter() - request_start
+            response.headers['Server-Timing'] = timing.server_timing_header(stage_timings)
+            if response.is_streamed:
+                # The body of streamed responses is generated after this hook, so they are recorded once it is sent
+                def record_streamed_stage_timings():
+                    stage_timings['total'] = time.perf_counter() - request_start
+                    timing.record_stage_timings(stage_timings)
+
+                response.call_on_close(record_streamed_stage_timings)
+            else:
+                timing.record_stage_timings(stage_timings)
+            return response
+
     if "DEVELOPMENT" in os.environ:
         @app.before_request
         def before_request():
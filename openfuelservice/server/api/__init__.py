@@ -4,11 +4,12 @@ error_codes = {
     4002: 'Geometry is missing',
     4003: 'Fuel type is missing',
     4004: 'Vehicle type is missing',
-    4005: 'GeoJSON missing in request',
+    4005: 'Geometry missing in request. Provide geojson, coordinates, polyline or a WKB body',
     4006: 'Wrong GeoJSON type. Only LineStrings are supported',
     4007: 'GeoJSON issue',
     4008: 'Unsupported HTTP method',
     4009: 'Data Source is missing',
+    4010: 'Route collection is empty. Provide a FeatureCollection or a list of LineStrings',
     4099: 'Unknown internal error',
 
     5000: 'Not enough data for the desired year',
@@ -1,16 +1,26 @@
 import json
+import logging
 
-import geojson
-from flask import Blueprint, request, Response
-from shapely.geometry import shape
+import numpy
+from flask import Blueprint, request, Response, stream_with_context
+from shapely import wkb
+from shapely.geometry import LineString
+from shapely.geometry.base import BaseGeometry
 from voluptuous import Required, MultipleInvalid, Optional, Schema, Any, ALLOW_EXTRA
 
 from openfuelservice.server import api_exceptions
 from openfuelservice.server import category_list
-from openfuelservice.server.base_calculations import calculate_route
+from openfuelservice.server.base_calculations import calculate_route, calculate_routes, iterate_routes
+from openfuelservice.server.base_calculations.route_cache import route_cache
 from openfuelservice.server.objects import Filters
+from openfuelservice.server.utils.database.catalogue import catalogue_snapshots, CatalogueSnapshot, brand_sources, \
+    brands_name, cars_name, car_ids_name, categories_name
 from openfuelservice.server.utils.database.queries import get_brands, get_cars, Wikipedia, get_car_ids
 from openfuelservice.server.utils.misc.data_handling import check_manufacturer
+from openfuelservice.server.utils.misc.geometries import decode_polyline
+from openfuelservice.server.utils.processing.timing import stage_timer, stage_histogram
+
+logger = logging.getLogger(__name__)
 
 vehicle_categories = category_list['car_categories']
 
@@ -41,19 +51,23 @@ cfd_filters = Schema({
         Optional('tank_sizes', msg='Optionally provide vehicle tank size'): int,
         Optional('request_id', msg='Optionally provide a personal request id'): int,
         Optional('year', msg='Optionally provide a year to calculate the statistics from there on'): int,
-        Optional('cfd_ids', msg='Optionally provide cfd car id'): str
+        Optional('cfd_ids', msg='Optionally provide cfd car id'): str,
+        Optional('fleet', msg='Optionally calculate every cfd car on its own'): bool
 
     }
 }, extra=ALLOW_EXTRA)
 
 geom_schema = Schema({
-    Required('geojson', msg='Must be a geojson object'): object,
+    Optional('geojson', msg='Must be a geojson object'): object,
+    Optional('coordinates', msg='Must be a list of lngLat coordinates'): list,
+    Optional('polyline', msg='Must be an encoded polyline or a list of them'): Any(str, list),
+    Optional('polyline_precision', msg='Must be the number of decimals of the encoded polyline'): int,
 
     Optional('ec_filters'): envirocar_filters or cfd_filters
 }, extra=ALLOW_EXTRA)
 
 schema = Schema({
-    Required('request'): Required(Any('route'), msg='route missing from request'),
+    Required('request'): Required(Any('route', 'routes'), msg='route missing from request'),
 
     Required('geometry'): geom_schema
 }, extra=ALLOW_EXTRA)
@@ -65,48 +79,37 @@ main_blueprint = Blueprint('main', __name__, )
 def basic_data():
     if request.method == 'GET':
         if 'request' in request.args and str(request.args['request']).strip() == 'brands':
-            if 'source' not in request.args or str(request.args['source']).strip() == 'all':
-                brands: dict = request_brands(wikicar_brands=True, envirocar_brands=True, carfueldata_brands=True)
-            elif 'source' in request.args and str(request.args['source']).strip() == 'cfd':
-                brands: dict = request_brands(wikicar_brands=False, envirocar_brands=False, carfueldata_brands=True)
-            elif 'source' in request.args and str(request.args['source']).strip() == 'ec':
-                brands: dict = request_brands(wikicar_brands=False, envirocar_brands=True, carfueldata_brands=False)
-            elif 'source' in request.args and str(request.args['source']).strip() == 'wikicar':
-                brands: dict = request_brands(wikicar_brands=True, envirocar_brands=False, carfueldata_brands=False)
-            else:
+            source = str(request.args['source']).strip() if 'source' in request.args else 'all'
+            if source not in brand_sources:
                 raise api_exceptions.InvalidUsage(status_code=500, error_code=5001,
                                                   message='Wrong or missing filter argument for brands')
-            r = Response(json.dumps(brands, sort_keys=True), mimetype='application/json; charset=utf-8')
-            return r
+            snapshot = catalogue_snapshots.get(name=brands_name(source), build=lambda: request_brands(
+                carfueldata_brands=brand_sources[source]['carfueldata'],
+                envirocar_brands=brand_sources[source]['envirocar'], wikicar_brands=brand_sources[source]['wikicar']))
+            return snapshot_response(snapshot)
         elif 'request' in request.args and str(request.args['request']).strip() == 'cars' and 'source' in request.args:
             source = str(request.args['source']).strip()
-            brand = str(request.args['brand']).strip()
+            brand = resolve_brand(str(request.args['brand']))
             if source == 'cfd':
-                cars = request_car_ids(brand=brand, source=source)
-                r = Response(json.dumps(cars, sort_keys=True), mimetype='application/json; charset=utf-8')
-                return r
+                snapshot = catalogue_snapshots.get(name=car_ids_name(brand=brand, source=source),
+                                                   build=lambda: request_car_ids(brand=brand, source=source))
+                return snapshot_response(snapshot)
             else:
                 raise api_exceptions.InvalidUsage(status_code=500, error_code=5001,
                                                   message=("Source {} not supported.".format(source)))
         elif 'request' in request.args and str(request.args['request']).strip() == 'cars':
             if 'brand' in request.args and str(request.args['brand']).strip() is not '':
-                brand = request.args['brand']
-                real_manufacturer = check_manufacturer(brand)
-                if real_manufacturer is not '':
-                    cars: dict = request_cars(brand=real_manufacturer)
-                    r = Response(json.dumps(cars, sort_keys=True), mimetype='application/json; charset=utf-8')
-                    return r
-                else:
-                    raise api_exceptions.InvalidUsage(status_code=500, error_code=5001,
-                                                      message=("Couldn't find any brand matching: {}".format(brand)))
+                real_manufacturer = resolve_brand(request.args['brand'])
+                snapshot = catalogue_snapshots.get(name=cars_name(brand=real_manufacturer),
+                                                   build=lambda: request_cars(brand=real_manufacturer))
+                return snapshot_response(snapshot)
             else:
                 raise api_exceptions.InvalidUsage(status_code=500, error_code=5001,
                                                   message=("Couldn't find any cars for the request"))
 
         elif 'request' in request.args and str(request.args['request']).strip() == 'categories':
-            categories = request_categories()
-            r = Response(json.dumps(categories, sort_keys=True), mimetype='application/json; charset=utf-8')
-            return r
+            snapshot = catalogue_snapshots.get(name=categories_name(), build=request_categories)
+            return snapshot_response(snapshot)
         else:
             raise api_exceptions.InvalidUsage(status_code=500, error_code=5001)
 
@@ -114,19 +117,56 @@ def basic_data():
         raise api_exceptions.InvalidUsage(status_code=500, error_code=5002)
 
 
+def resolve_brand(brand: str) -> str:
+    """
+    Resolves a requested brand to its manufacturer of car_brands.yml, the name the cars are imported with. Brands
+    written differently, e.g. 'bmw' and 'BMW', share their catalogue snapshots.
+    """
+    real_manufacturer = check_manufacturer(brand)
+    if real_manufacturer == '':
+        raise api_exceptions.InvalidUsage(status_code=500, error_code=5001,
+                                          message=("Couldn't find any brand matching: {}".format(brand)))
+    return real_manufacturer
+
+
+def snapshot_response(snapshot: CatalogueSnapshot) -> Response:
+    """
+    Answers with the serialized snapshot. Clients that send its ETag get a 304, clients that accept gzip get the
+    precompressed payload. The gzip payload has its own ETag, because it is a different representation.
+    """
+    if snapshot is None:
+        raise api_exceptions.InvalidUsage(status_code=500, error_code=5001,
+                                          message="Couldn't find any data for the request")
+    gzip = 'gzip' in request.accept_encodings
+    etag = snapshot.etag + '-gzip' if gzip else snapshot.etag
+    if etag in request.if_none_match:
+        r = Response(status=304)
+    elif gzip:
+        r = Response(snapshot.payload_gzip, mimetype='application/json; charset=utf-8')
+        r.headers['Content-Encoding'] = 'gzip'
+    else:
+        r = Response(snapshot.payload, mimetype='application/json; charset=utf-8')
+    r.set_etag(etag)
+    r.vary.add('Accept-Encoding')
+    return r
+
+
 @main_blueprint.route('/fuel', methods=['POST'])
 def route():
     if request.method == 'POST':
-        if 'request' in request.args and str(request.args['request']).strip() == 'route':
-            if 'application/json' in request.headers['Content-Type'] and request.is_json:
+        if 'request' in request.args and str(request.args['request']).strip() in ['route', 'routes']:
+            content_type = request.headers.get('Content-Type', '')
+            if 'application/octet-stream' in content_type or ('application/json' in content_type and request.is_json):
 
-                all_args = request.get_json(silent=True)
+                all_args = parse_wkb_request() if 'application/octet-stream' in content_type else \
+                    request.get_json(silent=True)
 
                 if all_args is None:
                     raise api_exceptions.InvalidUsage(status_code=500, error_code=4000)
 
                 try:
-                    schema(all_args)
+                    with stage_timer('validation'):
+                        schema(all_args)
                 except MultipleInvalid as error:
                     raise api_exceptions.InvalidUsage(status_code=500, error_code=4000, message=str(error))
                 # query stats
@@ -154,9 +194,24 @@ def route():
                     raise api_exceptions.InvalidUsage(status_code=500, error_code=4003)
 
                 are_required_geom_present(all_args['geometry'])
-                all_args['geometry'] = parse_geometries(all_args['geometry'])
-                route: dict = request_route_calculation(all_args)
-                r = Response(json.dumps(route, sort_keys=True), mimetype='application/json; charset=utf-8')
+                if str(request.args['request']).strip() == 'routes':
+                    with stage_timer('geometry'):
+                        all_args['geometry'] = parse_route_collection(all_args['geometry'])
+                    if 'format' in request.args and str(request.args['format']).strip() == 'ndjson':
+                        # One json line per route as soon as it is calculated
+                        r = Response(stream_with_context(request_batch_route_stream(all_args)),
+                                     mimetype='application/x-ndjson; charset=utf-8')
+                        return r
+                    elif 'format' in request.args and str(request.args['format']).strip() != 'json':
+                        raise api_exceptions.InvalidUsage(status_code=500, error_code=5001,
+                                                          message='Wrong format argument. Use json or ndjson')
+                    routes: str = request_batch_route_calculation(all_args)
+                    r = Response(routes, mimetype='application/json; charset=utf-8')
+                    return r
+                with stage_timer('geometry'):
+                    all_args['geometry'] = parse_geometries(all_args['geometry'])
+                route: str = request_route_calculation(all_args)
+                r = Response(route, mimetype='application/json; charset=utf-8')
                 return r
             else:
                 raise api_exceptions.InvalidUsage(status_code=500, error_code=4006)
@@ -166,6 +221,21 @@ def route():
         raise api_exceptions.InvalidUsage(status_code=500, error_code=5002)
 
 
+@main_blueprint.route('/metrics', methods=['GET'])
+def metrics():
+    lines = stage_histogram.expose()
+    cache_statistics = route_cache.statistics()
+    for name, metric_type, documentation in [('hits', 'counter', 'Routes answered from the route cache'),
+                                             ('misses', 'counter', 'Routes calculated despite the route cache'),
+                                             ('size', 'gauge', 'Routes kept in the route cache')]:
+        metric = 'ofs_route_cache_{}'.format(name)
+        lines.append('# HELP {} {}'.format(metric, documentation))
+        lines.append('# TYPE {} {}'.format(metric, metric_type))
+        lines.append('{} {}'.format(metric, cache_statistics[name]))
+    r = Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4; charset=utf-8')
+    return r
+
+
 def request_categories():
     return_categories = {}
     categories: {} = Wikipedia().get_categories(ordered=True)
@@ -196,55 +266,200 @@ def request_car_ids(brand: str, source: str):
     return cars
 
 
-def request_route_calculation(all_args: dict) -> {}:
+def request_route_calculation(all_args: dict) -> str:
     # Prepare the data and filters
     geom = all_args['geometry']['geom']
     filters = all_args['geometry']['filters']
     filters = Filters(filters=filters)
     request_id = filters.request_id
     data_source = filters.data_source
-    route: {} = calculate_route(geom=geom, filters=filters, data_source=data_source, request_id=request_id)
+    route: str = calculate_route(geom=geom, filters=filters, data_source=data_source, request_id=request_id)
     return route
 
 
-def parse_geometries(geometry):
+def request_batch_route_calculation(all_args: dict) -> str:
+    # Prepare the data and filters once for all routes
+    geoms = all_args['geometry']['geoms']
+    request_ids = all_args['geometry']['request_ids']
+    filters = all_args['geometry']['filters']
+    filters = Filters(filters=filters)
+    data_source = filters.data_source
+    routes: str = calculate_routes(geoms=geoms, filters=filters, data_source=data_source, request_ids=request_ids)
+    return routes
+
+
+def request_batch_route_stream(all_args: dict):
+    # Prepare the data and filters once for all routes, the routes are serialized one by one
+    geoms = all_args['geometry']['geoms']
+    request_ids = all_args['geometry']['request_ids']
+    filters = Filters(filters=all_args['geometry']['filters'])
+    data_source = filters.data_source
+    for route in iterate_routes(geoms=geoms, filters=filters, data_source=data_source, request_ids=request_ids,
+                                on_error=route_error):
+        yield route + '\n'
+
+
+def route_error(error: Exception, request_id=None) -> str:
     """
-    Parses the geometries to geojson objects and checks them for validity.
-    :param geometry: Request parameters from get or post request
-    :return: returns processed request parameters
+    Serializes the error of a single route of a streamed batch. The status of the response is already sent, so the
+    error is sent as the line of the route and the following routes are still answered.
     """
+    if not isinstance(error, api_exceptions.InvalidUsage):
+        logger.exception('A route of a streamed batch failed')
+        error = api_exceptions.InvalidUsage(status_code=500, error_code=4099)
+    error_line = error.to_dict()
+    if request_id is not None:
+        error_line['request_id'] = request_id
+    return json.dumps(error_line, sort_keys=True)
 
-    # parse geojson
-    if 'geojson' in geometry:
 
-        s = json.dumps(geometry['geojson'])
-        # Convert to geojson.geometry
+def parse_wkb_request() -> dict:
+    """
+    Builds the request parameters of a post request with a WKB body. The filters are passed as json in the
+    filters query argument.
+    :return: returns the request parameters like a json request
+    """
+    geometry = dict(wkb=request.get_data())
+    if 'filters' in request.args:
         try:
-            g1 = geojson.loads(s)
+            geometry['filters'] = json.loads(request.args['filters'])
         except ValueError as e:
-            raise api_exceptions.InvalidUsage(status_code=500, error_code=4007, message=str(e))
+            raise api_exceptions.InvalidUsage(status_code=500, error_code=4000, message=str(e))
+    return {'request': str(request.args['request']).strip(), 'geometry': geometry}
 
-        # Feed to shape() to convert to shapely.geometry.linestring.LineString
-        # This will invoke its __geo_interface__ (https://gist.github.com/sgillies/2217756)
-        try:
-            g2 = shape(g1)
-        except ValueError as e:
-            raise api_exceptions.InvalidUsage(status_code=500, error_code=4007, message=str(e))
 
-        # parse geom if valid
-        geojson_obj = check_validity(g2)
+def parse_geometries(geometry):
+    """
+    Parses the geometry input to a valid shapely LineString. Accepts a geojson LineString, a coordinate array,
+    an encoded polyline or a WKB body.
+    :param geometry: Request parameters from get or post request
+    :return: returns processed request parameters
+    """
+    if 'geojson' in geometry:
+        geometry['geom'] = parse_linestring(geometry['geojson'])
+    elif 'coordinates' in geometry:
+        geometry['geom'] = parse_coordinates(geometry['coordinates'])
+    elif 'polyline' in geometry:
+        geometry['geom'] = parse_polyline(geometry['polyline'], precision=geometry.get('polyline_precision', 5))
+    elif 'wkb' in geometry:
+        geometry['geom'] = check_linestring(parse_wkb(geometry['wkb']))
+    return geometry
+
 
-        if geojson_obj.geom_type == 'LineString':
-            pass
+def parse_route_collection(geometry):
+    """
+    Parses a FeatureCollection or a list of LineStrings to a list of shapely LineStrings. A request_id in the
+    properties of a Feature overrides the shared request_id of the filters for that route.
+    Lists of coordinate arrays or encoded polylines and a WKB MultiLineString or GeometryCollection are accepted too.
+    :param geometry: Request parameters from post request
+    :return: returns processed request parameters holding the geoms and request_ids lists
+    """
+    shared_request_id = geometry['filters']['request_id'] if 'request_id' in geometry['filters'] else None
+    if 'geojson' not in geometry:
+        if 'coordinates' in geometry:
+            geoms = [parse_coordinates(coordinates) for coordinates in geometry['coordinates']]
+        elif 'polyline' in geometry:
+            polylines = geometry['polyline'] if isinstance(geometry['polyline'], list) else [geometry['polyline']]
+            geoms = [parse_polyline(polyline, precision=geometry.get('polyline_precision', 5)) for polyline in
+                     polylines]
         else:
-            # type not supported
-            raise api_exceptions.InvalidUsage(error_code=4007,
-                                              message='GeoJSON type {} not supported'.format(geojson_obj.geom_type),
-                                              status_code=500)
+            route_collection = parse_wkb(geometry['wkb'])
+            geoms = [check_linestring(part) for part in getattr(route_collection, 'geoms', [route_collection])]
+        if len(geoms) == 0:
+            raise api_exceptions.InvalidUsage(status_code=500, error_code=4010)
+        geometry['geoms'] = geoms
+        geometry['request_ids'] = [shared_request_id] * len(geoms)
+        return geometry
+
+    route_collection = geometry['geojson']
+    if isinstance(route_collection, dict) and route_collection.get('type') == 'FeatureCollection':
+        route_collection = route_collection.get('features')
+    if not isinstance(route_collection, list) or len(route_collection) == 0:
+        raise api_exceptions.InvalidUsage(status_code=500, error_code=4010)
+
+    geoms = []
+    request_ids = []
+    for route_geojson in route_collection:
+        request_id = shared_request_id
+        if isinstance(route_geojson, dict) and route_geojson.get('type') == 'Feature':
+            properties = route_geojson.get('properties') or {}
+            if 'request_id' in properties:
+                request_id = properties['request_id']
+            route_geojson = route_geojson.get('geometry')
+        geoms.append(parse_linestring(route_geojson))
+        request_ids.append(request_id)
+    geometry['geoms'] = geoms
+    geometry['request_ids'] = request_ids
+    return geometry
 
-        geometry['geom'] = geojson_obj
 
-    return geometry
+def parse_linestring(route_geojson):
+    """
+    Parses a single geojson geometry to a valid shapely LineString in one pass over its coordinates.
+    :param route_geojson: geojson geometry from the request
+    :return: returns the shapely LineString
+    """
+    if not isinstance(route_geojson, dict) or 'type' not in route_geojson:
+        raise api_exceptions.InvalidUsage(status_code=500, error_code=4007)
+    if route_geojson['type'] != 'LineString':
+        # type not supported
+        raise api_exceptions.InvalidUsage(error_code=4007,
+                                          message='GeoJSON type {} not supported'.format(route_geojson['type']),
+                                          status_code=500)
+    return parse_coordinates(route_geojson.get('coordinates'))
+
+
+def parse_coordinates(coordinates) -> LineString:
+    """
+    Parses a list of lngLat coordinates straight into a valid shapely LineString.
+    :param coordinates: list of [longitude, latitude] or [longitude, latitude, elevation] positions
+    :return: returns the shapely LineString
+    """
+    try:
+        vertices = numpy.asarray(coordinates, dtype=float)
+    except (TypeError, ValueError) as e:
+        raise api_exceptions.InvalidUsage(status_code=500, error_code=4007, message=str(e))
+    if vertices.ndim != 2 or len(vertices) < 2 or vertices.shape[1] not in [2, 3]:
+        raise api_exceptions.InvalidUsage(status_code=500, error_code=4007,
+                                          message='Coordinates must hold at least two lngLat positions')
+    return check_validity(LineString(vertices))
+
+
+def parse_polyline(polyline: str, precision: int = 5) -> LineString:
+    """
+    Decodes an encoded polyline to a valid shapely LineString.
+    :param polyline: encoded polyline in latLng order
+    :param precision: number of decimals the polyline was encoded with
+    :return: returns the shapely LineString
+    """
+    try:
+        coordinates = decode_polyline(str(polyline), precision=int(precision))
+    except (UnicodeEncodeError, ValueError) as e:
+        raise api_exceptions.InvalidUsage(status_code=500, error_code=4007, message=str(e))
+    return parse_coordinates(coordinates)
+
+
+def parse_wkb(wkb_bytes: bytes) -> BaseGeometry:
+    """
+    Parses a WKB request body to a shapely geometry.
+    :param wkb_bytes: the raw request body
+    :return: returns the shapely geometry
+    """
+    try:
+        return wkb.loads(wkb_bytes)
+    except Exception as e:
+        raise api_exceptions.InvalidUsage(status_code=500, error_code=4007, message='Invalid WKB: {}'.format(e))
+
+
+def check_linestring(geom: BaseGeometry) -> LineString:
+    """
+    Checks if a parsed geometry is a valid LineString, throws exception otherwise.
+    """
+    if geom.geom_type != 'LineString':
+        raise api_exceptions.InvalidUsage(error_code=4007,
+                                          message='Geometry type {} not supported'.format(geom.geom_type),
+                                          status_code=500)
+    return check_validity(geom)
 
 
 def are_required_geom_present(geometry):
@@ -252,7 +467,7 @@ def are_required_geom_present(geometry):
     Checks if enough geometry options are are present in request.
     :param geometry: Geometry parameters from  post request
     """
-    if 'geojson' not in geometry:
+    if not any(geometry_input in geometry for geometry_input in ['geojson', 'coordinates', 'polyline', 'wkb']):
         raise api_exceptions.InvalidUsage(status_code=500, error_code=4005)
 
 
@@ -1,13 +1,83 @@
+import json
+
 from openfuelservice.server import eurostat_attribution, carfueldata_attribution, envirocar_attribution, ofs_settings
 from openfuelservice.server.base_calculations import envirocar, cfd
+from openfuelservice.server.base_calculations.country_index import reset_country_index
+from openfuelservice.server.base_calculations.data_provider import DataProvider, set_data_provider
+from openfuelservice.server.base_calculations.fuel_model_registry import fuel_model_registry
+from openfuelservice.server.base_calculations.objects import PriceCollection, route_splitting
+from openfuelservice.server.base_calculations.route_cache import route_cache
 from openfuelservice.server.objects import Filters
+from openfuelservice.server.utils.processing.timing import stage_timer
 
 
 def __init__():
     pass
 
 
-def calculate_route(geom, filters: Filters, data_source: str = 'cfd', request_id: str = None) -> dict:
+def use_data_provider(provider: DataProvider):
+    """
+    Switches the data provider of the worker and drops everything that was built from the previous one: the country
+    index, the fuel models and the cached routes.
+
+    :param provider: The new data provider, e.g. a MemoryDataProvider
+    """
+    set_data_provider(provider)
+    reset_country_index()
+    fuel_model_registry.clear()
+    route_cache.clear()
+
+
+def parse_fuel_models(filters: Filters, data_source: str = 'cfd') -> list:
+    """
+    Builds the fuel models for the given filters. The result can be shared between all routes of a request.
+
+    :param filters: The processing filters
+    :param data_source: ec or cfd
+    :return: Returns a list of fuel models matching the calculation of the data source
+    """
+    with stage_timer('fuel_models'):
+        if data_source == 'ec' or data_source is None:
+            return envirocar.parse_ec_category_models(filters=filters, categories=filters.vehicle_categories)
+        elif data_source == 'cfd':
+            if filters.cfd_ids is not None:
+                return cfd.parse_cfd_id_model(filters=filters)
+            return cfd.parse_cfd_category_models(filters=filters, categories=filters.vehicle_categories)
+        return []
+
+
+def serialize_route(route: dict or None, request_id: str = None) -> str:
+    """
+    Returns the json of a route result with the request id of the current request. Cached routes are kept without
+    their request id, so the id is set on a copy and the cached result is left unchanged.
+    """
+    if route is not None and request_id is not None:
+        route = dict(route, request_id=request_id)
+    with stage_timer('serialization'):
+        return json.dumps(route, sort_keys=True)
+
+
+def calculate_route(geom, filters: Filters, data_source: str = 'cfd', request_id: str = None,
+                    fuel_models: list = None, price_collection: PriceCollection = None) -> str:
+    """
+    Calculates a single route and returns its json. Results are kept in the route cache without their request id, so
+    a resubmitted route with the same filters skips the calculation.
+    """
+    cache_key = None
+    if route_cache.enabled:
+        cache_key = route_cache.key(geom=geom, filters=filters, data_source=data_source)
+        route = route_cache.get(cache_key)
+        if route is not None:
+            return serialize_route(route=route, request_id=request_id)
+    route = build_route(geom=geom, filters=filters, data_source=data_source, fuel_models=fuel_models,
+                        price_collection=price_collection)
+    if route is not None and route_cache.enabled:
+        route_cache.put(cache_key, route)
+    return serialize_route(route=route, request_id=request_id)
+
+
+def build_route(geom, filters: Filters, data_source: str = 'cfd', fuel_models: list = None,
+                price_collection: PriceCollection = None) -> dict:
     return_dict = dict()
     driving_style = filters.driving_style
     return_dict['general'] = dict()
@@ -18,13 +88,16 @@ def calculate_route(geom, filters: Filters, data_source: str = 'cfd', request_id
     return_dict['general']['vehicle_type'] = filters.vehicle_type
     return_dict['general']['vehicle_categories'] = filters.vehicle_categories
     return_dict['general']['data_source'] = filters.data_source
-    if request_id is not None:
-        return_dict['request_id'] = request_id
     if filters.year is not None:
         return_dict['general']['min_calculation_year'] = filters.year
 
+    if fuel_models is None:
+        fuel_models = parse_fuel_models(filters=filters, data_source=data_source)
     if data_source == 'ec' or data_source is None:
-        result: dict = envirocar.AdvancedDistanceCalculation(geom=geom, filters=filters).calculate_cost()
+        calculation = envirocar.AdvancedDistanceCalculation(geom=geom, filters=filters, fuel_models=fuel_models,
+                                                            price_collection=price_collection)
+        with stage_timer('calculation'):
+            result: dict = calculation.calculate_cost()
         return_dict['fuel_stats'] = result
 
         return_dict['attributions'] = dict()
@@ -32,10 +105,15 @@ def calculate_route(geom, filters: Filters, data_source: str = 'cfd', request_id
         return_dict['attributions']['ec_data_attribution'] = envirocar_attribution
         return return_dict
     elif data_source == 'cfd':
-        if filters.cfd_ids is not None and len(filters.cfd_ids) > 0:
-            result: dict = cfd.DistanceCalculation(geom=geom, filters=filters).calculate_individual_cfd_cost()
-        else:
-            result: dict = cfd.DistanceCalculation(geom=geom, filters=filters).calculate_category_cost()
+        calculation = cfd.DistanceCalculation(geom=geom, filters=filters, fuel_models=fuel_models,
+                                              price_collection=price_collection)
+        with stage_timer('calculation'):
+            if filters.cfd_ids is not None and len(filters.cfd_ids) > 0 and filters.fleet:
+                result: dict = calculation.calculate_fleet_cost()
+            elif filters.cfd_ids is not None and len(filters.cfd_ids) > 0:
+                result: dict = calculation.calculate_individual_cfd_cost()
+            else:
+                result: dict = calculation.calculate_category_cost()
         return_dict['fuel_stats'] = result
 
         return_dict['attributions'] = dict()
@@ -43,3 +121,56 @@ def calculate_route(geom, filters: Filters, data_source: str = 'cfd', request_id
         return_dict['attributions']['cfd_data_attribution'] = carfueldata_attribution
         return_dict['attributions']['ec_data_attribution'] = envirocar_attribution
         return return_dict
+
+
+def calculate_routes(geoms: list, filters: Filters, data_source: str = 'cfd', request_ids: list = None) -> str:
+    """
+    Calculates many routes with shared filters. The fuel models are only build once and then applied to every route.
+    With the 'python' route splitting the latest prices of all crossed countries are queried once as well.
+
+    :param geoms: List of valid shapely LineStrings
+    :param filters: The processing filters shared by all routes
+    :param data_source: ec or cfd
+    :param request_ids: Optional list of request ids in the order of the geoms
+    :return: Returns the json of an object with the list of the route results, one per geometry
+    """
+    routes = iterate_routes(geoms=geoms, filters=filters, data_source=data_source, request_ids=request_ids)
+    return '{{"routes": [{}]}}'.format(', '.join(routes))
+
+
+def iterate_routes(geoms: list, filters: Filters, data_source: str = 'cfd', request_ids: list = None,
+                   on_error=None):
+    """
+    Like calculate_routes, but yields the json of every route result as soon as it is calculated. Cached routes are
+    yielded without building any fuel model. The fuel models and the prices are built at the first route that is not
+    cached.
+
+    :param on_error: Optional function that turns the exception of a single route and its request id into the json
+    yielded for that route, so the remaining routes are still calculated. Without it the exception is raised.
+    :return: Returns a generator of the serialized route results in the order of the geoms
+    """
+    fuel_models: list = None
+    price_collection: PriceCollection = None
+    for index, geom in enumerate(geoms):
+        request_id = request_ids[index] if request_ids is not None else filters.request_id
+        try:
+            cache_key = route_cache.key(geom=geom, filters=filters, data_source=data_source) \
+                if route_cache.enabled else None
+            route = route_cache.get(cache_key) if cache_key is not None else None
+            if route is None:
+                if fuel_models is None:
+                    fuel_models = parse_fuel_models(filters=filters, data_source=data_source)
+                    # The remaining routes share the price query
+                    price_collection = PriceCollection(line_strings=geoms[index:]) \
+                        if route_splitting == 'python' else None
+                route = build_route(geom=geom, filters=filters, data_source=data_source, fuel_models=fuel_models,
+                                    price_collection=price_collection)
+                if cache_key is not None and route is not None:
+                    route_cache.put(cache_key, route)
+            serialized_route = serialize_route(route=route, request_id=request_id)
+        except Exception as err:
+            if on_error is None:
+                raise
+            yield on_error(err, request_id)
+            continue
+        yield serialized_route
@@ -1,35 +1,31 @@
 from datetime import date
 
-from numpy.core.multiarray import ndarray
+import numpy
 from shapely.geometry import LineString
 
-from openfuelservice.server import category_list, ofs_settings
-from openfuelservice.server.base_calculations.envirocar import EnvirocarFuelModel, parse_ec_category_models
+from openfuelservice.server import category_list, ofs_settings, allowed_fuel_types
+from openfuelservice.server.base_calculations.data_provider import get_data_provider
+from openfuelservice.server.base_calculations.envirocar import EnvirocarFuelModel, parse_ec_category_models, \
+    get_ec_category_models, requested_categories
+from openfuelservice.server.base_calculations.fuel_model_registry import fuel_model_registry
 from openfuelservice.server.base_calculations.objects import Route, CountryLinePrice, GeneralLinePrice, \
-    LinePriceCalculationObject
-from openfuelservice.server.base_calculations.queries import query_cfd_average_category_statistics, query_cfd_category, \
-    query_category_for_category_short, query_cfd_model
+    LinePriceCalculationObject, PriceCollection
+from openfuelservice.server.base_calculations.route_matrix import RouteCostMatrix, as_float, sequential_sum
 from openfuelservice.server.db_import.models import CarFuelDataAverageCategoryStatisticsModel, CarCategoryModel, \
     CarfuelDataCarModel
 from openfuelservice.server.objects import Filters
-from openfuelservice.server.utils.database.queries import CarFuelData
-from openfuelservice.server.utils.misc.geometries import true_linestring_length
+from openfuelservice.server.utils.processing.timing import stage_timer
 
 standard_epsg = ofs_settings['general']['advanced_settings']['standard_epsg']
 vehicle_categories = category_list['car_categories']
 
 
 def parse_cfd_id_model(filters):
-    fuel_type: str = filters.fuel_type
     cfd_ids = filters.cfd_ids
-    ec_fuel_models: dict = {}
-    cfd_db_models = []
     cfd_car_fuel_models = []
     ec_categories = []
-    cfd_id_categories = CarFuelData().get_cfd_categories(cfd_ids=cfd_ids)
-    for cfd_id in cfd_ids:
-        cfd_model = query_cfd_model(cfd_id=cfd_id)
-        cfd_db_models.append(cfd_model)
+    cfd_db_models: [CarfuelDataCarModel] = get_data_provider().cfd_models(cfd_ids=cfd_ids)
+    cfd_id_categories = get_data_provider().categories_of_cars(cfd_cars=cfd_db_models)
     for cfd_id in cfd_id_categories:
         categories = cfd_id_categories[cfd_id]
         ec_categories.extend(category for category in categories if category not in ec_categories)
@@ -37,7 +33,7 @@ def parse_cfd_id_model(filters):
                                                       filters=filters)
     cfd_model: CarfuelDataCarModel
     for cfd_model in cfd_db_models:
-        cfd_categories: str = cfd_id_categories[cfd_model.hash_id]
+        cfd_categories: [str] = cfd_id_categories[cfd_model.hash_id]
         cfd_ec_fuel_models = []
         for category in ordered_ec_fuel_models:
             if category in cfd_categories and len(ordered_ec_fuel_models[category]) > 0:
@@ -47,36 +43,46 @@ def parse_cfd_id_model(filters):
     return cfd_car_fuel_models
 
 
+def build_cfd_category_models(keys: [tuple]) -> dict:
+    """
+    Builds the fuel models of many categories with a single statistics query on top of the envirocar fuel models of
+    the same categories.
+
+    :param keys: Registry keys ('cfd', fuel_type, category, year) of one fuel type and year. The category may be 'all'.
+    :return: Returns a dict of the keys and the list of fuel models of their category
+    """
+    fuel_type: str = keys[0][1]
+    year: int = keys[0][3]
+    categories: [str] = [key[2] for key in keys]
+    ordered_ec_fuel_models = get_ec_category_models(fuel_type=fuel_type, categories=categories)
+    statistics: list = get_data_provider().cfd_category_statistics(
+        fuel_type=fuel_type, categories=None if 'all' in categories else categories)
+    cfd_ordered_av_cat_statistics = dict()
+    for average_category_statistic in statistics:
+        category_short_eu: str = average_category_statistic.category_short_eu
+        if category_short_eu not in cfd_ordered_av_cat_statistics:
+            cfd_ordered_av_cat_statistics[category_short_eu] = []
+        cfd_ordered_av_cat_statistics[category_short_eu].append(average_category_statistic)
+
+    cfd_fuel_models = {category: [] for category in categories}
+    for category_short_eu in cfd_ordered_av_cat_statistics:
+        if category_short_eu in ordered_ec_fuel_models and len(ordered_ec_fuel_models[category_short_eu]) > 0:
+            fuel_model: CFDAverageFuelModel = CFDAverageFuelModel(
+                ec_fuel_model=ordered_ec_fuel_models[category_short_eu][0],
+                category_statistics=cfd_ordered_av_cat_statistics[category_short_eu],
+                category_short_eu=category_short_eu, year=year)
+            if 'all' in cfd_fuel_models:
+                cfd_fuel_models['all'].append(fuel_model)
+            if category_short_eu in cfd_fuel_models:
+                cfd_fuel_models[category_short_eu].append(fuel_model)
+    return {key: cfd_fuel_models[key[2]] for key in keys}
+
+
 def parse_cfd_category_models(filters, categories: list) -> []:
-    fuel_type: str = filters.fuel_type
-    ec_fuel_models: dict = {}
+    keys = [('cfd', filters.fuel_type, category, filters.year) for category in requested_categories(categories)]
     cfd_fuel_models: list = []
-    cfd_ordered_av_cat_statistics = dict()
-    year = filters.year
-    ordered_ec_fuel_models = parse_ec_category_models(categories=categories, ordered_categories=True, filters=filters)
-    if 'all' in categories:
-        cfd_query: list = query_cfd_average_category_statistics(fuel_type=fuel_type)
-    else:
-        cfd_query = []
-        for category in categories:
-            category_query = query_cfd_category(fuel_type=fuel_type, category=category)
-            cfd_query.extend(category_query)
-
-    average_category_statistic: CarFuelDataAverageCategoryStatisticsModel
-    for average_category_statistic in cfd_query:
-        category: str = average_category_statistic.category_short_eu
-        if category not in cfd_ordered_av_cat_statistics:
-            cfd_ordered_av_cat_statistics[category] = []
-        cfd_ordered_av_cat_statistics[category].append(average_category_statistic)
-
-    category: str
-    for category in cfd_ordered_av_cat_statistics:
-        if category in ordered_ec_fuel_models and len(ordered_ec_fuel_models[category]) > 0:
-            category_statistics: [CarFuelDataAverageCategoryStatisticsModel] = cfd_ordered_av_cat_statistics[category]
-            fuel_model: CFDAverageFuelModel = CFDAverageFuelModel(ec_fuel_model=ordered_ec_fuel_models[category][0],
-                                                                  category_statistics=category_statistics,
-                                                                  category_short_eu=category, year=year)
-            cfd_fuel_models.append(fuel_model)
+    for category_fuel_models in fuel_model_registry.get_many(keys=keys, build=build_cfd_category_models):
+        cfd_fuel_models.extend(category_fuel_models)
     return cfd_fuel_models
 
 
@@ -203,6 +209,80 @@ class CarFuelModel(object):
             return calculation_object
 
 
+class FleetFuelModel(object):
+    def __init__(self, car_fuel_models: [CarFuelModel], kmh: int, manual_consumption_per_100km: float = None):
+        """
+        Stacks the consumption and emission values of many individual cars into vectors with one row per car.
+        The growth factors only depend on the driving speed, so every envirocar model is evaluated once for the whole
+        fleet, no matter how many cars share it or how many segments the route has.
+
+        :param car_fuel_models: The individual cars of the fleet
+        :param kmh: The average driving speed of the route
+        :param manual_consumption_per_100km: Optional consumption that replaces the consumption of every car
+        """
+        self.car_fuel_models: [CarFuelModel] = car_fuel_models
+        self.fuel_types: [str] = [car_fuel_model.fuel_type for car_fuel_model in car_fuel_models]
+        growth_factors = dict()
+        fuel_factors, co2_factors, ec_sensors = [], [], []
+        for car_fuel_model in car_fuel_models:
+            fuel_consumption_growth_factors, co2_consumption_growth_factors = [], []
+            ec_categories = dict()
+            for ec_fuel_model in car_fuel_model.ec_fuel_models:
+                if id(ec_fuel_model) not in growth_factors:
+                    growth_factors[id(ec_fuel_model)] = ec_fuel_model.get_consumption_growth_factor(
+                        start_speed=car_fuel_model.average_speed, dest_speed=kmh)
+                fuel, co2 = growth_factors[id(ec_fuel_model)]
+                fuel_consumption_growth_factors.append(fuel)
+                co2_consumption_growth_factors.append(co2)
+                if ec_fuel_model.category_short_eu not in ec_categories:
+                    ec_categories[ec_fuel_model.category_short_eu] = ec_fuel_model.number_sensors
+            if len(fuel_consumption_growth_factors) > 0:
+                fuel_factors.append(sum(fuel_consumption_growth_factors) / len(fuel_consumption_growth_factors))
+                co2_factors.append(sum(co2_consumption_growth_factors) / len(co2_consumption_growth_factors))
+            else:
+                fuel_factors.append(numpy.nan)
+                co2_factors.append(numpy.nan)
+            ec_sensors.append(sum(ec_categories.values()))
+        self.ec_sensors: [int] = ec_sensors
+
+        def car_values(attribute: str) -> numpy.ndarray:
+            return numpy.array([getattr(car_fuel_model, attribute) or 0 for car_fuel_model in car_fuel_models],
+                               dtype=float)
+
+        average_fuel_consumption_100_km = car_values('average_fuel_consumption_100_km')
+        emissions_co2_g_per_km = car_values('emissions_co2_g_per_km')
+        emissions_co_mg_per_km = car_values('emissions_co_mg_per_km')
+        emissions_nox_mg_per_km = car_values('emissions_nox_mg_per_km')
+        emissions_thc_mg_per_km = car_values('emissions_thc_mg_per_km')
+        fuel_factor = numpy.array(fuel_factors, dtype=float)
+        co2_factor = numpy.array(co2_factors, dtype=float)
+        # The same conditions under which a single CarFuelModel skips its calculation
+        self.valid: numpy.ndarray = (average_fuel_consumption_100_km != 0) & (emissions_co2_g_per_km != 0) & (
+                emissions_co_mg_per_km != 0) & (emissions_nox_mg_per_km != 0) & (emissions_thc_mg_per_km != 0) & (
+                                            ~numpy.isnan(fuel_factor))
+        if manual_consumption_per_100km is not None:
+            average_fuel_consumption_100_km = numpy.full(len(car_fuel_models), manual_consumption_per_100km,
+                                                         dtype=float)
+        average_fuel_consumption_per_km = average_fuel_consumption_100_km / 100
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            self.liter_per_km = (average_fuel_consumption_per_km * fuel_factor) + average_fuel_consumption_per_km
+            self.co2_gram_per_km = (emissions_co2_g_per_km * co2_factor) + emissions_co2_g_per_km
+            self.co_mg_per_km = (emissions_co_mg_per_km * fuel_factor) + emissions_co_mg_per_km
+            self.nox_mg_per_km = (emissions_nox_mg_per_km * fuel_factor) + emissions_nox_mg_per_km
+            self.thc_mg_per_km = (emissions_thc_mg_per_km * fuel_factor) + emissions_thc_mg_per_km
+            self.co2_gram_per_liter = self.co2_gram_per_km / self.liter_per_km
+            self.co_mg_per_liter = self.co_mg_per_km / self.liter_per_km
+            self.nox_mg_per_liter = self.nox_mg_per_km / self.liter_per_km
+            self.thc_mg_per_liter = self.thc_mg_per_km / self.liter_per_km
+        self.liter_per_100_km = self.liter_per_km * 100
+
+    def segment_matrix(self, per_km: numpy.ndarray, length_m: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the values of every car on every segment with the shape (cars, segments).
+        """
+        return numpy.outer(per_km, length_m * 0.0010000)
+
+
 class AverageFuelModel(object):
     def __init__(self, ec_fuel_model: EnvirocarFuelModel, category_statistics: []):
         self.ec_fuel_model: EnvirocarFuelModel = ec_fuel_model
@@ -322,14 +402,17 @@ class CFDAverageFuelModel(AverageFuelModel):
 
 class DistanceCalculation(Route):
     # Entry Point
-    def __init__(self, geom: LineString, filters: Filters):
-        super().__init__(geom=geom, filters=filters)
+    def __init__(self, geom: LineString, filters: Filters, fuel_models: list = None,
+                 price_collection: PriceCollection = None):
+        super().__init__(geom=geom, filters=filters, price_collection=price_collection)
         if filters.driving_speed is None:
             driving_style: str = self.filters.driving_style
             self.average_speed: int = ofs_settings['general']['advanced_settings']['average_speeds'][driving_style]
         else:
             self.average_speed = filters.driving_speed
-        if filters.cfd_ids is not None:
+        if fuel_models is not None:
+            self.fuel_models: [CarFuelModel or CFDAverageFuelModel] = fuel_models
+        elif filters.cfd_ids is not None:
             self.fuel_models: [CarFuelModel] = parse_cfd_id_model(filters=self.filters)
         else:
             self.fuel_models: [CFDAverageFuelModel] = parse_cfd_category_models(filters=self.filters,
@@ -367,7 +450,7 @@ class DistanceCalculation(Route):
                 category_object.category_name_de = 'Individuell'
                 category_object.category_name_en = 'individual'
             else:
-                category_object: CarCategoryModel = query_category_for_category_short(category_short_eu=category_short)
+                category_object: CarCategoryModel = get_data_provider().category(category_short_eu=category_short)
             if category_short not in route_result:
                 route_result[category_short] = dict()
                 route_result[category_short]['total_emissions'] = dict()
@@ -434,7 +517,7 @@ class DistanceCalculation(Route):
                     cost_tax += price_calculation.fuel_cost_tax
                     cost_wo_tax += price_calculation.fuel_cost_wo_tax
 
-                length_m = true_linestring_length(linestring=price_model.linestring)
+                length_m = price_model.get_length_m()
                 total_km += length_m / 1000
                 fuel_calculation: CFDFuelCalculationObject = fuel_model.calculate_route(
                     kmh=self.average_speed, length_m=length_m)
@@ -521,19 +604,116 @@ class DistanceCalculation(Route):
         route_result[category_short]['route']['km'] = round(self.route_length/1000, 2)
         return route_result
 
+    def calculate_fleet_cost(self) -> dict:
+        """
+        Calculates every individual car of the request at once and returns one result per car together with the
+        totals of the whole fleet. Every car is calculated with the prices of its own fuel type.
+        """
+        tank_sizes: dict = self.filters.tank_sizes
+        fuel_consumptions = self.filters.fuel_consumptions
+        category_short = 'individual'
+        manual_consumption_per_100_km: float = None
+        if fuel_consumptions is not None and category_short in fuel_consumptions:
+            manual_consumption_per_100_km = float(fuel_consumptions[category_short])
+        if tank_sizes is None or category_short not in tank_sizes:
+            tank_size = int(vehicle_categories[category_short]['tank_capacity'])
+        else:
+            tank_size = int(tank_sizes[category_short])
+        car_fuel_models: [CarFuelModel] = [fuel_model for fuel_model in self.fuel_models if
+                                           type(fuel_model) == CarFuelModel]
+        cost_matrix: RouteCostMatrix = RouteCostMatrix(price_models=self.price_models)
+        fleet_result = dict()
+        fleet_result['vehicles'] = []
+        fleet_result['fleet'] = dict()
+        fleet_result['fleet']['cfd_cars'] = len(car_fuel_models)
+        fleet_result['fleet']['calculated_cars'] = 0
+        fleet_result['fleet']['manual_consumption'] = True if manual_consumption_per_100_km is not None else False
+        fleet_result['fleet']['total_emissions'] = dict(co2_kg=0, co_g=0, nox_g=0, thc_g=0)
+        fleet_result['fleet']['total_consumption'] = dict(liters=0)
+        fleet_result['fleet']['total_cost'] = dict(w_tax_euro=0, wo_tax_euro=0)
+        fleet_result['fleet']['route'] = dict(km=round(cost_matrix.total_km, 6))
+        if len(car_fuel_models) == 0:
+            return fleet_result
+
+        fleet = FleetFuelModel(car_fuel_models=car_fuel_models, kmh=self.average_speed,
+                               manual_consumption_per_100km=manual_consumption_per_100_km)
+        priced = numpy.array([fuel_type in allowed_fuel_types for fuel_type in fleet.fuel_types], dtype=bool)
+        rows = numpy.flatnonzero(fleet.valid & priced)
+        liters = fleet.segment_matrix(fleet.liter_per_km[rows], cost_matrix.length_m)
+        cost_tax, cost_wo_tax, total_liters = cost_matrix.calculate_costs(
+            liters=liters, fuel_types=[fleet.fuel_types[row] for row in rows], tank_sizes=[tank_size] * len(rows),
+            refuel_rounding='round')
+        total_co2_gram = sequential_sum(fleet.segment_matrix(fleet.co2_gram_per_km[rows], cost_matrix.length_m))
+        total_co_mg = sequential_sum(fleet.segment_matrix(fleet.co_mg_per_km[rows], cost_matrix.length_m))
+        total_nox_mg = sequential_sum(fleet.segment_matrix(fleet.nox_mg_per_km[rows], cost_matrix.length_m))
+        total_thc_mg = sequential_sum(fleet.segment_matrix(fleet.thc_mg_per_km[rows], cost_matrix.length_m))
+        price_date = cost_matrix.cost_date.strftime('%Y-%m-%dT%H:%M:%S') if cost_matrix.cost_date else None
+
+        calculated_rows = {int(row): index for index, row in enumerate(rows)}
+        for row, car_fuel_model in enumerate(car_fuel_models):
+            vehicle_result = dict()
+            vehicle_result['cfd_id'] = car_fuel_model.cfd_car_model.hash_id
+            vehicle_result['car_info'] = dict()
+            vehicle_result['car_info']['manufacturer'] = car_fuel_model.cfd_car_model.manufacturer
+            vehicle_result['car_info']['model'] = car_fuel_model.cfd_car_model.model
+            vehicle_result['car_info']['description'] = car_fuel_model.cfd_car_model.description
+            vehicle_result['car_info']['fuel_type'] = car_fuel_model.fuel_type
+            vehicle_result['car_info']['ec_sensors'] = fleet.ec_sensors[row]
+            fleet_result['vehicles'].append(vehicle_result)
+            if row not in calculated_rows:
+                vehicle_result['car_info']['calculation_errors'] = 'No fuel prices for the fuel type' if not priced[
+                    row] else 'Not enough data to calculate the car'
+                continue
+            index = calculated_rows[row]
+            vehicle_result['car_info']['calculation_errors'] = 'No Errors'
+            vehicle_result['total_emissions'] = dict()
+            vehicle_result['total_emissions']['co2_kg'] = round(float(total_co2_gram[index]) / 1000, 6)
+            vehicle_result['total_emissions']['co_g'] = round(float(total_co_mg[index]) / 1000, 6)
+            vehicle_result['total_emissions']['nox_g'] = round(float(total_nox_mg[index]) / 1000, 6)
+            vehicle_result['total_emissions']['thc_g'] = round(float(total_thc_mg[index]) / 1000, 6)
+            vehicle_result['total_consumption'] = dict()
+            vehicle_result['total_consumption']['liters'] = round(float(total_liters[index]), 2)
+            vehicle_result['total_cost'] = dict()
+            vehicle_result['total_cost']['w_tax_euro'] = round(float(cost_tax[index]), 2)
+            vehicle_result['total_cost']['wo_tax_euro'] = round(float(cost_wo_tax[index]), 2)
+            vehicle_result['total_cost']['price_date'] = price_date
+            vehicle_result['fuel_factors'] = dict()
+            vehicle_result['fuel_factors']['liter_per_100km'] = round(float(fleet.liter_per_100_km[row]), 1)
+            vehicle_result['fuel_factors']['co2_gram_per_km'] = round(float(fleet.co2_gram_per_km[row]), 6)
+            vehicle_result['fuel_factors']['co2_gram_per_liter'] = round(float(fleet.co2_gram_per_liter[row]), 6)
+            vehicle_result['fuel_factors']['co_mg_per_km'] = round(float(fleet.co_mg_per_km[row]), 6)
+            vehicle_result['fuel_factors']['co_mg_per_liter'] = round(float(fleet.co_mg_per_liter[row]), 6)
+            vehicle_result['fuel_factors']['nox_mg_per_km'] = round(float(fleet.nox_mg_per_km[row]), 6)
+            vehicle_result['fuel_factors']['nox_mg_per_liter'] = round(float(fleet.nox_mg_per_liter[row]), 6)
+            vehicle_result['fuel_factors']['thc_mg_per_km'] = round(float(fleet.thc_mg_per_km[row]), 6)
+            vehicle_result['fuel_factors']['thc_mg_per_liter'] = round(float(fleet.thc_mg_per_liter[row]), 6)
+
+        fleet_result['fleet']['calculated_cars'] = len(rows)
+        fleet_result['fleet']['total_emissions']['co2_kg'] = round(float(total_co2_gram.sum()) / 1000, 6)
+        fleet_result['fleet']['total_emissions']['co_g'] = round(float(total_co_mg.sum()) / 1000, 6)
+        fleet_result['fleet']['total_emissions']['nox_g'] = round(float(total_nox_mg.sum()) / 1000, 6)
+        fleet_result['fleet']['total_emissions']['thc_g'] = round(float(total_thc_mg.sum()) / 1000, 6)
+        fleet_result['fleet']['total_consumption']['liters'] = round(float(total_liters.sum()), 2)
+        fleet_result['fleet']['total_cost']['w_tax_euro'] = round(float(cost_tax.sum()), 2)
+        fleet_result['fleet']['total_cost']['wo_tax_euro'] = round(float(cost_wo_tax.sum()), 2)
+        fleet_result['fleet']['total_cost']['price_date'] = price_date
+        return fleet_result
+
     def calculate_category_cost(self) -> dict:
         # TODO Add the differentiation here if it is CarFuelModel or AverageFuelModel and split to two functions than
         tank_sizes: dict = self.filters.tank_sizes
         fuel_consumptions = self.filters.fuel_consumptions
         route_result = dict()
+        cost_matrix: RouteCostMatrix = RouteCostMatrix(price_models=self.price_models)
+        calculated_models: [CFDAverageFuelModel] = []
+        fuel_calculations: [CFDFuelCalculationObject] = []
+        row_tank_sizes: [int] = []
+        row_fuel_types: [str] = []
         fuel_model: CFDAverageFuelModel
-        # TODO get the route parts before!
         for fuel_model in self.fuel_models:
-            skip_category: bool = False
             category_short_eu = fuel_model.category_short_eu
             tank_size: int = None
             manual_consumption_per_100_km: float = None
-            fuel_type = fuel_model.fuel_type
             if fuel_consumptions is not None and category_short_eu in fuel_consumptions:
                 manual_consumption_per_100_km = float(fuel_consumptions[category_short_eu])
             if tank_sizes == None or category_short_eu not in tank_sizes:
@@ -541,167 +721,94 @@ class DistanceCalculation(Route):
             else:
                 tank_size = int(tank_sizes[category_short_eu])
 
-            category_object: CarCategoryModel = query_category_for_category_short(
-                category_short_eu=category_short_eu)
-            if category_short_eu not in route_result:
-                route_result[category_short_eu] = dict()
-                route_result[category_short_eu]['total_emissions'] = dict()
-                route_result[category_short_eu]['fuel_factors'] = dict()
-                route_result[category_short_eu]['total_consumption'] = dict()
-                route_result[category_short_eu]['total_cost'] = dict()
-                route_result[category_short_eu]['route'] = dict()
-
-                route_result[category_short_eu]['category_info'] = dict()
-                route_result[category_short_eu]['category_info']['en'] = category_object.category_name_en
-                route_result[category_short_eu]['category_info']['de'] = category_object.category_name_de
-                route_result[category_short_eu]['category_info'][
-                    'manual_consumption'] = True if manual_consumption_per_100_km is not None else False
-
-            result_liter_100: [float] or float = 0
-            cost_date: date = None
-            total_liters: [float] or float = 0
-
-            # Emission variables
-            total_co2_gram: [float] or float = 0
-            total_co_mg: [float] or float = 0
-            total_nox_mg: [float] or float = 0
-            total_thc_mg: [float] or float = 0
-            total_cfd_cars = 0
-            co2_gram_per_km = 0
-            co_mg_per_km = 0
-            nox_mg_per_km = 0
-            thc_mg_per_km = 0
-            co2_gram_per_liter = 0
-            co_mg_per_liter = 0
-            nox_mg_per_liter = 0
-            thc_mg_per_liter = 0
-            fuel_consumption_cars = 0
-
-            # Cost Variables
-            cost_tax: [float] or float = 0
-            cost_wo_tax: [float] or float = 0
-            total_km: [float] or float = 0
-
-            previous_price_model: CountryLinePrice = None
-            remaining_fuel: float = 0
-            for price_model in self.price_models:
-                price_model: CountryLinePrice or GeneralLinePrice
-                if previous_price_model == None:
-                    previous_price_model = price_model
-                remaining_fuel_cost_tax: float = 0
-                remaining_fuel_cost_wo_tax: float = 0
-                if remaining_fuel > 0:
-                    price_calculation: LinePriceCalculationObject = previous_price_model.calculate_cost(
-                        liter=remaining_fuel,
-                        fuel_type=fuel_type)
-                    previous_price_model = price_model
-                    cost_tax += price_calculation.fuel_cost_tax
-                    cost_wo_tax += price_calculation.fuel_cost_wo_tax
+            category_object: CarCategoryModel = get_data_provider().category(category_short_eu=category_short_eu)
+            route_result[category_short_eu] = dict()
+            route_result[category_short_eu]['category_info'] = dict()
+            route_result[category_short_eu]['category_info']['en'] = category_object.category_name_en
+            route_result[category_short_eu]['category_info']['de'] = category_object.category_name_de
+            route_result[category_short_eu]['category_info'][
+                'manual_consumption'] = True if manual_consumption_per_100_km is not None else False
 
-                length_m = true_linestring_length(linestring=price_model.linestring)
-                total_km += length_m / 1000
+            # One call per fuel model covers all segments of the route
+            with stage_timer('calculation.{}'.format(category_short_eu)):
                 fuel_calculation: CFDFuelCalculationObject = fuel_model.calculate_route(
-                    kmh=self.average_speed, length_m=length_m)
-                if fuel_calculation.skip is True:
-                    skip_category = True
-                    route_result[category_short_eu] = dict()
-                    route_result[category_short_eu]['category_info'] = dict()
-                    route_result[category_short_eu]['category_info']['en'] = category_object.category_name_en
-                    route_result[category_short_eu]['category_info']['de'] = category_object.category_name_de
-                    route_result[category_short_eu]['category_info'][
-                        'manual_consumption'] = True if manual_consumption_per_100_km is not None else False
-
-                    break
-                result_fuel_liter_total = fuel_calculation.result_fuel_liter_total
-                result_liter_100: [float] or float = fuel_calculation.liter_per_100_km
-                result_co2_gram_per_km: [float] or float = fuel_calculation.co2_gram_per_km
-                co2_gram_per_liter: [float] or float = fuel_calculation.co2_gram_per_liter
-                total_co2_gram += fuel_calculation.result_emissions_co2_g
-                total_co_mg += fuel_calculation.result_emissions_co_mg
-                total_nox_mg += fuel_calculation.result_emissions_nox_mg
-                total_thc_mg += fuel_calculation.result_emissions_thc_mg
-
-                total_co2_gram_cars = fuel_calculation.result_emissions_co2_g_cars
-                total_co_mg_cars = fuel_calculation.result_emissions_co_mg_cars
-                total_nox_mg_cars = fuel_calculation.result_emissions_nox_mg_cars
-                total_thc_mg_cars = fuel_calculation.result_emissions_thc_mg_cars
-                total_cfd_cars = (
-                                         total_co2_gram_cars + total_co_mg_cars + total_nox_mg_cars + total_thc_mg_cars) / 4
-                co2_gram_per_km = fuel_calculation.co2_gram_per_km
-                co_mg_per_km = fuel_calculation.co_mg_per_km
-                nox_mg_per_km = fuel_calculation.nox_mg_per_km
-                thc_mg_per_km = fuel_calculation.thc_mg_per_km
-                co2_gram_per_liter = fuel_calculation.co2_gram_per_liter
-                co_mg_per_liter = fuel_calculation.co_mg_per_liter
-                nox_mg_per_liter = fuel_calculation.nox_mg_per_liter
-                thc_mg_per_liter = fuel_calculation.thc_mg_per_liter
-                fuel_consumption_cars = fuel_calculation.fuel_consumption_cars
-
-                total_liters += result_fuel_liter_total
-                if remaining_fuel > 0:
-                    result_fuel_liter_total -= remaining_fuel
-                    remaining_fuel = 0
-                needed_refueling_theory = result_fuel_liter_total / tank_size
-                needed_refueling_actual = round(needed_refueling_theory, 5)
-                if tank_size * needed_refueling_actual - fuel_calculation.result_fuel_liter_total > 0:
-                    remaining_fuel = tank_size * needed_refueling_actual - fuel_calculation.result_fuel_liter_total
-                price_calculation: LinePriceCalculationObject = price_model.calculate_cost(
-                    liter=result_fuel_liter_total,
-                    fuel_type=fuel_type)
-                cost_date = price_calculation.cost_date
-                cost_tax += price_calculation.fuel_cost_tax
-                cost_wo_tax += price_calculation.fuel_cost_wo_tax
-            if skip_category:
+                    kmh=self.average_speed, length_m=cost_matrix.length_m)
+            if fuel_calculation.skip is True:
                 route_result[category_short_eu]['category_info'][
                     'calculation_errors'] = 'Not enough data to calculate the Category'
-            else:
+                continue
+            route_result[category_short_eu]['total_emissions'] = dict()
+            route_result[category_short_eu]['fuel_factors'] = dict()
+            route_result[category_short_eu]['total_consumption'] = dict()
+            route_result[category_short_eu]['total_cost'] = dict()
+            route_result[category_short_eu]['route'] = dict()
+            calculated_models.append(fuel_model)
+            fuel_calculations.append(fuel_calculation)
+            row_tank_sizes.append(tank_size)
+            row_fuel_types.append(fuel_model.fuel_type)
+
+        if len(fuel_calculations) > 0:
+            rows = len(fuel_calculations)
+            segments = cost_matrix.segment_count
+
+            def segment_matrix(attribute: str) -> numpy.ndarray:
+                return numpy.array(
+                    [numpy.broadcast_to(getattr(calculation, attribute), cost_matrix.length_m.shape) for calculation in
+                     fuel_calculations], dtype=float).reshape(rows, segments)
+
+            cost_tax, cost_wo_tax, total_liters = cost_matrix.calculate_costs(
+                liters=segment_matrix('result_fuel_liter_total'), fuel_types=row_fuel_types,
+                tank_sizes=row_tank_sizes, refuel_rounding='round')
+            total_co2_gram = sequential_sum(segment_matrix('result_emissions_co2_g'))
+            total_co_mg = sequential_sum(segment_matrix('result_emissions_co_mg'))
+            total_nox_mg = sequential_sum(segment_matrix('result_emissions_nox_mg'))
+            total_thc_mg = sequential_sum(segment_matrix('result_emissions_thc_mg'))
+            for row, fuel_model in enumerate(calculated_models):
+                category_short_eu = fuel_model.category_short_eu
+                fuel_calculation = fuel_calculations[row]
+                total_cfd_cars = (fuel_calculation.result_emissions_co2_g_cars +
+                                  fuel_calculation.result_emissions_co_mg_cars +
+                                  fuel_calculation.result_emissions_nox_mg_cars +
+                                  fuel_calculation.result_emissions_thc_mg_cars) / 4
                 route_result[category_short_eu]['category_info']['calculation_errors'] = 'No Errors'
-                route_result[category_short_eu]['category_info']['cfd_cars'] = int(
-                    round(total_cfd_cars if type(total_cfd_cars) == ndarray else total_cfd_cars, 0))
+                route_result[category_short_eu]['category_info']['cfd_cars'] = int(round(as_float(total_cfd_cars), 0))
                 route_result[category_short_eu]['category_info'][
                     'ec_sensors'] = fuel_model.ec_fuel_model.number_sensors
                 route_result[category_short_eu]['category_info'][
                     'ec_measurements'] = fuel_model.ec_fuel_model.number_measurements
                 route_result[category_short_eu]['total_emissions']['co2_kg'] = round(
-                    total_co2_gram[0] / 1000 if type(total_co2_gram) == ndarray else total_co2_gram / 1000, 6)
-                route_result[category_short_eu]['total_emissions']['co_g'] = round(
-                    total_co_mg[0] / 1000 if type(total_co_mg) == ndarray else total_co_mg / 1000, 6)
-                route_result[category_short_eu]['total_emissions']['nox_g'] = round(
-                    total_nox_mg[0] / 1000 if type(total_nox_mg) == ndarray else total_nox_mg / 1000, 6)
-                route_result[category_short_eu]['total_emissions']['thc_g'] = round(
-                    total_thc_mg[0] / 1000 if type(total_thc_mg) == ndarray else total_thc_mg / 1000, 6)
-
-                route_result[category_short_eu]['total_consumption']['liters'] = round(total_liters[0] if type(
-                    total_liters) == ndarray else total_liters, 2)
-
-                route_result[category_short_eu]['total_cost']['w_tax_euro'] = round(
-                    cost_tax[0] if type(cost_tax) == ndarray else cost_tax, 2)
-                route_result[category_short_eu]['total_cost']['wo_tax_euro'] = round(
-                    cost_wo_tax[0] if type(cost_wo_tax) == ndarray else cost_wo_tax, 2)
-                route_result[category_short_eu]['total_cost']['price_date'] = cost_date.strftime(
+                    float(total_co2_gram[row]) / 1000, 6)
+                route_result[category_short_eu]['total_emissions']['co_g'] = round(float(total_co_mg[row]) / 1000, 6)
+                route_result[category_short_eu]['total_emissions']['nox_g'] = round(float(total_nox_mg[row]) / 1000, 6)
+                route_result[category_short_eu]['total_emissions']['thc_g'] = round(float(total_thc_mg[row]) / 1000, 6)
+
+                route_result[category_short_eu]['total_consumption']['liters'] = round(float(total_liters[row]), 2)
+
+                route_result[category_short_eu]['total_cost']['w_tax_euro'] = round(float(cost_tax[row]), 2)
+                route_result[category_short_eu]['total_cost']['wo_tax_euro'] = round(float(cost_wo_tax[row]), 2)
+                route_result[category_short_eu]['total_cost']['price_date'] = cost_matrix.cost_date.strftime(
                     '%Y-%m-%dT%H:%M:%S')
 
                 route_result[category_short_eu]['fuel_factors']['liter_per_100km'] = round(
-                    result_liter_100[0] if type(result_liter_100) == ndarray else result_liter_100, 1)
+                    as_float(fuel_calculation.liter_per_100_km), 1)
                 route_result[category_short_eu]['fuel_factors']['co2_gram_per_km'] = round(
-                    co2_gram_per_km[0] if type(co2_gram_per_km) == ndarray else co2_gram_per_km, 6)
+                    as_float(fuel_calculation.co2_gram_per_km), 6)
                 route_result[category_short_eu]['fuel_factors']['co2_gram_per_liter'] = round(
-                    co2_gram_per_liter[0] if type(co2_gram_per_liter) == ndarray else co2_gram_per_liter, 6)
+                    as_float(fuel_calculation.co2_gram_per_liter), 6)
                 route_result[category_short_eu]['fuel_factors']['co_mg_per_km'] = round(
-                    co_mg_per_km[0] if type(co_mg_per_km) == ndarray else co_mg_per_km, 6)
+                    as_float(fuel_calculation.co_mg_per_km), 6)
                 route_result[category_short_eu]['fuel_factors']['co_mg_per_liter'] = round(
-                    co_mg_per_liter[0] if type(co_mg_per_liter) == ndarray else co_mg_per_liter, 6)
+                    as_float(fuel_calculation.co_mg_per_liter), 6)
                 route_result[category_short_eu]['fuel_factors']['nox_mg_per_km'] = round(
-                    nox_mg_per_km[0] if type(nox_mg_per_km) == ndarray else nox_mg_per_km, 6)
+                    as_float(fuel_calculation.nox_mg_per_km), 6)
                 route_result[category_short_eu]['fuel_factors']['nox_mg_per_liter'] = round(
-                    nox_mg_per_liter[0] if type(nox_mg_per_liter) == ndarray else nox_mg_per_liter, 6)
+                    as_float(fuel_calculation.nox_mg_per_liter), 6)
                 route_result[category_short_eu]['fuel_factors']['thc_mg_per_km'] = round(
-                    thc_mg_per_km[0] if type(thc_mg_per_km) == ndarray else thc_mg_per_km, 6)
+                    as_float(fuel_calculation.thc_mg_per_km), 6)
                 route_result[category_short_eu]['fuel_factors']['thc_mg_per_liter'] = round(
-                    thc_mg_per_liter[0] if type(thc_mg_per_liter) == ndarray else thc_mg_per_liter, 6)
+                    as_float(fuel_calculation.thc_mg_per_liter), 6)
 
-                route_result[category_short_eu]['route']['km'] = round(
-                    total_km[0] if type(total_km) == ndarray else total_km, 6)
+                route_result[category_short_eu]['route']['km'] = round(cost_matrix.total_km, 6)
         for category in vehicle_categories:
             if category not in route_result:
                 route_result[category] = dict()
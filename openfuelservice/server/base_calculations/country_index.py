@@ -0,0 +1,253 @@
+import threading
+import time
+
+import numpy
+from geoalchemy2.shape import to_shape
+from shapely.geometry import LineString, MultiLineString
+from shapely.geometry.base import BaseGeometry
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+from openfuelservice.server import ofs_settings
+from openfuelservice.server.base_calculations.data_provider import get_data_provider, DataProvider
+from openfuelservice.server.base_calculations.fuel_model_registry import data_version_check_interval
+from openfuelservice.server.db_import.countries.country_grid import CountryGrid
+from openfuelservice.server.db_import.eurostat.objects import CountryPriceExtended, GeneralPrice
+
+country_index_tolerance = ofs_settings['general']['advanced_settings'].get('country_index_tolerance', 0.01)
+
+
+def line_parts(geometry: BaseGeometry) -> [LineString]:
+    """
+    Returns the non empty LineStrings of an intersection or difference result.
+    """
+    if geometry.is_empty:
+        return []
+    if geometry.geom_type == 'LineString':
+        return [geometry]
+    if hasattr(geometry, 'geoms'):
+        parts = []
+        for part in geometry.geoms:
+            parts.extend(line_parts(part))
+        return parts
+    return []
+
+
+def append_line_part(parts: [list], coordinates: list):
+    """
+    Appends the coordinates of a line to the collected parts. A line continuing the last part is joined with it.
+    """
+    if len(parts) > 0 and parts[-1][-1] == coordinates[0]:
+        parts[-1].extend(coordinates[1:])
+    else:
+        parts.append(list(coordinates))
+
+
+def build_line(parts: [list]) -> LineString or MultiLineString:
+    if len(parts) == 0:
+        return LineString()
+    if len(parts) == 1:
+        return LineString(parts[0])
+    return MultiLineString(parts)
+
+
+class IndexedCountry(object):
+    def __init__(self, country_price: CountryPriceExtended, tolerance: float):
+        """
+        Holds the border of a country in three resolutions. The interior polygon lies completely inside the country
+        and the hull polygon completely covers it. Both are simplified, so most route segments can be classified
+        without touching the exact border.
+
+        :param country_price: The latest price of the country including its border
+        :param tolerance: Tolerance in degrees used to shrink, grow and simplify the border
+        """
+        self.country_price: CountryPriceExtended = country_price
+        self.country_alpha_2: str = country_price.country_alpha_2
+        self.geom: BaseGeometry = to_shape(country_price.geom) if not isinstance(country_price.geom,
+                                                                                  BaseGeometry) else country_price.geom
+        self.prepared_geom = prep(self.geom)
+        # Simplifying moves the outline by at most the tolerance, so the polygons are buffered twice as far.
+        self.interior: BaseGeometry = self.geom.buffer(-2 * tolerance).simplify(tolerance, preserve_topology=True)
+        self.prepared_interior = prep(self.interior)
+        self.hull: BaseGeometry = self.geom.buffer(2 * tolerance).simplify(tolerance, preserve_topology=True)
+        self.prepared_hull = prep(self.hull)
+
+
+class CountryIndex(object):
+    def __init__(self, country_prices: [CountryPriceExtended], general_price: GeneralPrice,
+                 tolerance: float = country_index_tolerance, country_grid: CountryGrid = None):
+        """
+        Worker resident STRtree of the country borders with their latest prices. Splits routes into their country
+        parts without a database round trip. Exact clipping is only done for segments close to a border.
+
+        :param country_prices: The latest prices of all countries, newest first
+        :param general_price: The general price used for route parts outside of the known countries
+        :param tolerance: Tolerance in degrees of the simplified borders
+        :param country_grid: Optional raster of the countries to assign segments far from borders by a lookup
+        """
+        self.general_price: GeneralPrice = general_price
+        self.country_grid: CountryGrid = country_grid
+        self.countries: [IndexedCountry] = [IndexedCountry(country_price=country_price, tolerance=tolerance) for
+                                            country_price in country_prices]
+        self.countries_by_code: dict = {country.country_alpha_2: country for country in self.countries}
+        self._hulls: [BaseGeometry] = [country.hull for country in self.countries]
+        self._hull_ids: dict = {id(hull): index for index, hull in enumerate(self._hulls)}
+        self.tree = STRtree(self._hulls) if len(self._hulls) > 0 else None
+
+    def query_countries(self, geometry: BaseGeometry) -> [IndexedCountry]:
+        """
+        Returns the countries whose hull intersects the geometry in the order of the country prices.
+        """
+        if self.tree is None:
+            return []
+        indices = set()
+        for result in self.tree.query(geometry):
+            # shapely < 2 returns the indexed geometries, shapely 2 their positions
+            indices.add(self._hull_ids[id(result)] if isinstance(result, BaseGeometry) else int(result))
+        return [self.countries[index] for index in sorted(indices) if
+                self.countries[index].prepared_hull.intersects(geometry)]
+
+    def locate_segments(self, coordinates: list) -> list:
+        """
+        Uses the country grid to find the segments that lie completely inside a country. Both vertices of such a
+        segment are in cells of the same country and the cells are equal or share an edge.
+
+        :param coordinates: The coordinates of the route
+        :return: Returns the country_alpha_2 code for every segment that could be assigned, None for the others
+        """
+        segment_count = len(coordinates) - 1
+        if self.country_grid is None or segment_count < 1:
+            return [None] * max(segment_count, 0)
+        vertices = numpy.array(coordinates, dtype=float)
+        rows, columns, values = self.country_grid.locate(longitudes=vertices[:, 0], latitudes=vertices[:, 1])
+        cell_distance = numpy.abs(numpy.diff(rows)) + numpy.abs(numpy.diff(columns))
+        assigned = (values[:-1] >= 0) & (values[:-1] == values[1:]) & (cell_distance <= 1)
+        country_codes = self.country_grid.country_codes
+        return [country_codes[values[index]] if assigned[index] else None for index in range(segment_count)]
+
+    def split_linestring(self, line_string: LineString) -> ([(CountryPriceExtended, BaseGeometry)], BaseGeometry):
+        """
+        Splits a route into its country parts.
+
+        :param line_string: A valid shapely LineString
+        :return: Returns the country parts with their prices and the remaining geometry outside of all countries
+        """
+        candidates: [IndexedCountry] = self.query_countries(line_string)
+        if len(candidates) == 0:
+            return [], line_string
+        for country in candidates:
+            if country.prepared_interior.contains(line_string):
+                return [(country.country_price, line_string)], LineString()
+
+        country_parts = {country.country_alpha_2: [] for country in candidates}
+        remaining_parts = []
+        coordinates = list(line_string.coords)
+        grid_countries = self.locate_segments(coordinates=coordinates)
+        segment_count = len(coordinates) - 1
+        index = 0
+        while index < segment_count:
+            grid_country = grid_countries[index]
+            if grid_country is not None:
+                # Consecutive segments inside the same country are taken over as one part
+                run_end = index
+                while run_end + 1 < segment_count and grid_countries[run_end + 1] == grid_country:
+                    run_end += 1
+                # A country without prices is part of the remaining route
+                append_line_part(country_parts.get(grid_country, remaining_parts), coordinates[index:run_end + 2])
+                index = run_end + 1
+                continue
+            start, end = coordinates[index], coordinates[index + 1]
+            index += 1
+            if start == end:
+                continue
+            segment = LineString([start, end])
+            segment_candidates = [country for country in candidates if country.prepared_hull.intersects(segment)]
+            interior_country = next(
+                (country for country in segment_candidates if country.prepared_interior.contains(segment)), None)
+            if interior_country is not None:
+                append_line_part(country_parts[interior_country.country_alpha_2], [start, end])
+                continue
+            remaining_segment = segment
+            for country in segment_candidates:
+                if country.prepared_geom.intersects(segment):
+                    for part in line_parts(country.geom.intersection(segment)):
+                        append_line_part(country_parts[country.country_alpha_2], list(part.coords))
+                    # The clipped parts are not exactly on the segment, so the border itself is subtracted
+                    remaining_segment = remaining_segment.difference(country.geom)
+            for part in line_parts(remaining_segment):
+                append_line_part(remaining_parts, list(part.coords))
+
+        result = []
+        for country in candidates:
+            parts = country_parts[country.country_alpha_2]
+            if len(parts) > 0:
+                result.append((country.country_price, build_line(parts)))
+        return result, build_line(remaining_parts)
+
+
+# The imported data sets the country index is built from
+country_index_data_versions = ['countries', 'prices']
+
+
+class CountryIndexCache(object):
+    def __init__(self, check_interval: float = data_version_check_interval):
+        """
+        Keeps the country index of a worker. The versions of the countries and the prices are checked at most once
+        per check interval, so a new import or a replaced snapshot rebuilds the index with the current data.
+
+        :param check_interval: Seconds between two version checks
+        """
+        self.check_interval: float = check_interval
+        self.country_index: CountryIndex = None
+        self.data_versions: tuple = None
+        self.checked_at: float = None
+        self._lock = threading.Lock()
+
+    def get(self) -> CountryIndex:
+        """
+        Returns the country index and builds it on first use or after the countries or prices changed.
+        """
+        now = time.monotonic()
+        if self.country_index is not None and self.checked_at is not None and \
+                now - self.checked_at < self.check_interval:
+            return self.country_index
+        with self._lock:
+            if self.country_index is not None and self.checked_at is not None and \
+                    now - self.checked_at < self.check_interval:
+                return self.country_index
+            data_provider: DataProvider = get_data_provider()
+            versions = data_provider.data_versions(names=country_index_data_versions)
+            data_versions = tuple(versions.get(name) for name in country_index_data_versions)
+            if self.country_index is None or data_versions != self.data_versions:
+                self.country_index = CountryIndex(country_prices=data_provider.latest_country_prices(),
+                                                  general_price=data_provider.general_price(),
+                                                  country_grid=data_provider.country_grid())
+                self.data_versions = data_versions
+            self.checked_at = now
+            return self.country_index
+
+    def clear(self):
+        """
+        Drops the country index, so it is rebuilt with the current data on its next use.
+        """
+        with self._lock:
+            self.country_index = None
+            self.data_versions = None
+            self.checked_at = None
+
+
+country_index_cache = CountryIndexCache()
+
+
+def get_country_index() -> CountryIndex:
+    """
+    Returns the country index of the worker and builds it on first use.
+    """
+    return country_index_cache.get()
+
+
+def reset_country_index():
+    """
+    Drops the country index, so it is rebuilt with the current data on its next use.
+    """
+    country_index_cache.clear()
@@ -0,0 +1,589 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import numpy
+from geoalchemy2.elements import WKBElement
+from geoalchemy2.shape import to_shape
+from shapely.geometry import LineString
+from shapely.geometry.base import BaseGeometry
+
+from openfuelservice.server import ofs_settings, file_folder, allowed_fuel_types
+from openfuelservice.server.base_calculations import queries
+from openfuelservice.server.db_import.countries.country_grid import CountryGrid
+from openfuelservice.server.db_import.eurostat.objects import CountryPrice, GeneralPrice, CountryPriceExtended
+from openfuelservice.server.db_import.models import CarCategoryModel, CarfuelDataCarModel
+from openfuelservice.server.utils.database.queries import CarFuelData
+from openfuelservice.server.utils.misc.geometries import true_linestring_length
+from openfuelservice.server.utils.misc.snapshot_file import SnapshotFile, write_snapshot_file, blob_arrays, \
+    file_identity
+
+logger = logging.getLogger(__name__)
+
+data_backend = ofs_settings['general']['advanced_settings'].get('data_backend', 'database')
+reference_snapshot_file: Path = file_folder.joinpath(
+    ofs_settings['general']['advanced_settings'].get('reference_snapshot_file', 'reference_data.snapshot'))
+serving_bundle_file: Path = file_folder.joinpath(
+    ofs_settings['general']['advanced_settings'].get('serving_bundle_file', 'serving_bundle.snapshot'))
+snapshot_check_interval = ofs_settings['general']['advanced_settings'].get('data_version_check_interval', 60)
+# The imported data sets the reference snapshot is built from
+reference_data_versions = ['countries', 'prices', 'statistics', 'cars', 'catalogue']
+
+# The rows of the statistic and catalogue queries
+EnvirocarStatisticRow = namedtuple('EnvirocarStatisticRow', ['category_short_eu', 'fuel_type', 'phenomenon_name', 'min',
+                                                             'average', 'max', 'measurements', 'numb_sensors', 'unit'])
+CFDStatisticRow = namedtuple('CFDStatisticRow', ['category_short_eu', 'fuel_type', 'phenomenon_name', 'value',
+                                                 'numb_cars', 'year'])
+CatalogueSnapshotRow = namedtuple('CatalogueSnapshotRow', ['name', 'payload', 'payload_gzip', 'etag'])
+
+
+class DataProvider(ABC):
+    """
+    Source of all data the base calculations read. The calculations never query the database themselves, so the
+    provider can be replaced, e.g. by an in memory provider for benchmarks without PostgreSQL.
+    """
+    # True if the provider never reaches the database, requests must then be answered from its data alone
+    offline: bool = False
+
+    @abstractmethod
+    def latest_country_prices(self) -> [CountryPriceExtended]:
+        """
+        :return: Returns the latest price together with the border of every country that has prices, newest first
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def general_price(self) -> GeneralPrice:
+        raise NotImplementedError
+
+    @abstractmethod
+    def country_prices_by_linestring(self, linestring: LineString) -> [CountryPriceExtended]:
+        """
+        :return: Returns the latest prices with the borders of the countries crossed by the linestring, newest first
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def route_parts_by_linestring(self, linestring: LineString) -> ([(CountryPrice, float)], float):
+        """
+        :return: Returns the country prices with the length in meters of their route parts and the length in meters
+        of the route outside of all countries with prices
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def country_grid(self) -> CountryGrid or None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def ec_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        """
+        :return: Returns the envirocar rows the fuel models are built from. All categories if categories is None.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def cfd_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        """
+        :return: Returns the carfueldata rows the fuel models are built from. All categories if categories is None.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def category(self, category_short_eu: str) -> CarCategoryModel:
+        raise NotImplementedError
+
+    @abstractmethod
+    def cfd_models(self, cfd_ids: [str]) -> [CarfuelDataCarModel]:
+        """
+        :return: Returns the found cars in the order of the cfd_ids. Unknown ids are skipped.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def categories_of_cars(self, cfd_cars: [CarfuelDataCarModel]) -> dict:
+        """
+        :return: Returns the category_short_eu codes of every car by its hash_id
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def data_version(self, name: str) -> int or None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def data_versions(self, names: [str]) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def catalogue_snapshots(self) -> list:
+        """
+        :return: Returns the rows of all catalogue snapshots with their name, payload, payload_gzip and etag
+        """
+        raise NotImplementedError
+
+
+class DatabaseDataProvider(DataProvider):
+    """
+    Reads everything from the database with the base calculation queries.
+    """
+
+    def latest_country_prices(self) -> [CountryPriceExtended]:
+        return queries.query_latest_country_prices()
+
+    def general_price(self) -> GeneralPrice:
+        return queries.query_general_price()
+
+    def country_prices_by_linestring(self, linestring: LineString) -> [CountryPriceExtended]:
+        return queries.query_country_price_by_linestring(linestring=linestring)
+
+    def route_parts_by_linestring(self, linestring: LineString) -> ([(CountryPrice, float)], float):
+        return queries.query_route_parts_by_linestring(linestring=linestring)
+
+    def country_grid(self) -> CountryGrid or None:
+        return CountryGrid.load()
+
+    def ec_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        return queries.query_ec_category_statistics(fuel_type=fuel_type, categories=categories)
+
+    def cfd_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        return queries.query_cfd_category_statistics(fuel_type=fuel_type, categories=categories)
+
+    def category(self, category_short_eu: str) -> CarCategoryModel:
+        return queries.query_category_for_category_short(category_short_eu=category_short_eu)
+
+    def cfd_models(self, cfd_ids: [str]) -> [CarfuelDataCarModel]:
+        return queries.query_cfd_models(cfd_ids=cfd_ids)
+
+    def categories_of_cars(self, cfd_cars: [CarfuelDataCarModel]) -> dict:
+        return CarFuelData.get_categories_of_cars(cfd_cars=cfd_cars)
+
+    def data_version(self, name: str) -> int or None:
+        return queries.query_data_version(name=name)
+
+    def data_versions(self, names: [str]) -> dict:
+        return queries.query_data_versions(names=names)
+
+    def catalogue_snapshots(self) -> list:
+        return queries.query_catalogue_snapshots()
+
+
+class MemoryDataProvider(DataProvider):
+    offline = True
+
+    def __init__(self, country_prices: [CountryPriceExtended], general_price: GeneralPrice,
+                 ec_statistics: list = None, cfd_statistics: list = None, categories: [CarCategoryModel] = None,
+                 cfd_cars: [CarfuelDataCarModel] = None, data_versions: dict = None,
+                 country_grid: CountryGrid = None, catalogue: [CatalogueSnapshotRow] = None):
+        """
+        Answers every request from the given objects. The routes are split with shapely and measured geodesically
+        like PostGIS does, the statistics are filtered like the queries filter them.
+
+        :param country_prices: The latest prices with the borders of the countries, newest first
+        :param general_price: The general price of the route parts outside of the countries
+        :param ec_statistics: Rows like the ones of query_ec_category_statistics
+        :param cfd_statistics: Rows like the ones of query_cfd_category_statistics
+        :param categories: The car categories
+        :param cfd_cars: The cfd cars with their categories
+        :param data_versions: Dict of the data set names and their versions
+        :param country_grid: Optional raster of the countries for the 'index' route splitting
+        :param catalogue: The catalogue snapshots
+        """
+        self.country_prices: [CountryPriceExtended] = list(country_prices)
+        self.general: GeneralPrice = general_price
+        self.ec_statistics: list = list(ec_statistics or [])
+        self.cfd_statistics: list = list(cfd_statistics or [])
+        self.categories: dict = {category.category_short_eu: category for category in categories or []}
+        self.cfd_cars: dict = {cfd_car.hash_id: cfd_car for cfd_car in cfd_cars or []}
+        self.versions: dict = dict(data_versions or {})
+        self.grid: CountryGrid = country_grid
+        self.catalogue: [CatalogueSnapshotRow] = list(catalogue or [])
+        self.country_geometries: dict = {
+            country_price.country_alpha_2: to_shape(country_price.geom) if not isinstance(
+                country_price.geom, BaseGeometry) else country_price.geom for country_price in self.country_prices}
+        self.country_bounds = numpy.array([self.country_geometry(country_price).bounds for country_price in
+                                           self.country_prices], dtype=float).reshape(-1, 4)
+
+    def country_geometry(self, country_price: CountryPriceExtended) -> BaseGeometry:
+        return self.country_geometries[country_price.country_alpha_2]
+
+    def latest_country_prices(self) -> [CountryPriceExtended]:
+        return list(self.country_prices)
+
+    def general_price(self) -> GeneralPrice:
+        return self.general
+
+    def country_prices_by_linestring(self, linestring: LineString) -> [CountryPriceExtended]:
+        min_lng, min_lat, max_lng, max_lat = linestring.bounds
+        bounds = self.country_bounds
+        candidates = numpy.flatnonzero((bounds[:, 0] <= max_lng) & (bounds[:, 2] >= min_lng) &
+                                       (bounds[:, 1] <= max_lat) & (bounds[:, 3] >= min_lat))
+        return [self.country_prices[index] for index in candidates if
+                self.country_geometry(self.country_prices[index]).intersects(linestring)]
+
+    def route_parts_by_linestring(self, linestring: LineString) -> ([(CountryPrice, float)], float):
+        route_parts = []
+        remaining_length_m = true_linestring_length(linestring=linestring)
+        for country_price in self.country_prices_by_linestring(linestring=linestring):
+            length_m = true_linestring_length(linestring=self.country_geometry(country_price).intersection(linestring))
+            if length_m > 0:
+                route_parts.append((country_price.get_country_price_object(), length_m))
+                remaining_length_m -= length_m
+        return route_parts, max(remaining_length_m, 0)
+
+    def country_grid(self) -> CountryGrid or None:
+        return self.grid
+
+    def ec_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        return [statistic for statistic in self.ec_statistics if statistic.fuel_type == fuel_type and (
+                categories is None or statistic.category_short_eu in categories)]
+
+    def cfd_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        return [statistic for statistic in self.cfd_statistics if statistic.fuel_type == fuel_type and (
+                categories is None or statistic.category_short_eu in categories)]
+
+    def category(self, category_short_eu: str) -> CarCategoryModel:
+        return self.categories.get(category_short_eu)
+
+    def cfd_models(self, cfd_ids: [str]) -> [CarfuelDataCarModel]:
+        return [self.cfd_cars[cfd_id] for cfd_id in cfd_ids or [] if cfd_id in self.cfd_cars]
+
+    def categories_of_cars(self, cfd_cars: [CarfuelDataCarModel]) -> dict:
+        return {cfd_car.hash_id: list(cfd_car.categories or []) for cfd_car in cfd_cars}
+
+    def data_version(self, name: str) -> int or None:
+        return self.versions.get(name)
+
+    def data_versions(self, names: [str]) -> dict:
+        return {name: self.versions[name] for name in names if name in self.versions}
+
+    def catalogue_snapshots(self) -> list:
+        return list(self.catalogue)
+
+
+# Columns of the reference snapshot. Text columns are stored as fixed width utf-8 arrays, all others as float64 with
+# NaN for missing values, so every column can be mapped without copying it.
+price_fields = ['euro_price', 'euro_ht', 'euro_ttc', 'euro_quantity', 'diesel_ht', 'diesel_ttc', 'diesel_quantity']
+category_fields = ['category_short_eu', 'category_name_de', 'category_name_en']
+car_fields = ['hash_id', 'manufacturer', 'model', 'description', 'fuel_type', 'metric_combined', 'co2_g_per_km',
+              'emissions_co_mg_per_km', 'emissions_nox_mg_per_km', 'thc_emissions_mg_per_km', 'year']
+text_fields = {'category_short_eu', 'fuel_type', 'phenomenon_name', 'unit', 'category_name_de', 'category_name_en',
+               'hash_id', 'manufacturer', 'model', 'description', 'euro_unit', 'diesel_unit'}
+integer_fields = {'measurements', 'numb_sensors', 'numb_cars', 'year'}
+
+
+def text_array(values: list) -> numpy.ndarray:
+    return numpy.array([str(value if value is not None else '').encode('utf-8') for value in values], dtype=bytes)
+
+
+def column_array(field: str, values: list) -> numpy.ndarray:
+    if field in text_fields:
+        return text_array(values)
+    return numpy.array([numpy.nan if value is None else float(value) for value in values], dtype=numpy.float64)
+
+
+def column_value(field: str, value):
+    """
+    Turns a value of a mapped column back into the python value the queries return.
+    """
+    value = value.item() if hasattr(value, 'item') else value
+    if field in text_fields:
+        return value.decode('utf-8')
+    if value != value:
+        return None
+    return int(value) if field in integer_fields else value
+
+
+def row_arrays(name: str, rows: list, fields: [str]) -> dict:
+    return {'{}.{}'.format(name, field): column_array(field, [getattr(row, field, None) for row in rows]) for field in
+            fields}
+
+
+def price_arrays(name: str, prices: list) -> dict:
+    arrays = row_arrays(name=name, rows=prices, fields=price_fields + ['taux', 'euro_unit', 'diesel_unit'])
+    arrays['{}.date'.format(name)] = numpy.array([price.date for price in prices], dtype='datetime64[s]')
+    return arrays
+
+
+class MappedDataProvider(DataProvider):
+    def __init__(self, snapshot_file: SnapshotFile):
+        """
+        Serves the reference data of one mapped snapshot file. The statistics and cars are read from the mapped
+        columns per request, only the country prices with their borders and the categories are decoded once.
+
+        :param snapshot_file: The mapped reference snapshot
+        """
+        self.file: SnapshotFile = snapshot_file
+        self.versions: dict = snapshot_file.meta['data_versions']
+        country_values = self.price_values(name='country')
+        country_codes = snapshot_file.strings('country.code')
+        country_geoms = snapshot_file.blobs('country.geom')
+        country_prices = [CountryPriceExtended(country_alpha_2=country_codes[index],
+                                               geom=WKBElement(country_geoms[index], srid=4326),
+                                               **country_values[index]) for index in range(len(country_codes))]
+        general_prices = [GeneralPrice(**{field: values[field] for field in values if field != 'taux'}) for values in
+                          self.price_values(name='general')]
+        country_grid = None
+        if 'grid.cells' in snapshot_file:
+            country_grid = CountryGrid(cells=snapshot_file.array('grid.cells'),
+                                       country_codes=snapshot_file.strings('grid.country_codes'),
+                                       origin=tuple(snapshot_file.meta['grid']['origin']),
+                                       cell_size=snapshot_file.meta['grid']['cell_size'])
+        self.countries = MemoryDataProvider(country_prices=country_prices,
+                                            general_price=general_prices[0] if len(general_prices) > 0 else None,
+                                            country_grid=country_grid)
+        self.categories: dict = {values['category_short_eu']: CarCategoryModel(**values) for values in
+                                 self.rows(name='category', fields=category_fields)}
+        self.car_hash_ids: numpy.ndarray = snapshot_file.array('car.hash_id')
+
+    def column(self, name: str, field: str) -> numpy.ndarray:
+        return self.file.array('{}.{}'.format(name, field))
+
+    def rows(self, name: str, fields: [str], indices: [int] = None) -> [dict]:
+        """
+        :return: Returns the values of the rows with the given indices, all rows if indices is None
+        """
+        columns = {field: self.column(name, field) for field in fields}
+        if indices is None:
+            indices = range(len(columns[fields[0]]))
+        return [{field: column_value(field, columns[field][index]) for field in fields} for index in indices]
+
+    def price_values(self, name: str) -> [dict]:
+        prices = self.rows(name=name, fields=price_fields + ['taux', 'euro_unit', 'diesel_unit'])
+        for values, price_date in zip(prices, self.column(name, 'date').tolist()):
+            values['date'] = price_date
+        return prices
+
+    def statistic_indices(self, name: str, fuel_type: str, categories: [str] = None) -> [int]:
+        matches = self.column(name, 'fuel_type') == str(fuel_type).encode('utf-8')
+        if categories is not None:
+            matches &= numpy.isin(self.column(name, 'category_short_eu'), text_array(categories))
+        return numpy.flatnonzero(matches).tolist()
+
+    def latest_country_prices(self) -> [CountryPriceExtended]:
+        return self.countries.latest_country_prices()
+
+    def general_price(self) -> GeneralPrice:
+        return self.countries.general_price()
+
+    def country_prices_by_linestring(self, linestring: LineString) -> [CountryPriceExtended]:
+        return self.countries.country_prices_by_linestring(linestring=linestring)
+
+    def route_parts_by_linestring(self, linestring: LineString) -> ([(CountryPrice, float)], float):
+        return self.countries.route_parts_by_linestring(linestring=linestring)
+
+    def country_grid(self) -> CountryGrid or None:
+        return self.countries.country_grid()
+
+    def ec_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        indices = self.statistic_indices(name='ec', fuel_type=fuel_type, categories=categories)
+        return [EnvirocarStatisticRow(**values) for values in
+                self.rows(name='ec', fields=list(EnvirocarStatisticRow._fields), indices=indices)]
+
+    def cfd_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        indices = self.statistic_indices(name='cfd', fuel_type=fuel_type, categories=categories)
+        return [CFDStatisticRow(**values) for values in
+                self.rows(name='cfd', fields=list(CFDStatisticRow._fields), indices=indices)]
+
+    def category(self, category_short_eu: str) -> CarCategoryModel:
+        return self.categories.get(category_short_eu)
+
+    def cfd_models(self, cfd_ids: [str]) -> [CarfuelDataCarModel]:
+        indices = []
+        for cfd_id in cfd_ids or []:
+            hash_id = str(cfd_id).encode('utf-8')
+            index = int(numpy.searchsorted(self.car_hash_ids, hash_id))
+            if index < len(self.car_hash_ids) and self.car_hash_ids[index] == hash_id:
+                indices.append(index)
+        car_categories = self.file.strings('car.categories')
+        cfd_models = []
+        for index, values in zip(indices, self.rows(name='car', fields=car_fields, indices=indices)):
+            cfd_models.append(CarfuelDataCarModel(categories=[category for category in
+                                                              car_categories[index].split(',') if category],
+                                                  **values))
+        return cfd_models
+
+    def categories_of_cars(self, cfd_cars: [CarfuelDataCarModel]) -> dict:
+        return {cfd_car.hash_id: list(cfd_car.categories or []) for cfd_car in cfd_cars}
+
+    def data_version(self, name: str) -> int or None:
+        return self.versions.get(name)
+
+    def data_versions(self, names: [str]) -> dict:
+        return {name: self.versions[name] for name in names if name in self.versions}
+
+    def catalogue_snapshots(self) -> list:
+        return [CatalogueSnapshotRow(name=name, payload=payload, payload_gzip=payload_gzip, etag=etag) for
+                name, payload, payload_gzip, etag in zip(self.file.strings('catalogue.name'),
+                                                         self.file.blobs('catalogue.payload'),
+                                                         self.file.blobs('catalogue.payload_gzip'),
+                                                         self.file.strings('catalogue.etag'))]
+
+
+class SnapshotDataProvider(DataProvider):
+    def __init__(self, path: Path = reference_snapshot_file, check_interval: float = snapshot_check_interval,
+                 fallback: DataProvider = None):
+        """
+        Serves the reference snapshot written by the importers. Every worker maps the same file read-only, so a node
+        holds the data once no matter how many workers it runs, and no worker queries anything at startup. A replaced
+        file is mapped at the next check and swapped in at once. Requests that already hold the previous mapping
+        finish with it.
+
+        :param path: Path of the reference snapshot
+        :param check_interval: Seconds between two checks if the file was replaced
+        :param fallback: Provider used until the first snapshot was written. Without a fallback the snapshot is
+        required and nothing is ever queried from the database.
+        """
+        self.path: Path = path
+        self.check_interval: float = check_interval
+        self.fallback: DataProvider = fallback
+        self.offline: bool = fallback is None
+        self.mapped: MappedDataProvider = None
+        self.checked_at: float = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Maps the snapshot file if it was replaced since it was mapped last. A broken file keeps the previous mapping.
+        """
+        identity = file_identity(self.path)
+        if identity is None:
+            if self.mapped is None and self.fallback is not None:
+                logger.warning('No reference snapshot at {}, the data is read from the fallback'.format(self.path))
+            return
+        if self.mapped is not None and self.mapped.file.identity == identity:
+            return
+        try:
+            self.mapped = MappedDataProvider(snapshot_file=SnapshotFile(self.path))
+        except Exception as err:
+            logger.error('The reference snapshot {} could not be mapped: {}'.format(self.path, err))
+
+    def source(self) -> DataProvider:
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= self.check_interval:
+            with self._lock:
+                if self.checked_at is None or now - self.checked_at >= self.check_interval:
+                    self.refresh()
+                    self.checked_at = now
+        mapped = self.mapped
+        if mapped is not None:
+            return mapped
+        if self.fallback is None:
+            raise FileNotFoundError('No reference snapshot at {}'.format(self.path))
+        return self.fallback
+
+    def latest_country_prices(self) -> [CountryPriceExtended]:
+        return self.source().latest_country_prices()
+
+    def general_price(self) -> GeneralPrice:
+        return self.source().general_price()
+
+    def country_prices_by_linestring(self, linestring: LineString) -> [CountryPriceExtended]:
+        return self.source().country_prices_by_linestring(linestring=linestring)
+
+    def route_parts_by_linestring(self, linestring: LineString) -> ([(CountryPrice, float)], float):
+        return self.source().route_parts_by_linestring(linestring=linestring)
+
+    def country_grid(self) -> CountryGrid or None:
+        return self.source().country_grid()
+
+    def ec_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        return self.source().ec_category_statistics(fuel_type=fuel_type, categories=categories)
+
+    def cfd_category_statistics(self, fuel_type: str, categories: [str] = None) -> list:
+        return self.source().cfd_category_statistics(fuel_type=fuel_type, categories=categories)
+
+    def category(self, category_short_eu: str) -> CarCategoryModel:
+        return self.source().category(category_short_eu=category_short_eu)
+
+    def cfd_models(self, cfd_ids: [str]) -> [CarfuelDataCarModel]:
+        return self.source().cfd_models(cfd_ids=cfd_ids)
+
+    def categories_of_cars(self, cfd_cars: [CarfuelDataCarModel]) -> dict:
+        return self.source().categories_of_cars(cfd_cars=cfd_cars)
+
+    def data_version(self, name: str) -> int or None:
+        return self.source().data_version(name=name)
+
+    def data_versions(self, names: [str]) -> dict:
+        return self.source().data_versions(names=names)
+
+    def catalogue_snapshots(self) -> list:
+        return self.source().catalogue_snapshots()
+
+
+def write_reference_snapshot(path: Path = reference_snapshot_file, provider: DataProvider = None):
+    """
+    Writes all reference data of the route calculations and the catalogue into one snapshot file, together with the
+    versions of the imported data sets. The importers call it after every import.
+
+    :param path: Path of the reference snapshot
+    :param provider: Provider the data is read from. The database if not set.
+    """
+    provider = provider if provider is not None else DatabaseDataProvider()
+    country_prices = provider.latest_country_prices()
+    ec_statistics = []
+    cfd_statistics = []
+    for fuel_type in allowed_fuel_types:
+        ec_statistics.extend(provider.ec_category_statistics(fuel_type=fuel_type))
+        cfd_statistics.extend(provider.cfd_category_statistics(fuel_type=fuel_type))
+    cfd_cars = sorted(queries.query_all_cfd_models(), key=lambda cfd_car: str(cfd_car.hash_id).encode('utf-8'))
+    car_categories = provider.categories_of_cars(cfd_cars=cfd_cars)
+    catalogue = provider.catalogue_snapshots()
+
+    arrays = dict()
+    arrays.update(price_arrays(name='country', prices=country_prices))
+    arrays['country.code'] = text_array([country_price.country_alpha_2 for country_price in country_prices])
+    arrays.update(blob_arrays('country.geom', [to_shape(country_price.geom).wkb if not isinstance(
+        country_price.geom, BaseGeometry) else country_price.geom.wkb for country_price in country_prices]))
+    arrays.update(price_arrays(name='general', prices=[provider.general_price()]))
+    arrays.update(row_arrays(name='ec', rows=ec_statistics, fields=list(EnvirocarStatisticRow._fields)))
+    arrays.update(row_arrays(name='cfd', rows=cfd_statistics, fields=list(CFDStatisticRow._fields)))
+    arrays.update(row_arrays(name='category', rows=queries.query_car_categories(), fields=category_fields))
+    arrays.update(row_arrays(name='car', rows=cfd_cars, fields=car_fields))
+    arrays['car.categories'] = text_array([','.join(car_categories.get(cfd_car.hash_id) or []) for cfd_car in
+                                           cfd_cars])
+    arrays['catalogue.name'] = text_array([snapshot.name for snapshot in catalogue])
+    arrays['catalogue.etag'] = text_array([snapshot.etag for snapshot in catalogue])
+    arrays.update(blob_arrays('catalogue.payload', [bytes(snapshot.payload) for snapshot in catalogue]))
+    arrays.update(blob_arrays('catalogue.payload_gzip', [bytes(snapshot.payload_gzip) for snapshot in catalogue]))
+    meta = {'created': datetime.now().isoformat(timespec='seconds'),
+            'data_versions': provider.data_versions(names=reference_data_versions)}
+    country_grid = provider.country_grid()
+    if country_grid is not None:
+        arrays['grid.cells'] = country_grid.cells
+        arrays['grid.country_codes'] = text_array(country_grid.country_codes)
+        meta['grid'] = {'origin': list(country_grid.origin), 'cell_size': country_grid.cell_size}
+    write_snapshot_file(path=path, arrays=arrays, meta=meta)
+
+
+def create_data_provider(backend: str = data_backend) -> DataProvider:
+    """
+    :param backend: 'snapshot' maps the reference snapshot and queries the database until it was written,
+    'bundle' only maps the serving bundle, everything else queries the database
+    """
+    if backend == 'snapshot':
+        return SnapshotDataProvider(fallback=DatabaseDataProvider())
+    if backend == 'bundle':
+        return SnapshotDataProvider(path=serving_bundle_file)
+    return DatabaseDataProvider()
+
+
+data_provider: DataProvider = create_data_provider()
+
+
+def get_data_provider() -> DataProvider:
+    return data_provider
+
+
+def set_data_provider(provider: DataProvider):
+    """
+    Replaces the data provider of the worker. The caches built from the old provider are not dropped here, see
+    base_calculations.use_data_provider.
+    """
+    global data_provider
+    data_provider = provider
@@ -1,71 +1,124 @@
-import math
-from datetime import date
 from decimal import Decimal
 
+import numpy
 from numpy import ndarray
-from scipy import array
-from scipy.interpolate import interp1d
 from shapely.geometry import LineString
 
 from openfuelservice.server import category_list, ofs_settings
-from openfuelservice.server.base_calculations.objects import CountryLinePrice, GeneralLinePrice, Route, \
-    LinePriceCalculationObject
-from openfuelservice.server.base_calculations.queries import query_ec_average_category_statistics, query_ec_category, \
-    query_category_for_category_short
+from openfuelservice.server.base_calculations.fuel_model_registry import fuel_model_registry
+from openfuelservice.server.base_calculations.objects import Route, PriceCollection
+from openfuelservice.server.base_calculations.data_provider import get_data_provider
+from openfuelservice.server.base_calculations.route_matrix import RouteCostMatrix, as_float, sequential_sum
 from openfuelservice.server.db_import.models import EnvirocarAverageVehicleTypeStatisticModel, \
     EnvirocarAverageCategoryStatisticsModel, \
     CarCategoryModel
 from openfuelservice.server.objects import Filters
-from openfuelservice.server.utils.misc.geometries import true_linestring_length
+from openfuelservice.server.utils.processing.timing import stage_timer
 
 standard_epsg = ofs_settings['general']['advanced_settings']['standard_epsg']
 vehicle_categories = category_list['car_categories']
 
 
-def parse_ec_category_models(filters, categories: list, ordered_categories: bool = False) -> list or dict:
-    fuel_type: str = filters.fuel_type
-    ordered_av_cat_statistics = {}
+def fit_quadratic(speeds: [float], values: [float]) -> ndarray:
+    """
+    Returns the coefficients, highest power first, of the parabola through three (speed, value) points. For three
+    points this is the same curve a quadratic scipy interp1d describes, so it can be evaluated with numpy.polyval.
+
+    :param speeds: Three distinct speeds in km/h
+    :param values: The values measured at the speeds
+    :return: The coefficients a, b, c of a * x^2 + b * x + c
+    """
+    (x0, x1, x2), (y0, y1, y2) = speeds, values
+    slope_01 = (y1 - y0) / (x1 - x0)
+    curvature = ((y2 - y1) / (x2 - x1) - slope_01) / (x2 - x0)
+    return numpy.array([curvature, slope_01 - curvature * (x0 + x1), y0 - slope_01 * x0 + curvature * x0 * x1])
+
+
+def distinct_speeds(category_statistics: list) -> bool:
+    """
+    Returns True if the statistics describe three distinct speeds, which fit_quadratic needs. The fuel models start at
+    0 km/h, so the average and the maximum speed have to be distinct and not 0.
+
+    :param category_statistics: Rows of query_ec_category_statistics of one category
+    """
+    for statistic in category_statistics:
+        if statistic.phenomenon_name == 'Speed':
+            return len({0.0, float(statistic.average), float(statistic.max)}) == 3
+    return False
+
+
+def requested_categories(categories: list) -> list:
+    """
+    Returns the categories without duplicates in their order. 'all' replaces every other category.
+    """
     if 'all' in categories:
-        query: list = query_ec_average_category_statistics(fuel_type=fuel_type)
-    else:
-        query = []
-        for category in categories:
-            category_query = query_ec_category(fuel_type=fuel_type, category=category)
-            query.extend(category_query)
-    average_category_statistic: EnvirocarAverageCategoryStatisticsModel
-    for average_category_statistic in query:
-        category: str = average_category_statistic.category_short_eu
-        if category not in ordered_av_cat_statistics:
-            ordered_av_cat_statistics[category] = []
-        ordered_av_cat_statistics[category].append(average_category_statistic)
+        return ['all']
+    return list(dict.fromkeys(categories))
+
+
+def build_ec_category_models(keys: [tuple]) -> dict:
+    """
+    Builds the fuel models of many categories with a single statistics query.
+
+    :param keys: Registry keys ('ec', fuel_type, category, None) of one fuel type. The category may be 'all'.
+    :return: Returns a dict of the keys and the ordered fuel models of their category. The ordered fuel models are a
+    dict of the category_short_eu and a list with its fuel model. The list is empty when less than three statistics
+    or no three distinct speeds are available for the category.
+    """
+    fuel_type: str = keys[0][1]
+    categories: [str] = [key[2] for key in keys]
+    statistics: list = get_data_provider().ec_category_statistics(
+        fuel_type=fuel_type, categories=None if 'all' in categories else categories)
+    ordered_av_cat_statistics = {}
+    for average_category_statistic in statistics:
+        category_short_eu: str = average_category_statistic.category_short_eu
+        if category_short_eu not in ordered_av_cat_statistics:
+            ordered_av_cat_statistics[category_short_eu] = []
+        ordered_av_cat_statistics[category_short_eu].append(average_category_statistic)
+
+    ordered_fuel_models = {category: {} for category in categories}
+    for category_short_eu in ordered_av_cat_statistics:
+        fuel_models = []
+        category_statistics = ordered_av_cat_statistics[category_short_eu]
+        if len(category_statistics) >= 3 and distinct_speeds(category_statistics=category_statistics):
+            fuel_models.append(EnvirocarFuelModel(category_statistics=category_statistics))
+        if 'all' in ordered_fuel_models:
+            ordered_fuel_models['all'][category_short_eu] = fuel_models
+        if category_short_eu in ordered_fuel_models:
+            ordered_fuel_models[category_short_eu][category_short_eu] = fuel_models
+    return {key: ordered_fuel_models[key[2]] for key in keys}
+
+
+def get_ec_category_models(fuel_type: str, categories: list) -> dict:
+    """
+    Returns the ordered fuel models of the categories from the registry. Missing categories are built at once.
+    """
+    ordered_fuel_models = {}
+    keys = [('ec', fuel_type, category, None) for category in requested_categories(categories)]
+    for category_fuel_models in fuel_model_registry.get_many(keys=keys, build=build_ec_category_models):
+        ordered_fuel_models.update(category_fuel_models)
+    return ordered_fuel_models
+
 
+def parse_ec_category_models(filters, categories: list, ordered_categories: bool = False) -> list or dict:
+    ordered_fuel_models = get_ec_category_models(fuel_type=filters.fuel_type, categories=categories)
     if ordered_categories:
-        ordered_fuel_models = {}
-        category: str
-        for category in ordered_av_cat_statistics:
-            if category not in ordered_fuel_models:
-                ordered_fuel_models[category] = []
-            if len(ordered_av_cat_statistics[category]) >= 3:
-                category_object: [EnvirocarAverageCategoryStatisticsModel] = ordered_av_cat_statistics[category]
-                fuel_model: EnvirocarFuelModel = EnvirocarFuelModel(category_statistics=category_object)
-                ordered_fuel_models[category].append(fuel_model)
         return ordered_fuel_models
-    else:
-        fuel_models: list = []
-        category: str
-        for category in ordered_av_cat_statistics:
-            if len(ordered_av_cat_statistics[category]) >= 3:
-                category_object: [EnvirocarAverageCategoryStatisticsModel] = ordered_av_cat_statistics[category]
-                fuel_model: EnvirocarFuelModel = EnvirocarFuelModel(category_statistics=category_object)
-                fuel_models.append(fuel_model)
-        return fuel_models
+    fuel_models: list = []
+    for category in ordered_fuel_models:
+        fuel_models.extend(ordered_fuel_models[category])
+    return fuel_models
 
 
 class AdvancedDistanceCalculation(Route):
-    def __init__(self, geom: LineString, filters: Filters):
-        super().__init__(geom=geom, filters=filters)
-        self.fuel_models: [EnvirocarFuelModel] = parse_ec_category_models(filters=self.filters,
-                                                                          categories=self.categories)
+    def __init__(self, geom: LineString, filters: Filters, fuel_models: list = None,
+                 price_collection: PriceCollection = None):
+        super().__init__(geom=geom, filters=filters, price_collection=price_collection)
+        if fuel_models is None:
+            self.fuel_models: [EnvirocarFuelModel] = parse_ec_category_models(filters=self.filters,
+                                                                              categories=self.categories)
+        else:
+            self.fuel_models: [EnvirocarFuelModel] = fuel_models
         if filters.driving_speed is None:
             driving_style: str = self.filters.driving_style
             self.average_speed: int = ofs_settings['general']['advanced_settings']['average_speeds'][driving_style]
@@ -77,6 +130,10 @@ class AdvancedDistanceCalculation(Route):
         tank_sizes: dict = self.filters.tank_sizes
         fuel_consumptions = self.filters.fuel_consumptions
         route_result = dict()
+        cost_matrix: RouteCostMatrix = RouteCostMatrix(price_models=self.price_models)
+        fuel_calculations: [FuelModelCalculationObject] = []
+        row_tank_sizes: [int] = []
+        row_fuel_types: [str] = []
         for fuel_model in self.fuel_models:
             tank_size: int = None
             manual_consumption_per_100_km: float = None
@@ -88,7 +145,7 @@ class AdvancedDistanceCalculation(Route):
                 tank_size = int(vehicle_categories[category_short_eu]['tank_capacity'])
             else:
                 tank_size = int(tank_sizes[category_short_eu])
-            category_object: CarCategoryModel = query_category_for_category_short(category_short_eu=category_short_eu)
+            category_object: CarCategoryModel = get_data_provider().category(category_short_eu=category_short_eu)
             if category_short_eu not in route_result:
                 route_result[category_short_eu] = dict()
                 route_result[category_short_eu]['total_emissions'] = dict()
@@ -103,84 +160,43 @@ class AdvancedDistanceCalculation(Route):
                 route_result[category_short_eu]['category_info']['de'] = category_object.category_name_de
                 route_result[category_short_eu]['category_info'][
                     'manual_consumption'] = True if manual_consumption_per_100_km is not None else False
-
-            fuel_type = fuel_model.fuel_type
-            liters: [float] or float = 0
-            co2_gram: [float] or float = 0
-            result_liter_100: [float] or float = 0
-            result_co2_gram_per_km: [float] or float = 0
-            cost_tax: [float] or float = 0
-            cost_wo_tax: [float] or float = 0
-            co2_gram_per_liter = 0
-            cost_date: date = None
-            total_km: [float] or float = 0
-            previous_price_model: CountryLinePrice = None
-            remaining_fuel: float = 0
-            for price_model in self.price_models:
-                price_model: CountryLinePrice or GeneralLinePrice
-                if previous_price_model == None:
-                    previous_price_model = price_model
-                remaining_fuel_cost_tax: float = 0
-                remaining_fuel_cost_wo_tax: float = 0
-                if remaining_fuel > 0:
-                    price_calculation: LinePriceCalculationObject = previous_price_model.calculate_cost(
-                        liter=remaining_fuel,
-                        fuel_type=fuel_type)
-                    previous_price_model = price_model
-                    cost_tax += price_calculation.fuel_cost_tax
-                    cost_wo_tax += price_calculation.fuel_cost_wo_tax
-                length_m = true_linestring_length(linestring=price_model.linestring)
-                total_km += length_m / 1000
-                fuel_calculation: FuelModelCalculationObject = fuel_model.calculate_route(kmh=self.average_speed,
-                                                                                          length_m=length_m,
-                                                                                          manual_consumption_per_100km=manual_consumption_per_100_km)
-
-                result_fuel_liter_total = fuel_calculation.result_fuel_liter_total
-                result_co2_gram_total = fuel_calculation.result_co2_gram_total
-                co2_gram_per_liter = fuel_calculation.co2_gram_per_liter
-
-                result_liter_100: [float] or float = fuel_calculation.liter_per_100_km
-                result_co2_gram_per_km: [float] or float = fuel_calculation.co2_gram_per_km
-                co2_gram_per_liter: [float] or float = co2_gram_per_liter
-                co2_gram += result_co2_gram_total
-                liters += result_fuel_liter_total
-                if remaining_fuel > 0:
-                    result_fuel_liter_total -= remaining_fuel
-                    remaining_fuel = 0
-                needed_refueling_theory = result_fuel_liter_total / tank_size
-                needed_refueling_actual = math.ceil(needed_refueling_theory)
-                if tank_size * needed_refueling_actual - result_fuel_liter_total > 0:
-                    remaining_fuel = tank_size * needed_refueling_actual - result_fuel_liter_total
-
-                price_calculation: LinePriceCalculationObject = price_model.calculate_category_cost(
-                    liter=result_fuel_liter_total,
-                    fuel_type=fuel_type)
-                cost_date = price_calculation.cost_date
-                cost_tax += price_calculation.fuel_cost_tax
-                cost_wo_tax += price_calculation.fuel_cost_wo_tax
-
-            route_result[category_short_eu]['route']['km'] = round(total_km[0] if type(
-                total_km) == ndarray else total_km, 6)
-
-            route_result[category_short_eu]['total_consumption']['liters'] = round(liters[0] if type(
-                liters) == ndarray else liters, 3)
-
-            route_result[category_short_eu]['total_cost']['w_tax_euro'] = round(cost_tax[0] if type(
-                cost_tax) == ndarray else cost_tax, 2)
-            route_result[category_short_eu]['total_cost']['wo_tax_euro'] = round(cost_wo_tax[0] if type(
-                cost_wo_tax) == ndarray else cost_wo_tax, 2)
-            route_result[category_short_eu]['total_cost']['price_date'] = cost_date.strftime('%Y-%m-%dT%H:%M:%S')
-
-            route_result[category_short_eu]['total_emissions']['co2_kg'] = round(co2_gram[0] / 1000 if type(
-                co2_gram) == ndarray else co2_gram / 1000, 6)
-
-            route_result[category_short_eu]['fuel_factors']['liter_per_100km'] = round(result_liter_100[0] if type(
-                result_liter_100) == ndarray else result_liter_100, 1)
-            route_result[category_short_eu]['fuel_factors']['co2_gram_per_km'] = round(
-                result_co2_gram_per_km[0] if type(
-                    result_co2_gram_per_km) == ndarray else result_co2_gram_per_km, 6)
-            route_result[category_short_eu]['fuel_factors']['co2_gram_per_liter'] = round(co2_gram_per_liter[0] if type(
-                co2_gram_per_liter) == ndarray else co2_gram_per_liter, 6)
+            # One call per fuel model covers all segments of the route
+            with stage_timer('calculation.{}'.format(category_short_eu)):
+                fuel_calculation: FuelModelCalculationObject = fuel_model.calculate_route(
+                    kmh=self.average_speed, length_m=cost_matrix.length_m,
+                    manual_consumption_per_100km=manual_consumption_per_100_km)
+            fuel_calculations.append(fuel_calculation)
+            row_tank_sizes.append(tank_size)
+            row_fuel_types.append(fuel_model.fuel_type)
+
+        if len(fuel_calculations) > 0:
+            liters = numpy.array([numpy.broadcast_to(calculation.result_fuel_liter_total, cost_matrix.length_m.shape)
+                                  for calculation in fuel_calculations], dtype=float).reshape(
+                len(fuel_calculations), cost_matrix.segment_count)
+            co2_gram = numpy.array([numpy.broadcast_to(calculation.result_co2_gram_total, cost_matrix.length_m.shape)
+                                    for calculation in fuel_calculations], dtype=float).reshape(
+                len(fuel_calculations), cost_matrix.segment_count)
+            cost_tax, cost_wo_tax, total_liters = cost_matrix.calculate_costs(liters=liters, fuel_types=row_fuel_types,
+                                                                              tank_sizes=row_tank_sizes,
+                                                                              refuel_rounding='ceil')
+            total_co2_gram = sequential_sum(co2_gram)
+            for row, fuel_model in enumerate(self.fuel_models):
+                category_short_eu = fuel_model.category_short_eu
+                fuel_calculation = fuel_calculations[row]
+                route_result[category_short_eu]['route']['km'] = round(cost_matrix.total_km, 6)
+                route_result[category_short_eu]['total_consumption']['liters'] = round(float(total_liters[row]), 3)
+                route_result[category_short_eu]['total_cost']['w_tax_euro'] = round(float(cost_tax[row]), 2)
+                route_result[category_short_eu]['total_cost']['wo_tax_euro'] = round(float(cost_wo_tax[row]), 2)
+                route_result[category_short_eu]['total_cost']['price_date'] = cost_matrix.cost_date.strftime(
+                    '%Y-%m-%dT%H:%M:%S')
+                route_result[category_short_eu]['total_emissions']['co2_kg'] = round(
+                    float(total_co2_gram[row]) / 1000, 6)
+                route_result[category_short_eu]['fuel_factors']['liter_per_100km'] = round(
+                    as_float(fuel_calculation.liter_per_100_km), 1)
+                route_result[category_short_eu]['fuel_factors']['co2_gram_per_km'] = round(
+                    as_float(fuel_calculation.co2_gram_per_km), 6)
+                route_result[category_short_eu]['fuel_factors']['co2_gram_per_liter'] = round(
+                    as_float(fuel_calculation.co2_gram_per_liter), 6)
         for category in vehicle_categories:
             if category not in route_result:
                 route_result[category] = dict()
@@ -203,6 +219,9 @@ class FuelModelCalculationObject(object):
 
 class FuelModel(object):
     def __init__(self, category_statistics: list) -> None:
+        """
+        :param category_statistics: Rows of query_ec_category_statistics for the CO2, Consumption and Speed phenomenon
+        """
         co2_statistic: EnvirocarAverageVehicleTypeStatisticModel or EnvirocarAverageCategoryStatisticsModel = None
         consumption_statistic: EnvirocarAverageVehicleTypeStatisticModel or EnvirocarAverageCategoryStatisticsModel = None
         speed_statistic: EnvirocarAverageVehicleTypeStatisticModel or EnvirocarAverageCategoryStatisticsModel = None
@@ -218,8 +237,7 @@ class FuelModel(object):
                 self.fuel_type = statistic.fuel_type
                 self.number_sensors = statistic.numb_sensors
                 self.number_measurements = statistic.measurements
-                if type(statistic) == EnvirocarAverageCategoryStatisticsModel:
-                    self.category_short_eu = statistic.category_short_eu
+                self.category_short_eu = getattr(statistic, 'category_short_eu', None)
                 pass
             elif statistic.phenomenon_name == 'Consumption':
                 consumption_statistic = statistic
@@ -228,9 +246,9 @@ class FuelModel(object):
                 speed_statistic = statistic
                 pass
         self.average_tank_capacity: int = vehicle_categories[self.category_short_eu]['tank_capacity']
-        self.co2_unit: str = co2_statistic.ec_phenomenons.unit
-        self.consumption_unit: str = consumption_statistic.ec_phenomenons.unit
-        self.speed_unit: str = speed_statistic.ec_phenomenons.unit
+        self.co2_unit: str = co2_statistic.unit
+        self.consumption_unit: str = consumption_statistic.unit
+        self.speed_unit: str = speed_statistic.unit
         self.co2_min: Decimal = co2_statistic.min
         self.co2_average: Decimal = co2_statistic.average
         self.co2_max: Decimal = co2_statistic.max
@@ -254,30 +272,33 @@ class FuelModel(object):
 class EnvirocarFuelModel(FuelModel):
     def __init__(self, category_statistics: list):
         super().__init__(category_statistics=category_statistics)
+        speed_per_hour: [] = [float(self.speed_min), float(self.speed_average), float(self.speed_max)]
+        self.consumption_coefficients: ndarray = fit_quadratic(speeds=speed_per_hour,
+                                                               values=[float(self.consumption_min),
+                                                                       float(self.consumption_average),
+                                                                       float(self.consumption_max)])
+        self.co2_coefficients: ndarray = fit_quadratic(speeds=speed_per_hour,
+                                                       values=[float(self.co2_min), float(self.co2_average),
+                                                               float(self.co2_max)])
+
+    def consumption_for_kmh(self, kmh: int or ndarray) -> float or ndarray:
+        return numpy.polyval(self.consumption_coefficients, kmh)
+
+    def co2_for_kmh(self, kmh: int or ndarray) -> float or ndarray:
+        return numpy.polyval(self.co2_coefficients, kmh)
 
     def calculate_route(self, kmh: int, length_m: float,
                         manual_consumption_per_100km: float = None) -> FuelModelCalculationObject:
         kmh = int(kmh)
         length_km = length_m * 0.0010000
-        speed_per_hour: [] = [float(self.speed_min), float(self.speed_average), float(self.speed_max)]
-        consumption_per_hour: [] = [float(self.consumption_min),
-                                    float(self.consumption_average),
-                                    float(self.consumption_max)]
-        co2_per_hour: [] = [float(self.co2_min), float(self.co2_average), float(self.co2_max)]
-
-        interpolation_consumption = interp1d(speed_per_hour, consumption_per_hour, kind='quadratic',
-                                             bounds_error=False,
-                                             fill_value='interpolate')
-        self.liter_for_kmh = interpolation_consumption(kmh)
+        self.liter_for_kmh = self.consumption_for_kmh(kmh)
 
         if manual_consumption_per_100km is None:
             self.liter_per_km = self.liter_for_kmh / kmh
         else:
             self.liter_per_km = (manual_consumption_per_100km / 100)
-        interpolation_co2 = interp1d(speed_per_hour, co2_per_hour, kind='quadratic', bounds_error=False,
-                                     fill_value='interpolate')
 
-        self.co2_kg_for_kmh = interpolation_co2(kmh)
+        self.co2_kg_for_kmh = self.co2_for_kmh(kmh)
         self.co2_kg_per_m = self.co2_kg_for_kmh / kmh
         self.co2_gram_per_km = self.co2_kg_per_m * 1000
         co2_gram_per_liter = self.co2_gram_per_km / self.liter_per_km
@@ -301,64 +322,34 @@ class EnvirocarFuelModel(FuelModel):
         calculation_object.co2_gram_per_liter = self.co2_gram_per_liter
         return calculation_object
 
-    def extrap1d(self, interpolator):
-        xs = interpolator.x
-        ys = interpolator.y
-
-        def pointwise(x):
-            if x < xs[0]:
-                return ys[0] + (x - xs[0]) * (ys[1] - ys[0]) / (xs[1] - xs[0])
-            elif x > xs[-1]:
-                return ys[-1] + (x - xs[-1]) * (ys[-1] - ys[-2]) / (xs[-1] - xs[-2])
-            else:
-                return interpolator(x)
-
-        def ufunclike(xs):
-            return array(map(pointwise, array(xs)))
-
-        return ufunclike
-
-    def get_consumption_growth_factor(self, start_speed: int, dest_speed: int):
+    def get_consumption_growth_factor(self, start_speed: int or ndarray, dest_speed: int or ndarray):
         """
         Returns the consumption growth factor for the consumption per kilometer as float.
+        Speed arrays are evaluated element wise and return arrays of factors.
         :param start_speed:
         :param dest_speed:
         """
-        dest_speed = int(dest_speed)
-        start_speed = int(start_speed)
-        speed_per_hour: [] = array([float(self.speed_min), float(self.speed_average), float(self.speed_max)])
-        consumption_per_hour: [] = array([float(self.consumption_min),
-                                          float(self.consumption_average),
-                                          float(self.consumption_max)])
-        co2_per_hour: [] = [float(self.co2_min), float(self.co2_average), float(self.co2_max)]
-
-        interpolation = interp1d(speed_per_hour, consumption_per_hour, kind='quadratic',
-                                 bounds_error=False, fill_value='extrapolate')
-
-        interpolation_co2 = interp1d(speed_per_hour, co2_per_hour, kind='quadratic', bounds_error=False,
-                                     fill_value='extrapolate')
-
-        start_co2_kg_for_kmh = interpolation_co2(start_speed)
-        if start_co2_kg_for_kmh < 0:
-            start_co2_kg_for_kmh = 0
-        end_co2_kg_for_kmh = interpolation_co2(dest_speed)
-        if end_co2_kg_for_kmh < 0:
-            end_co2_kg_for_kmh = 0
-        start_co2_kg_for_km = start_co2_kg_for_kmh / start_speed
-        if start_co2_kg_for_km < 0:
-            start_co2_kg_for_km = 0
-        end_co2_kg_for_km = end_co2_kg_for_kmh / dest_speed
-        if end_co2_kg_for_km < 0:
-            end_co2_kg_for_km = 0
-        start_kmh_liter = interpolation(start_speed)
-        dest_kmh_liter = interpolation(dest_speed)
-        start_liter_per_km = start_kmh_liter / start_speed
-        dest_liter_per_km = dest_kmh_liter / dest_speed
-        if dest_liter_per_km <= 0:
-            dest_liter_per_km = 0.00000001
-
-        fuel_multiplicator = math.sqrt(dest_liter_per_km / start_liter_per_km) - 1
-        co2_multiplicator = math.sqrt(end_co2_kg_for_km / start_co2_kg_for_km) - 1
+        dest_speed = numpy.asarray(dest_speed).astype(int)
+        start_speed = numpy.asarray(start_speed).astype(int)
+
+        start_co2_kg_for_km = numpy.maximum(numpy.maximum(self.co2_for_kmh(start_speed), 0) / start_speed, 0)
+        end_co2_kg_for_km = numpy.maximum(numpy.maximum(self.co2_for_kmh(dest_speed), 0) / dest_speed, 0)
+        start_liter_per_km = self.consumption_for_kmh(start_speed) / start_speed
+        dest_liter_per_km = self.consumption_for_kmh(dest_speed) / dest_speed
+        dest_liter_per_km = numpy.where(dest_liter_per_km <= 0, 0.00000001, dest_liter_per_km)
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            fuel_ratio = dest_liter_per_km / start_liter_per_km
+            co2_ratio = end_co2_kg_for_km / start_co2_kg_for_km
+        # math.sqrt raised for these ratios, numpy would return NaN factors that end up in the json responses
+        if not numpy.all(numpy.isfinite(fuel_ratio) & (fuel_ratio >= 0)) or \
+                not numpy.all(numpy.isfinite(co2_ratio) & (co2_ratio >= 0)):
+            raise ValueError('The consumption growth factor is undefined between {} and {} km/h'.format(
+                start_speed, dest_speed))
+        fuel_multiplicator = numpy.sqrt(fuel_ratio) - 1
+        co2_multiplicator = numpy.sqrt(co2_ratio) - 1
 
         # factor2 = (dest_liter_per_km - start_liter_per_km) / start_liter_per_km
+        if fuel_multiplicator.ndim == 0:
+            return float(fuel_multiplicator), float(co2_multiplicator)
         return fuel_multiplicator, co2_multiplicator
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from openfuelservice.server import ofs_settings
+from openfuelservice.server.base_calculations.data_provider import get_data_provider
+
+data_version_check_interval = ofs_settings['general']['advanced_settings'].get('data_version_check_interval', 60)
+
+
+class FuelModelRegistry(object):
+    def __init__(self, data_version_name: str = 'statistics', check_interval: float = data_version_check_interval):
+        """
+        Keeps the fuel models of a worker in memory, so they are only built once per imported statistics version.
+        The version is checked at most once per check interval. A new version drops all cached fuel models.
+
+        :param data_version_name: Name of the data version bumped by the statistics import
+        :param check_interval: Seconds between two version checks
+        """
+        self.data_version_name: str = data_version_name
+        self.check_interval: float = check_interval
+        self.data_version: int = None
+        self.checked_at: float = None
+        self.fuel_models: dict = dict()
+        self._lock = threading.Lock()
+
+    def validate(self):
+        """
+        Drops the cached fuel models if the statistics were imported again since the last check.
+        """
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self.checked_at is not None and now - self.checked_at < self.check_interval:
+                return
+            data_version = get_data_provider().data_version(name=self.data_version_name)
+            if data_version != self.data_version:
+                self.fuel_models = dict()
+                self.data_version = data_version
+            self.checked_at = now
+
+    def get_many(self, keys: [tuple], build) -> list:
+        """
+        Returns the cached fuel models for every key. All missing keys are built together.
+
+        :param keys: List of (data_source, fuel_type, category, year) keys
+        :param build: Function that takes the missing keys and returns a dict of the keys and their fuel models
+        :return: Returns the fuel models in the order of the keys
+        """
+        self.validate()
+        fuel_models = self.fuel_models
+        missing_keys = [key for key in keys if key not in fuel_models]
+        if len(missing_keys) > 0:
+            fuel_models.update(build(missing_keys))
+        return [fuel_models[key] for key in keys]
+
+    def clear(self):
+        """
+        Drops all cached fuel models, so they are rebuilt on their next use.
+        """
+        with self._lock:
+            self.fuel_models = dict()
+            self.checked_at = None
+
+
+fuel_model_registry = FuelModelRegistry()
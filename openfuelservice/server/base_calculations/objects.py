@@ -1,28 +1,109 @@
 from datetime import date
 
 from geoalchemy2.shape import to_shape
-from geopy.distance import geodesic
-from shapely.geometry import LineString, Point
+from shapely.geometry import LineString, Point, MultiLineString
+from shapely.prepared import prep
 
-from openfuelservice.server.base_calculations.queries import query_general_price, query_country_price_by_linestring
+from openfuelservice.server import ofs_settings
+from openfuelservice.server.base_calculations.country_index import CountryIndex, get_country_index
+from openfuelservice.server.base_calculations.data_provider import get_data_provider
 from openfuelservice.server.db_import.eurostat.objects import CountryPrice, GeneralPrice, CountryPriceExtended
 from openfuelservice.server.objects import Filters
-from openfuelservice.server.utils.misc.geometries import true_linestring_length
+from openfuelservice.server.utils.misc.geometries import true_linestring_length, wgs84_geod
+from openfuelservice.server.utils.processing.timing import stage_timer
 
+route_splitting = ofs_settings['general']['advanced_settings'].get('route_splitting', 'index')
 
-def parse_price_model(line_string: LineString) -> []:
+
+class PriceCollection(object):
+    def __init__(self, line_strings: [LineString]):
+        """
+        Holds the latest prices of all countries crossed by a collection of routes. The database is only queried once
+        for the whole collection, the routes are split locally afterwards.
+
+        :param line_strings: A list of valid shapely LineStrings
+        """
+        self.general_price: GeneralPrice = get_data_provider().general_price()
+        self.country_prices: [CountryPriceExtended] = get_data_provider().country_prices_by_linestring(
+            linestring=MultiLineString(line_strings))
+        self.country_geometries: dict = dict()
+        country_price_extended: CountryPriceExtended
+        for country_price_extended in self.country_prices:
+            country_geom = to_shape(country_price_extended.geom)
+            self.country_geometries[country_price_extended.country_alpha_2] = (country_geom, prep(country_geom))
+
+    def get_country_prices(self, line_string: LineString) -> [CountryPriceExtended]:
+        country_prices = []
+        for country_price_extended in self.country_prices:
+            prepared_geom = self.country_geometries[country_price_extended.country_alpha_2][1]
+            if prepared_geom.intersects(line_string):
+                country_prices.append(country_price_extended)
+        return country_prices
+
+    def get_country_geometry(self, country_alpha_2: str):
+        return self.country_geometries[country_alpha_2][0]
+
+
+def parse_indexed_price_model(line_string: LineString) -> []:
+    country_index: CountryIndex = get_country_index()
+    country_parts, remaining_linestring = country_index.split_linestring(line_string=line_string)
     prices: list = []
-    cpe_list: list = query_country_price_by_linestring(linestring=line_string)
-    gpo: GeneralPrice = query_general_price()
+    for country_price_extended, intersecting_route_part in country_parts:
+        prices.append(CountryLinePrice(
+            linestring=intersecting_route_part,
+            country_price=country_price_extended.get_country_price_object()
+        ))
+    if remaining_linestring.length > 0:
+        prices.append(GeneralLinePrice(
+            linestring=remaining_linestring,
+            general_price=country_index.general_price
+        ))
+    return prices
+
+
+def parse_database_price_model(line_string: LineString) -> []:
+    route_parts, remaining_length_m = get_data_provider().route_parts_by_linestring(linestring=line_string)
+    prices: list = []
+    for country_price, length_m in route_parts:
+        prices.append(CountryLinePrice(
+            linestring=None,
+            country_price=country_price,
+            length_m=length_m
+        ))
+    if remaining_length_m > 0:
+        prices.append(GeneralLinePrice(
+            linestring=None,
+            general_price=get_data_provider().general_price(),
+            length_m=remaining_length_m
+        ))
+    return prices
+
+
+def parse_price_model(line_string: LineString, price_collection: PriceCollection = None) -> []:
+    if route_splitting == 'index':
+        return parse_indexed_price_model(line_string=line_string)
+    elif route_splitting == 'database':
+        return parse_database_price_model(line_string=line_string)
+    prices: list = []
+    if price_collection is None:
+        cpe_list: list = get_data_provider().country_prices_by_linestring(linestring=line_string)
+        gpo: GeneralPrice = get_data_provider().general_price()
+    else:
+        cpe_list: list = price_collection.get_country_prices(line_string=line_string)
+        gpo: GeneralPrice = price_collection.general_price
     country_price_extended: CountryPriceExtended
     # TODO 1. Line poly intersection 2. Create CountryLinePrice Object 3. Append to result 4. Get remaining Points by difference 5. Add GPo to them
     # 6. Revise calculation!
     remaining_linestring: LineString = line_string
 
     for country_price_extended in cpe_list:
-        country_geom = to_shape(country_price_extended.geom)
+        if price_collection is None:
+            country_geom = to_shape(country_price_extended.geom)
+        else:
+            country_geom = price_collection.get_country_geometry(country_price_extended.country_alpha_2)
         intersecting_route_part = country_geom.intersection(line_string)
-        remaining_linestring = remaining_linestring.difference(intersecting_route_part)
+        # The clipped part is not exactly on the route, so the border itself is subtracted
+        remaining_linestring = remaining_linestring.difference(country_geom)
         prices.append(CountryLinePrice(
             linestring=intersecting_route_part,
             country_price=country_price_extended.get_country_price_object()
@@ -36,18 +117,21 @@ def parse_price_model(line_string: LineString) -> []:
 
 
 class Route(object):
-    def __init__(self, geom: LineString, filters: Filters):
+    def __init__(self, geom: LineString, filters: Filters, price_collection: PriceCollection = None):
         """
         Initializes the basic calculation object. From it the route costs will be calculated.
         It sets the fuel type and vehicle type to predefined standards when not set in filters.
 
         :param geom: A valid shapely LineString
         :param filters: A dict holding the processing filters
+        :param price_collection: Optional prices shared between many routes. Queried for the route if not set.
         """
         self.geom: LineString = geom
         self.filters: Filters = filters
         self.categories: [] = filters.vehicle_categories
-        self.price_models: [CountryLinePrice or GeneralLinePrice] = parse_price_model(self.geom)
+        with stage_timer('price_split'):
+            self.price_models: [CountryLinePrice or GeneralLinePrice] = parse_price_model(
+                self.geom, price_collection=price_collection)
         self.route_length = true_linestring_length(linestring=self.geom)
         self.fuel_models = None
 
@@ -60,64 +144,77 @@ class LinePriceCalculationObject(object):
 
 
 class LinePrice(object):
-    def __init__(self, linestring: LineString):
+    def __init__(self, linestring: LineString, length_m: float = None):
+        """
+        :param linestring: The route part the price applies to
+        :param length_m: Optional length of the route part in meters, when it is already known
+        """
         self.linestring: LineString = linestring
+        self.length_m: float = length_m
+
+    def get_length_m(self) -> float:
+        if self.length_m is None:
+            self.length_m = true_linestring_length(linestring=self.linestring)
+        return self.length_m
+
+    def get_fuel_prices(self, fuel_type: str) -> tuple:
+        """
+        Returns the price per liter with and without taxes for the given fuel type.
+        """
+        return 0, 0
+
+    def get_cost_date(self) -> date:
+        return None
 
     def calculate_cost(self, liter: float, fuel_type: str) -> LinePriceCalculationObject:
         return LinePriceCalculationObject()
 
 
 class CountryLinePrice(LinePrice):
-    def __init__(self, linestring: LineString, country_price: CountryPrice):
-        super().__init__(linestring=linestring)
+    def __init__(self, linestring: LineString, country_price: CountryPrice, length_m: float = None):
+        super().__init__(linestring=linestring, length_m=length_m)
         self.country_price = country_price
 
-    def calculate_cost(self, liter: float, fuel_type: object) -> LinePriceCalculationObject:
-        fuel_cost_tax = 0
-        fuel_cost_wo_tax = 0
-        cost_date = self.country_price.date
+    def get_fuel_prices(self, fuel_type: str) -> tuple:
         if fuel_type == 'gasoline':
-            gasoline_price_tax = float(self.country_price.euro_ttc)
-            gasoline_price_wo_tax = float(self.country_price.euro_ht)
-            fuel_cost_tax = gasoline_price_tax * liter
-            fuel_cost_wo_tax = gasoline_price_wo_tax * liter
-            pass
+            return float(self.country_price.euro_ttc), float(self.country_price.euro_ht)
         elif fuel_type == 'diesel':
-            diesel_price_tax = float(self.country_price.diesel_ttc)
-            diesel_price_wo_tax = float(self.country_price.diesel_ht)
-            fuel_cost_tax = diesel_price_tax * liter
-            fuel_cost_wo_tax = diesel_price_wo_tax * liter
+            return float(self.country_price.diesel_ttc), float(self.country_price.diesel_ht)
+        return 0, 0
+
+    def get_cost_date(self) -> date:
+        return self.country_price.date
+
+    def calculate_cost(self, liter: float, fuel_type: str) -> LinePriceCalculationObject:
+        price_tax, price_wo_tax = self.get_fuel_prices(fuel_type=fuel_type)
         line_price_object = LinePriceCalculationObject()
-        line_price_object.fuel_cost_wo_tax = fuel_cost_wo_tax
-        line_price_object.fuel_cost_tax = fuel_cost_tax
-        line_price_object.cost_date = cost_date
+        line_price_object.fuel_cost_wo_tax = price_wo_tax * liter
+        line_price_object.fuel_cost_tax = price_tax * liter
+        line_price_object.cost_date = self.get_cost_date()
         return line_price_object
 
 
 class GeneralLinePrice(LinePrice):
-    def __init__(self, linestring: LineString, general_price: GeneralPrice):
-        super().__init__(linestring=linestring)
+    def __init__(self, linestring: LineString, general_price: GeneralPrice, length_m: float = None):
+        super().__init__(linestring=linestring, length_m=length_m)
         self.general_price = general_price
 
-    def calculate_cost(self, liter, fuel_type) -> LinePriceCalculationObject:
-        fuel_cost_tax = 0
-        fuel_cost_wo_tax = 0
-        cost_date = self.general_price.date
+    def get_fuel_prices(self, fuel_type: str) -> tuple:
         if fuel_type == 'gasoline':
-            gasoline_price_tax = float(self.general_price.euro_ttc)
-            gasoline_price_wo_tax = float(self.general_price.euro_ht)
-            fuel_cost_tax = gasoline_price_tax * liter
-            fuel_cost_wo_tax = gasoline_price_wo_tax * liter
-            pass
+            return float(self.general_price.euro_ttc), float(self.general_price.euro_ht)
         elif fuel_type == 'diesel':
-            diesel_price_tax = float(self.general_price.diesel_ttc)
-            diesel_price_wo_tax = float(self.general_price.diesel_ht)
-            fuel_cost_tax = diesel_price_tax * liter
-            fuel_cost_wo_tax = diesel_price_wo_tax * liter
+            return float(self.general_price.diesel_ttc), float(self.general_price.diesel_ht)
+        return 0, 0
+
+    def get_cost_date(self) -> date:
+        return self.general_price.date
+
+    def calculate_cost(self, liter: float, fuel_type: str) -> LinePriceCalculationObject:
+        price_tax, price_wo_tax = self.get_fuel_prices(fuel_type=fuel_type)
         line_price_object = LinePriceCalculationObject()
-        line_price_object.fuel_cost_wo_tax = fuel_cost_wo_tax
-        line_price_object.fuel_cost_tax = fuel_cost_tax
-        line_price_object.cost_date = cost_date
+        line_price_object.fuel_cost_wo_tax = price_wo_tax * liter
+        line_price_object.fuel_cost_tax = price_tax * liter
+        line_price_object.cost_date = self.get_cost_date()
         return line_price_object
 
 
@@ -135,8 +232,8 @@ class PointPrice(object):
 
     @staticmethod
     def calculate_distance(point1: Point, point2: Point) -> float:
-        distance: float = geodesic((point1.y, point1.x), (point2.y, point2.x)).meters
-        return distance
+        _, _, distance = wgs84_geod.inv(point1.x, point1.y, point2.x, point2.y)
+        return float(distance)
 
     def calculate_cost(self, liter, fuel_type) -> float and float and date:
         return float, float, date
@@ -1,36 +1,26 @@
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point, LineString
-from sqlalchemy import desc, or_, and_, asc
+from sqlalchemy import desc, or_, and_, asc, text
 
 from openfuelservice.server import db
 from openfuelservice.server.db_import.eurostat.objects import CountryPrice, GeneralPrice, CountryPriceExtended
 from openfuelservice.server.db_import.models import CountryDataModel, EurostatCountryPriceModel, \
-    EurostatGeneralPriceModel, \
+    EurostatGeneralPriceModel, EurostatLatestCountryPriceModel, EurostatLatestGeneralPriceModel, \
     EnvirocarAverageCategoryStatisticsModel, \
-    EnvirocarPhenomenonModel, CarCategoryModel, CarFuelDataAverageCategoryStatisticsModel, CarfuelDataCarModel
+    EnvirocarPhenomenonModel, CarCategoryModel, CarFuelDataAverageCategoryStatisticsModel, CarfuelDataCarModel, \
+    DataVersionModel, CatalogueSnapshotModel
 
 
-def query_country_price_by_linestring(linestring: LineString):
-    wkt_element = from_shape(shape=linestring, srid=4326)
-    query = (
-        db.session.query(CountryDataModel.country_alpha_2, CountryDataModel.geom, EurostatCountryPriceModel.date,
-                         EurostatCountryPriceModel.diesel_quantity,
-                         EurostatCountryPriceModel.diesel_unit, EurostatCountryPriceModel.diesel_ttc,
-                         EurostatCountryPriceModel.diesel_ht,
-                         EurostatCountryPriceModel.euro_quantity,
-                         EurostatCountryPriceModel.euro_unit, EurostatCountryPriceModel.euro_ttc,
-                         EurostatCountryPriceModel.euro_ht,
-                         EurostatCountryPriceModel.taux).filter(
-            CountryDataModel.geom.ST_Intersects(wkt_element)).join(
-            EurostatCountryPriceModel,
-            CountryDataModel.country_alpha_2 == EurostatCountryPriceModel.country_alpha_2).order_by(
-            desc(EurostatCountryPriceModel.date)).all())
-    country_check = []
+def parse_latest_country_prices(query_result: list) -> [CountryPriceExtended]:
+    """
+    Keeps the first price of every country from a query result ordered by the price date, newest first.
+    """
+    country_check = set()
     cpo_extended_return = []
-    for result in query:
+    for result in query_result:
         country = result.country_alpha_2
         if country not in country_check:
-            country_check.append(country)
+            country_check.add(country)
             cpo_extended_return.append(CountryPriceExtended(
                 date=result.date,
                 country_alpha_2=result.country_alpha_2,
@@ -49,24 +39,111 @@ def query_country_price_by_linestring(linestring: LineString):
     return cpo_extended_return
 
 
+def query_country_price_by_linestring(linestring: LineString):
+    wkt_element = from_shape(shape=linestring, srid=4326)
+    query = (
+        db.session.query(CountryDataModel.country_alpha_2, CountryDataModel.geom, EurostatLatestCountryPriceModel.date,
+                         EurostatLatestCountryPriceModel.diesel_quantity,
+                         EurostatLatestCountryPriceModel.diesel_unit, EurostatLatestCountryPriceModel.diesel_ttc,
+                         EurostatLatestCountryPriceModel.diesel_ht,
+                         EurostatLatestCountryPriceModel.euro_quantity,
+                         EurostatLatestCountryPriceModel.euro_unit, EurostatLatestCountryPriceModel.euro_ttc,
+                         EurostatLatestCountryPriceModel.euro_ht,
+                         EurostatLatestCountryPriceModel.taux).filter(
+            CountryDataModel.geom.ST_Intersects(wkt_element)).join(
+            EurostatLatestCountryPriceModel,
+            CountryDataModel.country_alpha_2 == EurostatLatestCountryPriceModel.country_alpha_2).order_by(
+            desc(EurostatLatestCountryPriceModel.date)).all())
+    return parse_latest_country_prices(query_result=query)
+
+
+def query_latest_country_prices() -> [CountryPriceExtended]:
+    """
+    Returns the latest price together with the border of every country that has prices.
+    """
+    query = (
+        db.session.query(CountryDataModel.country_alpha_2, CountryDataModel.geom, EurostatLatestCountryPriceModel.date,
+                         EurostatLatestCountryPriceModel.diesel_quantity,
+                         EurostatLatestCountryPriceModel.diesel_unit, EurostatLatestCountryPriceModel.diesel_ttc,
+                         EurostatLatestCountryPriceModel.diesel_ht,
+                         EurostatLatestCountryPriceModel.euro_quantity,
+                         EurostatLatestCountryPriceModel.euro_unit, EurostatLatestCountryPriceModel.euro_ttc,
+                         EurostatLatestCountryPriceModel.euro_ht,
+                         EurostatLatestCountryPriceModel.taux).join(
+            EurostatLatestCountryPriceModel,
+            CountryDataModel.country_alpha_2 == EurostatLatestCountryPriceModel.country_alpha_2).order_by(
+            desc(EurostatLatestCountryPriceModel.date)).all())
+    return parse_latest_country_prices(query_result=query)
+
+
+def query_route_parts_by_linestring(linestring: LineString) -> ([(CountryPrice, float)], float):
+    """
+    Splits a route into its country parts with a single statement in PostGIS. Only the geodesic lengths of the parts
+    and the latest prices are returned, no geometries.
+
+    :param linestring: A valid shapely LineString
+    :return: Returns the country prices with the length in meters of their route parts, newest prices first, and the
+    length in meters of the route outside of all countries with prices
+    """
+    statement = text("""
+        WITH route AS (SELECT ST_GeomFromText(:route, 4326) AS geom),
+        priced_parts AS (
+            SELECT country.country_alpha_2,
+                   ST_Length(ST_CollectionExtract(ST_Intersection(country.geom, route.geom), 2)::geography) AS length_m,
+                   price.date, price.taux, price.euro_ht, price.euro_ttc, price.euro_unit, price.euro_quantity,
+                   price.diesel_ht, price.diesel_ttc, price.diesel_unit, price.diesel_quantity
+            FROM route
+            JOIN {countries} AS country ON ST_Intersects(country.geom, route.geom)
+            JOIN {prices} AS price ON price.country_alpha_2 = country.country_alpha_2
+        )
+        SELECT route_length.length_m AS route_length_m, priced_parts.*
+        FROM (SELECT ST_Length(route.geom::geography) AS length_m FROM route) AS route_length
+        LEFT JOIN priced_parts ON TRUE
+        ORDER BY priced_parts.date DESC
+    """.format(countries=CountryDataModel.__tablename__, prices=EurostatLatestCountryPriceModel.__tablename__))
+    query = db.session.execute(statement, {'route': linestring.wkt}).fetchall()
+    route_parts = []
+    remaining_length_m = 0
+    for result in query:
+        remaining_length_m = float(result.route_length_m)
+        if result.country_alpha_2 is None or not result.length_m:
+            continue
+        route_parts.append((CountryPrice(
+            date=result.date,
+            country_alpha_2=result.country_alpha_2,
+            euro_ttc=result.euro_ttc / result.euro_quantity,
+            diesel_ttc=result.diesel_ttc / result.diesel_quantity,
+            euro_unit=result.euro_unit,
+            euro_quantity=result.euro_quantity / result.euro_quantity,
+            diesel_unit=result.diesel_unit,
+            diesel_quantity=result.diesel_quantity / result.diesel_quantity,
+            euro_price=1,
+            taux=result.taux,
+            diesel_ht=result.diesel_ht / result.diesel_quantity,
+            euro_ht=result.euro_ht / result.euro_quantity
+        ), float(result.length_m)))
+    for country_price, length_m in route_parts:
+        remaining_length_m -= length_m
+    return route_parts, max(remaining_length_m, 0)
+
+
 def query_country_price_by_point(point: Point) -> CountryPrice:
     wkt_element = from_shape(point, srid=4326)
     query = (
         db.session.query(CountryDataModel.country_alpha_2,
-                         EurostatCountryPriceModel.date,
-                         EurostatCountryPriceModel.diesel_quantity,
-                         EurostatCountryPriceModel.diesel_unit,
-                         EurostatCountryPriceModel.diesel_ttc,
-                         EurostatCountryPriceModel.diesel_ht,
-                         EurostatCountryPriceModel.euro_quantity,
-                         EurostatCountryPriceModel.euro_unit,
-                         EurostatCountryPriceModel.euro_ttc,
-                         EurostatCountryPriceModel.euro_ht,
-                         EurostatCountryPriceModel.taux).filter(
+                         EurostatLatestCountryPriceModel.date,
+                         EurostatLatestCountryPriceModel.diesel_quantity,
+                         EurostatLatestCountryPriceModel.diesel_unit,
+                         EurostatLatestCountryPriceModel.diesel_ttc,
+                         EurostatLatestCountryPriceModel.diesel_ht,
+                         EurostatLatestCountryPriceModel.euro_quantity,
+                         EurostatLatestCountryPriceModel.euro_unit,
+                         EurostatLatestCountryPriceModel.euro_ttc,
+                         EurostatLatestCountryPriceModel.euro_ht,
+                         EurostatLatestCountryPriceModel.taux).filter(
             CountryDataModel.geom.ST_Intersects(wkt_element)).join(
-            EurostatCountryPriceModel,
-            CountryDataModel.country_alpha_2 == EurostatCountryPriceModel.country_alpha_2).order_by(
-            desc(EurostatCountryPriceModel.date)).first())
+            EurostatLatestCountryPriceModel,
+            CountryDataModel.country_alpha_2 == EurostatLatestCountryPriceModel.country_alpha_2).first())
     cpo = CountryPrice(
         date=query.date,
         country_alpha_2=query.country_alpha_2,
@@ -114,14 +191,13 @@ def query_oldest_country_price(country):
 
 def query_general_price() -> GeneralPrice:
     query = (
-        db.session.query(EurostatGeneralPriceModel.date, EurostatGeneralPriceModel.euro_ttc,
-                         EurostatGeneralPriceModel.euro_ht,
-                         EurostatGeneralPriceModel.euro_unit,
-                         EurostatGeneralPriceModel.euro_quantity,
-                         EurostatGeneralPriceModel.diesel_ttc, EurostatGeneralPriceModel.diesel_ht,
-                         EurostatGeneralPriceModel.diesel_unit,
-                         EurostatGeneralPriceModel.diesel_quantity).order_by(
-            desc(EurostatGeneralPriceModel.date)).first())
+        db.session.query(EurostatLatestGeneralPriceModel.date, EurostatLatestGeneralPriceModel.euro_ttc,
+                         EurostatLatestGeneralPriceModel.euro_ht,
+                         EurostatLatestGeneralPriceModel.euro_unit,
+                         EurostatLatestGeneralPriceModel.euro_quantity,
+                         EurostatLatestGeneralPriceModel.diesel_ttc, EurostatLatestGeneralPriceModel.diesel_ht,
+                         EurostatLatestGeneralPriceModel.diesel_unit,
+                         EurostatLatestGeneralPriceModel.diesel_quantity).first())
     gpo = GeneralPrice(
         date=query.date,
         euro_ttc=query.euro_ttc / query.euro_quantity,
@@ -161,41 +237,68 @@ def query_cfd_model(cfd_id: str):
             CarfuelDataCarModel.hash_id == cfd_id).first())
     return query
 
-def query_cfd_category(fuel_type: str, category: str) -> list:
-    query: list = (
-        db.session.query(CarFuelDataAverageCategoryStatisticsModel).filter(
-            or_(CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'co2_g_per_km',
-                CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'metric_combined',
-                CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'metric_extra_urban',
-                CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'metric_urban_cold',
-                CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'emissions_co_mg_per_km',
-                CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'emissions_nox_mg_per_km',
-                CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'thc_emissions_mg_per_km',
-                CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'thc_plus_nox_emissions_mg_per_km',
-                CarFuelDataAverageCategoryStatisticsModel.phenomenon_name == 'noise_level_dB_a_'),
-            and_(CarFuelDataAverageCategoryStatisticsModel.fuel_type == fuel_type,
-                 CarFuelDataAverageCategoryStatisticsModel.category_short_eu == category)).all())
-    return query
 
+def query_cfd_models(cfd_ids: [str]) -> [CarfuelDataCarModel]:
+    """
+    Loads many cfd cars with a single query.
 
-def query_ec_category(fuel_type: str, category: str) -> list:
-    query: list = (
-        db.session.query(EnvirocarAverageCategoryStatisticsModel).filter(
-            or_(EnvirocarPhenomenonModel.name == 'CO2', EnvirocarPhenomenonModel.name == 'Consumption',
-                EnvirocarPhenomenonModel.name == 'Speed'),
-            and_(EnvirocarAverageCategoryStatisticsModel.fuel_type == fuel_type)).join(
-            EnvirocarPhenomenonModel,
-            EnvirocarPhenomenonModel.name == EnvirocarAverageCategoryStatisticsModel.phenomenon_name).all())
+    :return: Returns the found cars in the order of the cfd_ids. Unknown ids are skipped.
+    """
+    if cfd_ids is None or len(cfd_ids) == 0:
+        return []
+    query: list = db.session.query(CarfuelDataCarModel).filter(CarfuelDataCarModel.hash_id.in_(set(cfd_ids))).all()
+    cfd_models = {cfd_model.hash_id: cfd_model for cfd_model in query}
+    return [cfd_models[cfd_id] for cfd_id in cfd_ids if cfd_id in cfd_models]
 
-    query: list = (
-        db.session.query(EnvirocarAverageCategoryStatisticsModel).filter(
-            or_(EnvirocarPhenomenonModel.name == 'CO2', EnvirocarPhenomenonModel.name == 'Consumption',
-                EnvirocarPhenomenonModel.name == 'Speed'),
-            and_(EnvirocarAverageCategoryStatisticsModel.fuel_type == fuel_type),
-            and_(EnvirocarAverageCategoryStatisticsModel.category_short_eu == category)).join(
-            EnvirocarPhenomenonModel,
-            EnvirocarPhenomenonModel.name == EnvirocarAverageCategoryStatisticsModel.phenomenon_name).all())
-    return query
+def query_cfd_category_statistics(fuel_type: str, categories: [str] = None) -> list:
+    """
+    Queries the average statistics of many categories at once.
+
+    :param fuel_type: The fuel type of the statistics
+    :param categories: The category_short_eu codes. All categories are queried if None.
+    :return: Returns light weight rows with the columns the fuel models are built from
+    """
+    query = db.session.query(CarFuelDataAverageCategoryStatisticsModel.category_short_eu,
+                             CarFuelDataAverageCategoryStatisticsModel.fuel_type,
+                             CarFuelDataAverageCategoryStatisticsModel.phenomenon_name,
+                             CarFuelDataAverageCategoryStatisticsModel.value,
+                             CarFuelDataAverageCategoryStatisticsModel.numb_cars,
+                             CarFuelDataAverageCategoryStatisticsModel.year).filter(
+        CarFuelDataAverageCategoryStatisticsModel.phenomenon_name.in_(
+            ['co2_g_per_km', 'metric_combined', 'metric_extra_urban', 'metric_urban_cold', 'emissions_co_mg_per_km',
+             'emissions_nox_mg_per_km', 'thc_emissions_mg_per_km', 'thc_plus_nox_emissions_mg_per_km',
+             'noise_level_dB_a_']),
+        CarFuelDataAverageCategoryStatisticsModel.fuel_type == fuel_type)
+    if categories is not None:
+        query = query.filter(CarFuelDataAverageCategoryStatisticsModel.category_short_eu.in_(categories))
+    return query.all()
+
+
+def query_ec_category_statistics(fuel_type: str, categories: [str] = None) -> list:
+    """
+    Queries the average statistics of many categories at once. The phenomenon unit is joined into every row, so no
+    relationship has to be loaded afterwards.
+
+    :param fuel_type: The fuel type of the statistics
+    :param categories: The category_short_eu codes. All categories are queried if None.
+    :return: Returns light weight rows with the columns the fuel models are built from
+    """
+    query = db.session.query(EnvirocarAverageCategoryStatisticsModel.category_short_eu,
+                             EnvirocarAverageCategoryStatisticsModel.fuel_type,
+                             EnvirocarAverageCategoryStatisticsModel.phenomenon_name,
+                             EnvirocarAverageCategoryStatisticsModel.min,
+                             EnvirocarAverageCategoryStatisticsModel.average,
+                             EnvirocarAverageCategoryStatisticsModel.max,
+                             EnvirocarAverageCategoryStatisticsModel.measurements,
+                             EnvirocarAverageCategoryStatisticsModel.numb_sensors,
+                             EnvirocarPhenomenonModel.unit).join(
+        EnvirocarPhenomenonModel,
+        EnvirocarPhenomenonModel.name == EnvirocarAverageCategoryStatisticsModel.phenomenon_name).filter(
+        EnvirocarPhenomenonModel.name.in_(['CO2', 'Consumption', 'Speed']),
+        EnvirocarAverageCategoryStatisticsModel.fuel_type == fuel_type)
+    if categories is not None:
+        query = query.filter(EnvirocarAverageCategoryStatisticsModel.category_short_eu.in_(categories))
+    return query.all()
 
 
 def query_category_for_category_short(category_short_eu: str) -> CarCategoryModel:
@@ -204,3 +307,30 @@ def query_category_for_category_short(category_short_eu: str) -> CarCategoryMode
     return query
 
 
+def query_car_categories() -> [CarCategoryModel]:
+    return db.session.query(CarCategoryModel).order_by(CarCategoryModel.category_short_eu).all()
+
+
+def query_all_cfd_models() -> [CarfuelDataCarModel]:
+    return db.session.query(CarfuelDataCarModel).order_by(CarfuelDataCarModel.hash_id).all()
+
+
+def query_catalogue_snapshots() -> [CatalogueSnapshotModel]:
+    return db.session.query(CatalogueSnapshotModel).all()
+
+
+def query_data_version(name: str) -> int or None:
+    """
+    Returns the version of an imported data set or None if it was never imported.
+    """
+    data_version: DataVersionModel = db.session.query(DataVersionModel).get(name)
+    return data_version.version if data_version is not None else None
+
+
+def query_data_versions(names: [str]) -> dict:
+    """
+    Returns the versions of many imported data sets at once. Data sets that were never imported are missing.
+    """
+    query: list = db.session.query(DataVersionModel.name, DataVersionModel.version).filter(
+        DataVersionModel.name.in_(names)).all()
+    return {data_version.name: data_version.version for data_version in query}
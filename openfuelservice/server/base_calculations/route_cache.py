@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy
+from shapely.geometry import LineString
+
+from openfuelservice.server import ofs_settings
+from openfuelservice.server.base_calculations.country_index import reset_country_index
+from openfuelservice.server.base_calculations.fuel_model_registry import data_version_check_interval
+from openfuelservice.server.base_calculations.data_provider import get_data_provider
+from openfuelservice.server.objects import Filters
+
+route_cache_size = ofs_settings['general']['advanced_settings'].get('route_cache_size', 1024)
+route_cache_precision = ofs_settings['general']['advanced_settings'].get('route_cache_precision', 6)
+# The imported data sets a route result depends on
+route_data_versions = ['countries', 'prices', 'statistics', 'cars']
+
+
+def normalize_value(value):
+    """
+    Turns a filter value into a hashable value that doesn't depend on the json type the client used.
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), normalize_value(value[key])) for key in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_value(element) for element in value)
+    return str(value).strip()
+
+
+def filters_key(filters: Filters, data_source: str) -> tuple:
+    """
+    Returns the filter fields that change a route result. The request_id is left out, it is set on every result.
+    """
+    return (normalize_value(data_source), normalize_value(filters.fuel_type), normalize_value(filters.vehicle_type),
+            normalize_value(filters.driving_style), normalize_value(filters.driving_speed),
+            normalize_value(filters.year), normalize_value(filters.fuel_consumptions),
+            normalize_value(filters.tank_sizes), normalize_value(filters.vehicle_categories),
+            normalize_value(filters.cfd_ids), filters.fleet)
+
+
+def geometry_key(geom: LineString, precision: int = route_cache_precision) -> bytes:
+    """
+    Returns a digest of the route coordinates rounded to the precision, so resubmitted routes with tiny coordinate
+    noise share their cache entry.
+    """
+    coordinates = numpy.round(numpy.asarray(geom.coords, dtype=float)[:, :2], precision) + 0.0
+    return hashlib.blake2b(coordinates.tobytes(), digest_size=16).digest()
+
+
+class RouteCache(object):
+    def __init__(self, max_size: int = route_cache_size, check_interval: float = data_version_check_interval):
+        """
+        LRU cache of route results. The key holds the quantized geometry, the normalized filters and the versions of
+        the imported data, so a new import never returns outdated results.
+
+        :param max_size: Maximum number of cached routes. 0 disables the cache.
+        :param check_interval: Seconds between two checks of the data versions
+        """
+        self.max_size: int = max_size
+        self.check_interval: float = check_interval
+        self.hits: int = 0
+        self.misses: int = 0
+        self.data_versions: tuple = None
+        self.checked_at: float = None
+        self._routes: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get_data_versions(self) -> tuple:
+        """
+        Returns the versions of the imported data and refreshes them at most once per check interval.
+        """
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= self.check_interval:
+            data_versions = get_data_provider().data_versions(names=route_data_versions)
+            data_versions = tuple(data_versions.get(name) for name in route_data_versions)
+            if self.data_versions is not None and data_versions != self.data_versions:
+                # Routes cached under the new versions must not be priced with the previous country index
+                reset_country_index()
+            self.data_versions = data_versions
+            self.checked_at = now
+        return self.data_versions
+
+    def key(self, geom: LineString, filters: Filters, data_source: str) -> tuple:
+        return geometry_key(geom=geom), filters_key(filters=filters, data_source=data_source), self.get_data_versions()
+
+    def get(self, key: tuple) -> dict or None:
+        """
+        Returns the cached route result or None. Hits move the route to the end of the eviction order.
+        """
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                self.misses += 1
+                return None
+            self._routes.move_to_end(key)
+            self.hits += 1
+            return route
+
+    def put(self, key: tuple, route: dict):
+        with self._lock:
+            self._routes[key] = route
+            self._routes.move_to_end(key)
+            while len(self._routes) > self.max_size:
+                self._routes.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self.checked_at = None
+
+    def statistics(self) -> dict:
+        return dict(size=len(self._routes), max_size=self.max_size, hits=self.hits, misses=self.misses)
+
+
+route_cache = RouteCache()
@@ -0,0 +1,105 @@
+from datetime import date
+
+import numpy
+from numpy import ndarray
+
+from openfuelservice.server.base_calculations.objects import CountryLinePrice, GeneralLinePrice
+
+
+def as_float(value) -> float or int:
+    """
+    Unwraps scalar numpy results of the fuel models into plain floats. Integer factors are kept as they are.
+    """
+    if type(value) == ndarray:
+        return float(value.reshape(-1)[0])
+    elif type(value) == int:
+        return value
+    return float(value)
+
+
+def sequential_sum(matrix: ndarray) -> ndarray:
+    """
+    Sums a (rows, segments) matrix segment after segment. This keeps the order of the additions of the former
+    per segment loops, so the totals stay identical to the scalar implementation.
+    """
+    if matrix.shape[1] == 0:
+        return numpy.zeros(matrix.shape[0])
+    return numpy.add.accumulate(matrix, axis=1)[:, -1]
+
+
+class RouteCostMatrix(object):
+    def __init__(self, price_models: [CountryLinePrice or GeneralLinePrice]):
+        """
+        Columnar view of the price models of a single route. The segment lengths and prices are computed once and then
+        shared by every fuel model, category or vehicle that is calculated for the route.
+
+        :param price_models: The ordered price models of the route
+        """
+        self.price_models = price_models
+        self.segment_count: int = len(price_models)
+        self.length_m: ndarray = numpy.array(
+            [price_model.get_length_m() for price_model in price_models], dtype=float)
+        self.total_km: float = 0
+        for length_m in self.length_m:
+            self.total_km += float(length_m) / 1000
+        self.cost_date: date = price_models[-1].get_cost_date() if self.segment_count > 0 else None
+        self._fuel_prices = dict()
+
+    def get_fuel_prices(self, fuel_type: str) -> (ndarray, ndarray):
+        """
+        Returns the prices per liter of every segment with and without taxes.
+        """
+        if fuel_type not in self._fuel_prices:
+            prices = [price_model.get_fuel_prices(fuel_type=fuel_type) for price_model in self.price_models]
+            self._fuel_prices[fuel_type] = (numpy.array([price[0] for price in prices], dtype=float),
+                                            numpy.array([price[1] for price in prices], dtype=float))
+        return self._fuel_prices[fuel_type]
+
+    def calculate_costs(self, liters: ndarray, fuel_types: [str], tank_sizes: [int],
+                        refuel_rounding: str = 'ceil') -> (ndarray, ndarray, ndarray):
+        """
+        Calculates the fuel costs for many rows (categories or vehicles) at once. Fuel that remains in the tank after
+        refueling in one segment is charged with the price of that segment, as the former per category loops did.
+
+        :param liters: Matrix of the consumed liters with the shape (rows, segments)
+        :param fuel_types: The fuel type of every row
+        :param tank_sizes: The tank size of every row in liters
+        :param refuel_rounding: 'ceil' counts whole tank fillings (Envirocar), 'round' partial ones (CarFuelData)
+        :return: Returns the costs with taxes, the costs without taxes and the consumed liters per row
+        """
+        rows = liters.shape[0]
+        tank_sizes = numpy.array(tank_sizes, dtype=float)
+        price_tax = numpy.zeros((rows, self.segment_count))
+        price_wo_tax = numpy.zeros((rows, self.segment_count))
+        for fuel_type in set(fuel_types):
+            fuel_rows = numpy.array([row_fuel_type == fuel_type for row_fuel_type in fuel_types], dtype=bool)
+            segment_price_tax, segment_price_wo_tax = self.get_fuel_prices(fuel_type=fuel_type)
+            price_tax[fuel_rows] = segment_price_tax
+            price_wo_tax[fuel_rows] = segment_price_wo_tax
+
+        row_index = numpy.arange(rows)
+        cost_tax = numpy.zeros(rows)
+        cost_wo_tax = numpy.zeros(rows)
+        total_liters = numpy.zeros(rows)
+        remaining_fuel = numpy.zeros(rows)
+        previous_segment = numpy.zeros(rows, dtype=int)
+        for segment in range(self.segment_count):
+            segment_liters = liters[:, segment]
+            refuel = remaining_fuel > 0
+            cost_tax += numpy.where(refuel, price_tax[row_index, previous_segment] * remaining_fuel, 0)
+            cost_wo_tax += numpy.where(refuel, price_wo_tax[row_index, previous_segment] * remaining_fuel, 0)
+            previous_segment = numpy.where(refuel, segment, previous_segment)
+
+            total_liters += segment_liters
+            charged_liters = numpy.where(refuel, segment_liters - remaining_fuel, segment_liters)
+            if refuel_rounding == 'ceil':
+                refuelings = numpy.ceil(charged_liters / tank_sizes)
+                remaining_fuel = tank_sizes * refuelings - charged_liters
+            else:
+                refuelings = numpy.round(charged_liters / tank_sizes, 5)
+                remaining_fuel = tank_sizes * refuelings - segment_liters
+            remaining_fuel = numpy.where(remaining_fuel > 0, remaining_fuel, 0)
+
+            cost_tax += price_tax[:, segment] * charged_liters
+            cost_wo_tax += price_wo_tax[:, segment] * charged_liters
+        return cost_tax, cost_wo_tax, total_liters
@@ -3,6 +3,27 @@
 from openfuelservice.server import ofs_settings
 
 pg_settings = ofs_settings['provider_parameters']
+benchmark_settings = ofs_settings.get('benchmark', dict())
+
+
+def engine_options(settings: dict) -> dict:
+    """
+    Pool and connection options of the SQLAlchemy engine of every worker. The statement timeout is set per
+    connection, so PostgreSQL cancels a slow statement instead of letting it hold a pooled connection.
+
+    :param settings: The provider_parameters
+    """
+    options = {
+        'pool_size': settings.get('pool_size', 10),
+        'max_overflow': settings.get('max_overflow', 20),
+        'pool_timeout': settings.get('pool_timeout', 30),
+        'pool_recycle': settings.get('pool_recycle', 1800),
+        'pool_pre_ping': settings.get('pool_pre_ping', True)
+    }
+    statement_timeout = settings.get('statement_timeout', 0)
+    if statement_timeout:
+        options['connect_args'] = {'options': '-c statement_timeout={:d}'.format(int(statement_timeout))}
+    return options
 
 
 class BaseConfig(object):
@@ -12,6 +33,9 @@ class BaseConfig(object):
     WTF_CSRF_ENABLED = True
     DEBUG_TB_ENABLED = False
     DEBUG_TB_INTERCEPT_REDIRECTS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pg_settings)
+    # psycopg2 waits with the gevent hub in gevent workers instead of blocking all requests of the worker
+    GEVENT_WAIT_CALLBACK = pg_settings.get('gevent_wait_callback', True)
 
 
 class ProductionConfig(BaseConfig):
@@ -44,3 +68,14 @@ class TestingConfig(BaseConfig):
                                                                    pg_settings['db_name'])
     DEBUG_TB_ENABLED = False
     PRESERVE_CONTEXT_ON_EXCEPTION = False
+
+
+class BenchmarkConfig(BaseConfig):
+    """Benchmark configuration. Uses its own database, because the fixture import recreates all tables."""
+
+    SQLALCHEMY_DATABASE_URI = 'postgresql://{}:{}@{}:{}/{}'.format(pg_settings['admin_user'], pg_settings['admin_password'],
+                                                                   benchmark_settings.get('host', pg_settings['host']),
+                                                                   benchmark_settings.get('port', 5435),
+                                                                   benchmark_settings.get('db_name', 'gis_benchmark'))
+    DEBUG_TB_ENABLED = False
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -6,7 +6,8 @@ from tqdm import tqdm
 
 from openfuelservice.server import db
 from openfuelservice.server.db_import.agency_data.carfueldata.objects import CarFuelDataCarObject
-from openfuelservice.server.db_import.models import CarfuelDataCarModel
+from openfuelservice.server.db_import.models import CarfuelDataCarModel, CarfuelDataCarCatalogueModel
+from openfuelservice.server.utils.database.queries import Wikipedia, categories_of_hashes, build_cfd_car_ids
 from openfuelservice.server.utils.misc.mappings import DataMappings
 
 
@@ -117,13 +118,63 @@ class CarFuelDataImporter:
             year=cfd_car_object.year
         ))
         if len(self.cfd_model_objects) >= 400:
+            self.store_categories(self.cfd_model_objects)
             fallback_importer(self.cfd_model_objects)
             self.cfd_model_objects = []
 
+    @staticmethod
+    def store_categories(cfd_model_objects: [CarfuelDataCarModel]):
+        """
+        Resolves the categories of the matched wikipedia cars with one query and stores them with the cfd cars,
+        so individual car requests don't have to look them up.
+        """
+        wiki_hashes = [wiki_hash for cfd_model in cfd_model_objects for wiki_hash in (cfd_model.wiki_hashes or [])]
+        hash_categories = Wikipedia().get_categories_by_hash_ids(wiki_hashes=wiki_hashes)
+        for cfd_model in cfd_model_objects:
+            cfd_model.categories = categories_of_hashes(wiki_hashes=cfd_model.wiki_hashes,
+                                                        hash_categories=hash_categories)
+
+    def update_categories(self):
+        """
+        Recomputes the stored categories of all matched cfd cars, e.g. after the wikipedia cars were imported again
+        and their categories changed.
+        """
+        cfd_cars: [CarfuelDataCarModel] = db.session.query(CarfuelDataCarModel).filter(
+            CarfuelDataCarModel.wiki_hashes != None).all()
+        try:
+            for index in range(0, len(cfd_cars), 400):
+                self.store_categories(cfd_cars[index:index + 400])
+            db.session.commit()
+        except Exception as err:
+            print(err)
+            db.session.rollback()
+
     def import_cfd(self, cfd_data: []):
         for cfd_car_object in tqdm(cfd_data, total=len(cfd_data), unit=' Importing CarFuelData'):
             if type(cfd_car_object) == CarFuelDataCarObject:
                 self.store_cfd(cfd_car_object)
             elif type(cfd_car_object) == CarfuelDataCarModel:
                 self.cfd_model_objects.append(cfd_car_object)
+        self.store_categories(self.cfd_model_objects)
         fallback_importer(self.cfd_model_objects)
+        self.import_car_catalogue()
+
+    @staticmethod
+    def import_car_catalogue():
+        """
+        Replaces the car catalogue with the cleaned car ids of the matched cars of every manufacturer.
+        """
+        brand_cars = dict()
+        cfd_car: CarfuelDataCarModel
+        for cfd_car in db.session.query(CarfuelDataCarModel).filter(CarfuelDataCarModel.wiki_hashes != None).all():
+            brand_cars.setdefault(cfd_car.manufacturer, []).append(cfd_car)
+        updated = datetime.now()
+        catalogue_objects = [CarfuelDataCarCatalogueModel(manufacturer=brand, cars=build_cfd_car_ids(brand_cars[brand]),
+                                                          updated=updated) for brand in brand_cars]
+        try:
+            db.session.query(CarfuelDataCarCatalogueModel).delete()
+            db.session.bulk_save_objects(catalogue_objects)
+            db.session.commit()
+        except Exception as err:
+            print(err)
+            db.session.rollback()
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from tqdm import tqdm
+
+from openfuelservice.server import db
+from openfuelservice.server.db_import.models import CatalogueSnapshotModel
+from openfuelservice.server.utils.database.catalogue import CatalogueSnapshot
+
+
+class CatalogueImporter:
+    def __init__(self):
+        self.snapshot_objects = []
+
+    def create_snapshot(self, name: str, content: dict, updated: datetime):
+        snapshot = CatalogueSnapshot.create(content)
+        self.snapshot_objects.append(CatalogueSnapshotModel(
+            name=name,
+            etag=snapshot.etag,
+            payload=snapshot.payload,
+            payload_gzip=snapshot.payload_gzip,
+            updated=updated
+        ))
+
+    def import_catalogue(self, catalogue: dict):
+        """
+        Replaces all catalogue snapshots, so snapshots of removed brands don't survive the import.
+
+        :param catalogue: Dict of the snapshot names and their response content
+        """
+        updated = datetime.now()
+        for name in tqdm(catalogue, total=len(catalogue), unit=' Serializing Catalogue Snapshots'):
+            self.create_snapshot(name=name, content=catalogue[name], updated=updated)
+        try:
+            db.session.query(CatalogueSnapshotModel).delete()
+            db.session.bulk_save_objects(self.snapshot_objects)
+            db.session.commit()
+        except Exception as err:
+            print(err)
+            db.session.rollback()
+        self.snapshot_objects.clear()
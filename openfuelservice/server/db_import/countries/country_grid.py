@@ -0,0 +1,143 @@
+import logging
+from pathlib import Path
+
+import numpy
+from geoalchemy2.shape import to_shape
+from numpy import ndarray
+from shapely.geometry import box
+from shapely.geometry.base import BaseGeometry
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+from openfuelservice.server import db, file_folder, ofs_settings
+from openfuelservice.server.db_import.models import CountryDataModel
+
+logger = logging.getLogger(__name__)
+
+country_grid_file: Path = file_folder.joinpath(
+    ofs_settings['general']['advanced_settings'].get('country_grid_file', 'country_grid.npz'))
+country_grid_cell_size: float = ofs_settings['general']['advanced_settings'].get('country_grid_cell_size', 0.1)
+
+NO_COUNTRY = -1
+BORDER_CELL = -2
+
+
+class CountryGrid(object):
+    def __init__(self, cells: ndarray, country_codes: [str], origin: (float, float), cell_size: float):
+        """
+        Raster of the world in which every cell holds the index of the country covering it completely,
+        NO_COUNTRY if it lies outside of all countries or BORDER_CELL if a border crosses it.
+
+        :param cells: Cell values with the shape (rows, columns). Row 0 starts at the origin latitude.
+        :param country_codes: The country_alpha_2 codes the cell values point to
+        :param origin: Longitude and latitude of the lower left corner of the grid
+        :param cell_size: Edge length of a cell in degrees
+        """
+        self.cells: ndarray = cells
+        self.country_codes: [str] = list(country_codes)
+        self.origin: (float, float) = origin
+        self.cell_size: float = cell_size
+
+    def locate(self, longitudes: ndarray, latitudes: ndarray) -> (ndarray, ndarray, ndarray):
+        """
+        Looks up many coordinates at once.
+
+        :return: Returns the row, the column and the cell value of every coordinate. Coordinates outside of the grid
+        get the value NO_COUNTRY.
+        """
+        columns = numpy.floor((numpy.asarray(longitudes, dtype=float) - self.origin[0]) / self.cell_size).astype(int)
+        rows = numpy.floor((numpy.asarray(latitudes, dtype=float) - self.origin[1]) / self.cell_size).astype(int)
+        inside = (rows >= 0) & (rows < self.cells.shape[0]) & (columns >= 0) & (columns < self.cells.shape[1])
+        values = numpy.full(rows.shape, NO_COUNTRY, dtype=self.cells.dtype)
+        values[inside] = self.cells[rows[inside], columns[inside]]
+        return rows, columns, values
+
+    def save(self, path: Path = country_grid_file):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.as_posix(), 'wb') as grid_file:
+            numpy.savez_compressed(grid_file, cells=self.cells, country_codes=numpy.array(self.country_codes),
+                                   origin=numpy.array(self.origin), cell_size=numpy.array(self.cell_size))
+
+    @staticmethod
+    def load(path: Path = country_grid_file):
+        """
+        Returns the stored grid or None if it was not built yet.
+        """
+        if not path.exists():
+            return None
+        with numpy.load(path.as_posix()) as grid_file:
+            return CountryGrid(cells=grid_file['cells'],
+                               country_codes=[str(code) for code in grid_file['country_codes']],
+                               origin=tuple(float(value) for value in grid_file['origin']),
+                               cell_size=float(grid_file['cell_size']))
+
+    @staticmethod
+    def build(country_geometries: dict, cell_size: float = country_grid_cell_size, origin: (float, float) = (-180, -90),
+              extent: (float, float) = (360, 180), block_cells: int = 64):
+        """
+        Builds the grid by recursive subdivision. Blocks that lie completely inside one country or outside of all
+        countries are filled at once, only blocks crossed by a border are split further down to single cells.
+
+        :param country_geometries: Dict of country_alpha_2 codes and their shapely geometries
+        :param cell_size: Edge length of a cell in degrees
+        :param origin: Longitude and latitude of the lower left corner of the grid
+        :param extent: Width and height of the grid in degrees
+        :param block_cells: Edge length in cells of the blocks the subdivision starts with
+        """
+        country_codes = list(country_geometries.keys())
+        geometries: [BaseGeometry] = [country_geometries[code] for code in country_codes]
+        prepared_geometries = [prep(geometry) for geometry in geometries]
+        geometry_ids = {id(geometry): index for index, geometry in enumerate(geometries)}
+        tree = STRtree(geometries) if len(geometries) > 0 else None
+        columns = int(numpy.ceil(extent[0] / cell_size))
+        rows = int(numpy.ceil(extent[1] / cell_size))
+        cells = numpy.full((rows, columns), NO_COUNTRY, dtype=numpy.int16)
+
+        def candidates(block: BaseGeometry) -> [int]:
+            if tree is None:
+                return []
+            # shapely < 2 returns the indexed geometries, shapely 2 their positions
+            return sorted(geometry_ids[id(result)] if isinstance(result, BaseGeometry) else int(result) for result in
+                          tree.query(block))
+
+        def fill(row: int, column: int, size: int, block_candidates: [int]):
+            row_end, column_end = min(row + size, rows), min(column + size, columns)
+            block = box(origin[0] + column * cell_size, origin[1] + row * cell_size,
+                        origin[0] + column_end * cell_size, origin[1] + row_end * cell_size)
+            touching = [index for index in block_candidates if prepared_geometries[index].intersects(block)]
+            if len(touching) == 0:
+                return
+            if len(touching) == 1 and prepared_geometries[touching[0]].contains(block):
+                cells[row:row_end, column:column_end] = touching[0]
+                return
+            if size == 1:
+                cells[row, column] = BORDER_CELL
+                return
+            half = size // 2
+            for sub_row in (row, row + half):
+                for sub_column in (column, column + half):
+                    if sub_row < rows and sub_column < columns:
+                        fill(sub_row, sub_column, half, touching)
+
+        for block_row in range(0, rows, block_cells):
+            for block_column in range(0, columns, block_cells):
+                block = box(origin[0] + block_column * cell_size, origin[1] + block_row * cell_size,
+                            origin[0] + min(block_column + block_cells, columns) * cell_size,
+                            origin[1] + min(block_row + block_cells, rows) * cell_size)
+                fill(block_row, block_column, block_cells, candidates(block))
+        return CountryGrid(cells=cells, country_codes=country_codes, origin=origin, cell_size=cell_size)
+
+
+def build_country_grid(path: Path = country_grid_file) -> CountryGrid:
+    """
+    Builds the country grid from the imported country borders and stores it in the file folder.
+    """
+    country_geometries = dict()
+    for country in db.session.query(CountryDataModel.country_alpha_2, CountryDataModel.geom).all():
+        if country.country_alpha_2 is not None and country.geom is not None:
+            country_geometries[country.country_alpha_2] = to_shape(country.geom)
+    grid = CountryGrid.build(country_geometries=country_geometries)
+    grid.save(path=path)
+    logger.info("Country grid with {} border cells stored in {}".format(
+        int(numpy.count_nonzero(grid.cells == BORDER_CELL)), path))
+    return grid
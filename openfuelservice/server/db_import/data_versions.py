@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from openfuelservice.server import db
+from openfuelservice.server.db_import.models import DataVersionModel
+
+
+def bump_data_version(name: str):
+    """
+    Increments the version of an imported data set. Workers compare it with the version of their cached data.
+
+    :param name: Name of the data set, e.g. 'statistics'
+    """
+    try:
+        data_version = db.session.query(DataVersionModel).get(name)
+        if data_version is None:
+            db.session.add(DataVersionModel(name=name, version=1, updated=datetime.now()))
+        else:
+            data_version.version += 1
+            data_version.updated = datetime.now()
+        db.session.commit()
+    except Exception as err:
+        print(err)
+        db.session.rollback()
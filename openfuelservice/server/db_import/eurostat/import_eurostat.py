@@ -1,11 +1,16 @@
 import hashlib
 
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 from tqdm import tqdm
 
 from openfuelservice.server import db
 from openfuelservice.server.db_import.eurostat.objects import CountryPrice, GeneralPrice
-from openfuelservice.server.db_import.models import EurostatGeneralPriceModel, EurostatCountryPriceModel
+from openfuelservice.server.db_import.models import EurostatGeneralPriceModel, EurostatCountryPriceModel, \
+    EurostatLatestCountryPriceModel, EurostatLatestGeneralPriceModel
+
+price_columns = 'date, euro_price, euro_ht, euro_ttc, euro_unit, euro_quantity, diesel_ht, diesel_ttc, diesel_unit, ' \
+                'diesel_quantity'
 
 
 def fallback_importer(object_collection: []):
@@ -176,7 +181,7 @@ class EurostatImporter:
                     self.create_country_price(country, date, country_prices[country][date])
                 fallback_importer(self.country_price_objects)
                 self.country_price_objects.clear()
-        pass
+        self.refresh_latest_country_prices()
 
     def import_general(self, general_prices):
         if db.session.query(EurostatGeneralPriceModel).first() is not None:
@@ -196,4 +201,38 @@ class EurostatImporter:
                 self.create_general_price(date, general_prices[date])
             fallback_importer(self.general_price_objects)
             self.general_price_objects.clear()
-
+        self.refresh_latest_general_price()
+
+    @staticmethod
+    def refresh_latest_country_prices():
+        """
+        Replaces the content of the latest country price table with the newest price of every country.
+        """
+        try:
+            db.session.execute(text("DELETE FROM {}".format(EurostatLatestCountryPriceModel.__tablename__)))
+            db.session.execute(text(
+                "INSERT INTO {latest} (country_alpha_2, taux, {columns}) "
+                "SELECT DISTINCT ON (country_alpha_2) country_alpha_2, taux, {columns} FROM {history} "
+                "ORDER BY country_alpha_2, date DESC".format(latest=EurostatLatestCountryPriceModel.__tablename__,
+                                                             history=EurostatCountryPriceModel.__tablename__,
+                                                             columns=price_columns)))
+            db.session.commit()
+        except Exception as err:
+            print(err)
+            db.session.rollback()
+
+    @staticmethod
+    def refresh_latest_general_price():
+        """
+        Replaces the content of the latest general price table with the newest general price.
+        """
+        try:
+            db.session.execute(text("DELETE FROM {}".format(EurostatLatestGeneralPriceModel.__tablename__)))
+            db.session.execute(text(
+                "INSERT INTO {latest} ({columns}) SELECT {columns} FROM {history} ORDER BY date DESC LIMIT 1".format(
+                    latest=EurostatLatestGeneralPriceModel.__tablename__,
+                    history=EurostatGeneralPriceModel.__tablename__, columns=price_columns)))
+            db.session.commit()
+        except Exception as err:
+            print(err)
+            db.session.rollback()
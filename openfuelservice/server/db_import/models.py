@@ -1,10 +1,11 @@
 import logging
 
 from geoalchemy2 import Geometry
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 
 from openfuelservice.server import db, misc_tables, cfd_tables, ec_tables, es_tables, wiki_car_table, \
-    wiki_category_table, countries_table, hash_table
+    wiki_category_table, countries_table, hash_table, data_version_table, \
+    catalogue_snapshot_table
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +32,9 @@ class WikiCarPageTextModel(db.Model):
 class CarfuelDataCarModel(db.Model):
     __tablename__ = cfd_tables['carfueldata_cars']
     logger.info('table name for carfueldata car models: {}'.format(__tablename__))
+    __table_args__ = (
+        db.Index('ix_{}_wiki_hashes'.format(__tablename__), 'wiki_hashes', postgresql_using='gin'),
+    )
     hash_id = db.Column(db.CHAR(length=32), primary_key=True, unique=True)
     logger.info('table name for sensors: {}'.format(__tablename__))
     manufacturer = db.Column(db.String, nullable=False, index=True)
@@ -65,6 +69,8 @@ class CarfuelDataCarModel(db.Model):
     rde_nox_combined = db.Column(db.Float, nullable=True)
     date_of_change = db.Column(db.Date, nullable=False)
     wiki_hashes = db.Column(ARRAY(db.CHAR(length=32)), nullable=True)
+    # The category_short_eu codes of the matched wikipedia cars. Stored when the car is imported.
+    categories = db.Column(ARRAY(db.String), nullable=True)
     year = db.Column(db.Integer, nullable=True)
 
     def __repr__(self):
@@ -74,6 +80,23 @@ class CarfuelDataCarModel(db.Model):
         return hash(self.sensor_id)
 
 
+class CarfuelDataCarCatalogueModel(db.Model):
+    """
+    Holds the cleaned model names, years, descriptions and hash ids of the matched cars of a manufacturer.
+    Built at the cfd import, so the car ids request doesn't clean the model names on every call.
+    """
+    __tablename__ = cfd_tables['carfueldata_car_catalogue']
+    manufacturer = db.Column(db.String, nullable=False, primary_key=True, unique=True)
+    cars = db.Column(JSONB, nullable=False)
+    updated = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return '<cfd car catalogue of {}>'.format(self.manufacturer)
+
+    def __hash__(self):
+        return hash(self.manufacturer)
+
+
 class WikiCarModel(db.Model):
     __tablename__ = wiki_car_table
     logger.info('table name for sensors: {}'.format(__tablename__))
@@ -429,6 +452,56 @@ class EurostatGeneralPriceModel(db.Model):
         return hash(self.date)
 
 
+class EurostatLatestCountryPriceModel(db.Model):
+    """
+    Holds only the latest price of every country. It is refreshed from the price history by the EurostatImporter.
+    """
+    __tablename__ = es_tables['latest_country_prices']
+    country_alpha_2 = db.Column(db.String,
+                                db.ForeignKey('{}.country_alpha_2'.format(countries_table)),
+                                primary_key=True, unique=True, index=True)
+    date = db.Column(db.DateTime, nullable=False, index=True)
+    taux = db.Column(db.Float)
+    euro_price = db.Column(db.Integer, nullable=True)
+    euro_ht = db.Column(db.Numeric, nullable=True)
+    euro_ttc = db.Column(db.Numeric, nullable=True)
+    euro_unit = db.Column(db.String, nullable=False)
+    euro_quantity = db.Column(db.Integer, nullable=False)
+    diesel_ht = db.Column(db.Numeric, nullable=True)
+    diesel_ttc = db.Column(db.Numeric, nullable=True)
+    diesel_unit = db.Column(db.String, nullable=False)
+    diesel_quantity = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return '<LatestCountryPrice {} date {}>'.format(self.country_alpha_2, self.date)
+
+    def __hash__(self):
+        return hash(self.country_alpha_2)
+
+
+class EurostatLatestGeneralPriceModel(db.Model):
+    """
+    Holds only the latest general price. It is refreshed from the price history by the EurostatImporter.
+    """
+    __tablename__ = es_tables['latest_general_prices']
+    date = db.Column(db.DateTime, nullable=False, primary_key=True, unique=True)
+    euro_price = db.Column(db.Integer, nullable=True)
+    euro_ht = db.Column(db.Numeric, nullable=True)
+    euro_ttc = db.Column(db.Numeric, nullable=True)
+    euro_unit = db.Column(db.String, nullable=False)
+    euro_quantity = db.Column(db.Integer, nullable=False)
+    diesel_ht = db.Column(db.Numeric, nullable=True)
+    diesel_ttc = db.Column(db.Numeric, nullable=True)
+    diesel_unit = db.Column(db.String, nullable=False)
+    diesel_quantity = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return '<latest general price date {}>'.format(self.date)
+
+    def __hash__(self):
+        return hash(self.date)
+
+
 class HashModel(db.Model):
     __tablename__ = hash_table
     uuid = db.Column(db.Binary(length=16), nullable=False, primary_key=True, unique=True)
@@ -441,3 +514,37 @@ class HashModel(db.Model):
 
     def __hash__(self):
         return hash(self.object_name)
+
+
+class DataVersionModel(db.Model):
+    """
+    Counts the imports of a data set, so running workers can notice that their cached data is outdated.
+    """
+    __tablename__ = data_version_table
+    name = db.Column(db.String, nullable=False, primary_key=True, unique=True)
+    version = db.Column(db.Integer, nullable=False)
+    updated = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return '<Data version {} of {}>'.format(self.version, self.name)
+
+    def __hash__(self):
+        return hash(self.name)
+
+
+class CatalogueSnapshotModel(db.Model):
+    """
+    Holds the serialized response of a catalogue request, e.g. the brands, so it is built once per import.
+    """
+    __tablename__ = catalogue_snapshot_table
+    name = db.Column(db.String, nullable=False, primary_key=True, unique=True)
+    etag = db.Column(db.String, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    payload_gzip = db.Column(db.LargeBinary, nullable=False)
+    updated = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return '<Catalogue snapshot {}>'.format(self.name)
+
+    def __hash__(self):
+        return hash(self.name)
@@ -1,5 +1,11 @@
+import logging
+
+from openfuelservice.server.base_calculations.data_provider import data_backend, write_reference_snapshot
 from openfuelservice.server.db_import.agency_data.carfueldata.import_carfueldata import CarFuelDataImporter
+from openfuelservice.server.db_import.catalogue.import_catalogue import CatalogueImporter
+from openfuelservice.server.db_import.countries.country_grid import build_country_grid
 from openfuelservice.server.db_import.countries.import_countries import CountryImporter
+from openfuelservice.server.db_import.data_versions import bump_data_version
 from openfuelservice.server.db_import.envirocar.import_envirocar import EnvirocarImporter
 from openfuelservice.server.db_import.eurostat.import_eurostat import EurostatImporter
 from openfuelservice.server.db_import.misc.import_misc import MatchedImporter, MiscImporter
@@ -8,9 +14,26 @@ from openfuelservice.server.drivers.carfueldata_driver import LatestCars
 from openfuelservice.server.drivers.envirocar_driver import ECData
 from openfuelservice.server.drivers.misc_driver import EnvirocarWikiMatcher, CarFuelDataWikiMatcher
 
+logger = logging.getLogger(__name__)
+
 
 # TODO remove misc importer!
 
+def update_reference_snapshot():
+    """
+    Rewrites the reference snapshot the workers map if they serve from it. The import commands call it once all of
+    their data is stored. The parse functions never do, so e.g. the benchmark fixtures can't replace the snapshot.
+    """
+    if data_backend != 'snapshot':
+        return
+    print("\nWriting reference snapshot")
+    try:
+        write_reference_snapshot()
+    except Exception:
+        logger.exception('The reference snapshot could not be written, the workers keep the previous one')
+        raise
+
+
 def parse_cfd(cfd_data: LatestCars or CarFuelDataWikiMatcher):
     print("\nImporting CarFuelData")
     if type(cfd_data) == LatestCars:
@@ -21,6 +44,7 @@ def parse_cfd(cfd_data: LatestCars or CarFuelDataWikiMatcher):
         cfd_data: CarFuelDataWikiMatcher
         if len(cfd_data.matched_cars) > 0:
             CarFuelDataImporter().import_cfd(cfd_data=cfd_data.matched_cars)
+    bump_data_version(name='cars')
 
 
 def parse_eurostat(eurostat_data):
@@ -30,6 +54,7 @@ def parse_eurostat(eurostat_data):
             EurostatImporter().import_countries(eurostat_data[element])
         if element == 'general_prices':
             EurostatImporter().import_general(eurostat_data[element])
+    bump_data_version(name='prices')
 
 
 def parse_envirocar(envirocar_data: ECData or EnvirocarWikiMatcher):
@@ -98,7 +123,16 @@ def parse_envirocar_advanced(envirocar_data: ECData):
 def parse_countries(countries_data):
     print("\nImporting Country data")
     CountryImporter().import_countries(countries_data)
-    pass
+    print("\nBuilding Country grid")
+    build_country_grid()
+    bump_data_version(name='countries')
+
+
+def parse_catalogue(catalogue: dict):
+    print("\nImporting Catalogue snapshots")
+    CatalogueImporter().import_catalogue(catalogue=catalogue)
+    # Lets the workers drop their catalogue snapshots
+    bump_data_version(name='catalogue')
 
 
 def parse_wikipedia(wikicar_categories=None, wikicar_objects=None, wikicar_texts: dict = None):
@@ -108,6 +142,10 @@ def parse_wikipedia(wikicar_categories=None, wikicar_objects=None, wikicar_texts
     if wikicar_objects:
         print("\nImporting Wikipedia car data")
         WikipediaImporter().import_car_objects(car_objects=wikicar_objects)
+        # The cfd cars store the categories of their wikipedia cars
+        print("\nUpdating CarFuelData categories")
+        CarFuelDataImporter().update_categories()
+        bump_data_version(name='cars')
     if wikicar_texts:
         print("\nImporting Wikipedia car data")
         WikipediaImporter().import_wiki_page_texts(page_texts=wikicar_texts)
@@ -122,3 +160,6 @@ def parse_misc(matched_wikicar_envirocar=None, ec_av_category_stats=None, cfd_av
         MiscImporter().import_average_ec_category_stats(av_category_statistics=ec_av_category_stats)
     if cfd_av_category_stats:
         MiscImporter().import_average_cfd_category_stats(av_category_statistics=cfd_av_category_stats)
+    if ec_av_category_stats or cfd_av_category_stats:
+        # Lets the workers rebuild their fuel models
+        bump_data_version(name='statistics')
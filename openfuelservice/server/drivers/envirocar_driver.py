@@ -12,9 +12,8 @@ from openfuelservice.server.db_import.envirocar.objects import TrackMeasurementO
 from openfuelservice.server.statistics.envirocar_statistics import AverageStatistics
 from openfuelservice.server.utils.misc import file_management
 from openfuelservice.server.utils.misc.file_management import get_response
+from openfuelservice.server.utils.misc.manufacturer_resolver import manufacturer_resolver
 
-manufacturer_aliases = car_brands['aliases']
-manufacturers = car_brands['brands']
 enviro_settings = ofs_settings['statistics_provider']['envirocar_provider']
 crawl_test = enviro_settings['crawl_test']
 crawl_amount = enviro_settings['crawl_amount']
@@ -27,21 +26,6 @@ headers = {
 }
 
 
-def check_manufacturer(manufacturer_to_check: str) -> str:
-    cleaned_manufacturer_to_check = manufacturer_to_check.casefold().strip()
-    for manufacturer in manufacturer_aliases:
-        if cleaned_manufacturer_to_check == manufacturer.casefold().strip():
-            return manufacturer
-        elif cleaned_manufacturer_to_check in manufacturer_aliases[manufacturer]:
-            return manufacturer
-    for manufacturer in car_brands['brands']:
-        if manufacturer_to_check == manufacturer:
-            return manufacturer
-        if cleaned_manufacturer_to_check == manufacturer.casefold().strip():
-            return manufacturer
-    return ""
-
-
 class Merge:
     @staticmethod
     def sensors_and_statistics(sensors, sensor_statistics):
@@ -331,7 +315,7 @@ class Sensors(object):
                             break
                 # For models that have the model and brand at once
                 else:
-                    real_manufacturer = check_manufacturer(manufacturer)
+                    real_manufacturer = manufacturer_resolver.resolve(manufacturer, substring_aliases=False)
                     search_string = real_manufacturer + ' ' + model
                     if search_string in car_brands['vehicles']:
                         real_manufacturer = car_brands['vehicles'][search_string]['brand']
@@ -72,23 +72,6 @@ def check_similarity(string1: str, string2: str) -> bool:
         return False
 
 
-def check_manufacturer(manufacturer_to_check: str) -> str:
-    cleaned_manufacturer_to_check = manufacturer_to_check.casefold().strip()
-    for manufacturer in manufacturer_aliases:
-        if cleaned_manufacturer_to_check == manufacturer.casefold().strip():
-            return manufacturer
-        for alias in manufacturer_aliases[manufacturer]:
-            if cleaned_manufacturer_to_check == alias.casefold().strip():
-                return manufacturer
-    for manufacturer in car_brands['brands']:
-        if manufacturer_to_check == manufacturer.casefold().strip():
-            return manufacturer
-        if cleaned_manufacturer_to_check == manufacturer.casefold().strip():
-            return manufacturer
-    print("Couldn't find manufacturer {}".format(manufacturer_to_check))
-    return ""
-
-
 def check_fixed_matches(manufacturer: str, car_name: str, year: int) -> []:
     if manufacturer in fixed_matches:
         manufacturer_matches = fixed_matches[manufacturer]
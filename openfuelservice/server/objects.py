@@ -17,6 +17,7 @@ class Filters(object):
         self.tank_sizes: dict = None
         self.vehicle_categories: [] = ['all']
         self.cfd_ids = None
+        self.fleet: bool = False
         if 'year' in filters:
             self.year = filters['year']
         if 'driving_speed' in filters:
@@ -39,3 +40,5 @@ class Filters(object):
             self.tank_sizes = filters['tank_sizes']
         if 'cfd_ids' in filters:
             self.cfd_ids = filters['cfd_ids']
+        if 'fleet' in filters:
+            self.fleet = str(filters['fleet']).strip().lower() in ['true', '1']
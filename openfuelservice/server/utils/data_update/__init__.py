@@ -32,6 +32,7 @@ def eurostat_update():
             country_codes = countries_driver.CountryData().get()
             history2005 = ESData(history2005=True).get(country_codes=country_codes)
             parser.parse_eurostat(history2005)
+            parser.update_reference_snapshot()
 
 
 def envirocar_update():
@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from openfuelservice.server import ofs_settings
+from openfuelservice.server.base_calculations.data_provider import get_data_provider
+from openfuelservice.server.utils.database.queries import get_brands, get_cars, get_car_ids, CarFuelData, Wikipedia
+
+catalogue_check_interval = ofs_settings['general']['advanced_settings'].get('data_version_check_interval', 60)
+brand_sources = {
+    'all': dict(carfueldata=True, envirocar=True, wikicar=True),
+    'cfd': dict(carfueldata=True, envirocar=False, wikicar=False),
+    'ec': dict(carfueldata=False, envirocar=True, wikicar=False),
+    'wikicar': dict(carfueldata=False, envirocar=False, wikicar=True)
+}
+
+
+class CatalogueSnapshot(object):
+    def __init__(self, payload: bytes, payload_gzip: bytes, etag: str):
+        """
+        Ready to send response of a catalogue request.
+
+        :param payload: The utf-8 encoded json
+        :param payload_gzip: The gzip compressed payload
+        :param etag: Strong entity tag of the payload
+        """
+        self.payload: bytes = payload
+        self.payload_gzip: bytes = payload_gzip
+        self.etag: str = etag
+
+    @staticmethod
+    def create(content: dict):
+        """
+        Serializes the content the same way the api always answered, sorted and json encoded.
+        """
+        payload = json.dumps(content, sort_keys=True).encode('utf-8')
+        return CatalogueSnapshot(payload=payload, payload_gzip=gzip.compress(payload, mtime=0),
+                                 etag=hashlib.sha1(payload).hexdigest())
+
+
+def brands_name(source: str) -> str:
+    return 'brands/{}'.format(source)
+
+
+def cars_name(brand: str) -> str:
+    return 'cars/{}'.format(brand)
+
+
+def car_ids_name(brand: str, source: str) -> str:
+    return 'car_ids/{}/{}'.format(source, brand)
+
+
+def categories_name() -> str:
+    return 'categories'
+
+
+def build_catalogue() -> dict:
+    """
+    Builds the content of every catalogue request from the imported data.
+
+    :return: Returns a dict of the snapshot names and their response content
+    """
+    catalogue = dict()
+    for source in brand_sources:
+        catalogue[brands_name(source)] = {'brands': sorted(set(get_brands(**brand_sources[source])))}
+    for brand in catalogue[brands_name('all')]['brands']:
+        catalogue[cars_name(brand)] = {'cars': get_cars(brand=brand)}
+    for brand in CarFuelData().get_cfd_brands(lower=False):
+        catalogue[car_ids_name(brand=brand, source='cfd')] = get_car_ids(brand=brand, source='cfd')
+    catalogue[categories_name()] = {'categories': Wikipedia().get_categories(ordered=True)}
+    return catalogue
+
+
+class CatalogueSnapshots(object):
+    def __init__(self, data_version_name: str = 'catalogue', check_interval: float = catalogue_check_interval):
+        """
+        Keeps the catalogue snapshots of a worker in memory. They are dropped as soon as a new catalogue was imported.
+
+        :param data_version_name: Name of the data version bumped by the catalogue import
+        :param check_interval: Seconds between two version checks
+        """
+        self.data_version_name: str = data_version_name
+        self.check_interval: float = check_interval
+        self.data_version: int = None
+        self.checked_at: float = None
+        self.snapshots: dict = dict()
+        self._lock = threading.Lock()
+
+    def validate(self):
+        """
+        Loads all snapshots at once if the catalogue was imported again since the last check.
+        """
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self.checked_at is not None and now - self.checked_at < self.check_interval:
+                return
+            data_version = get_data_provider().data_version(name=self.data_version_name)
+            if data_version != self.data_version or data_version is None:
+                self.snapshots = {snapshot.name: CatalogueSnapshot(payload=bytes(snapshot.payload),
+                                                                   payload_gzip=bytes(snapshot.payload_gzip),
+                                                                   etag=snapshot.etag) for snapshot in
+                                  get_data_provider().catalogue_snapshots()}
+                self.data_version = data_version
+            self.checked_at = now
+
+    def get(self, name: str, build=None) -> CatalogueSnapshot or None:
+        """
+        Returns the imported snapshot. Requests without an imported snapshot are built live and not kept, unless
+        the data provider is offline.
+
+        :param name: Name of the snapshot, e.g. 'brands/all'
+        :param build: Function that returns the response content if no snapshot was imported
+        """
+        self.validate()
+        snapshot = self.snapshots.get(name)
+        if snapshot is None and build is not None and not get_data_provider().offline:
+            content = build()
+            return CatalogueSnapshot.create(content) if content is not None else None
+        return snapshot
+
+    def clear(self):
+        with self._lock:
+            self.snapshots = dict()
+            self.checked_at = None
+
+
+catalogue_snapshots = CatalogueSnapshots()
@@ -0,0 +1,53 @@
+import psycopg2
+from psycopg2 import extensions
+
+try:
+    from gevent import monkey
+    from gevent.socket import wait_read, wait_write
+except ImportError:
+    monkey = None
+
+
+def gevent_wait_callback(connection, timeout: float = None):
+    """
+    Lets psycopg2 wait for the database with the gevent hub instead of blocking the whole worker, so the other
+    greenlets keep answering requests while a statement runs. Works like the wait callback of psycogreen.
+    """
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError('Bad result from poll: {}'.format(state))
+
+
+def gevent_patched() -> bool:
+    """
+    :return: Returns True if the process runs in a gevent worker, i.e. gevent patched its sockets
+    """
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+def set_cooperative(cooperative: bool):
+    """
+    Switches the wait callback of psycopg2 for all connections of the process.
+    """
+    extensions.set_wait_callback(gevent_wait_callback if cooperative else None)
+
+
+def init_cooperative_database(enabled: bool) -> bool:
+    """
+    Makes the database access cooperative in gevent workers. Other processes, e.g. the importers, keep the blocking
+    access.
+
+    :param enabled: False keeps the blocking access in every process
+    :return: Returns True if the wait callback was set
+    """
+    cooperative = enabled and gevent_patched()
+    if cooperative:
+        set_cooperative(True)
+    return cooperative
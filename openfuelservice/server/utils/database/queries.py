@@ -1,6 +1,9 @@
+from sqlalchemy import text
+
 from openfuelservice.server import db, allowed_fuel_types
 from openfuelservice.server.db_import.models import EnvirocarSensorModel, WikiCarModel, MatchedWikiEnvirocarModel, \
-    CarfuelDataCarModel, WikiCarPageTextModel, CarCategoryModel, EnvirocarSensorStatisticModel
+    CarfuelDataCarModel, WikiCarPageTextModel, CarCategoryModel, EnvirocarSensorStatisticModel, \
+    CarfuelDataCarCatalogueModel
 from openfuelservice.server.utils.misc.data_handling import clean_manufacturer_list
 
 
@@ -49,19 +52,12 @@ def get_cars_by_category(brand: str, carfueldata: bool = True, matched_only: boo
     cars = {}
     cars_return = {}
     if carfueldata:
-        cfd_query = CarFuelData().get_cfd_cars(brand=brand, matched_only=True) if matched_only else \
-            CarFuelData().get_cfd_cars(brand=brand, matched_only=False)
-        cfd_car: CarfuelDataCarModel
-        for cfd_car in cfd_query:
-            wiki_hashes = cfd_car.wiki_hashes
-            wiki_car_objects = Wikipedia().get_cars_by_hashes(hashes=wiki_hashes)
-            wiki_car: WikiCarModel
-            wiki_categories = [wiki_car.category_short_eu for wiki_car in wiki_car_objects]
+        for cfd_car in CarFuelData().get_cfd_car_categories(brand=brand, matched_only=matched_only):
             if str(cfd_car.model) not in cars:
                 cars[cfd_car.model] = {}
                 cars[cfd_car.model]['categories'] = []
-            [cars[cfd_car.model]['categories'].append(category) for category in wiki_categories if
-             category not in cars[cfd_car.model]['categories']]
+            if cfd_car.wiki_hash_id is not None and cfd_car.category_short_eu not in cars[cfd_car.model]['categories']:
+                cars[cfd_car.model]['categories'].append(cfd_car.category_short_eu)
     if wiki_cars:
         wiki_query = Wikipedia().get_cars_by_brand(filter_brand=brand)
         wiki_car: WikiCarModel
@@ -80,72 +76,83 @@ def get_cars_by_category(brand: str, carfueldata: bool = True, matched_only: boo
 def get_car_ids(brand, source):
     cars = {}
     if source == 'cfd':
-        query = CarFuelData().get_cfd_cars(brand=brand, matched_only=True)
-        car: CarfuelDataCarModel
-        for car in query:
-            model = car.model.strip()
-            cleaned_model_name = " "
-            year = str(car.year)
-            last_digits = str(year)[-2:]
-            description = car.description.strip()
-            fuel_type = car.fuel_type
-            wiki_hashes = car.wiki_hashes
-            cfd_hash_id = car.hash_id
-            tokenized_model_name = model.split(',')
-            if len(tokenized_model_name) > 1:
-                for word in tokenized_model_name:
-                    word = word.strip()
-                    if str(year) in word:
-                        continue
-                    elif str(last_digits) in word and 'my' in word.lower():
-                        continue
-                    elif 'my' in word.lower() and len(word) <= 4:
-                        continue
-                    else:
-                        cleaned_model_name = cleaned_model_name + ' ' + word
-            else:
-                if 'MY' + str(year) in model:
-                    cleaned_model_name = model.strip('MY' + str(year))
-                if 'MY' + str(last_digits) in model:
-                    cleaned_model_name = model.strip('MY' + str(last_digits))
-            cleaned_model_name = cleaned_model_name.strip() if len(cleaned_model_name.strip()) > 0 else model
-            if fuel_type not in allowed_fuel_types:
+        cars = CarFuelData().get_car_catalogue(brand=brand)
+        if cars is None:
+            cars = build_cfd_car_ids(CarFuelData().get_cfd_cars(brand=brand, matched_only=True))
+    return cars
+
+
+def clean_cfd_model_name(model: str, year: int) -> str:
+    """
+    Removes the model year, e.g. 'MY19', from a cfd model name.
+    """
+    model = model.strip()
+    cleaned_model_name = " "
+    year = str(year)
+    last_digits = str(year)[-2:]
+    tokenized_model_name = model.split(',')
+    if len(tokenized_model_name) > 1:
+        for word in tokenized_model_name:
+            word = word.strip()
+            if str(year) in word:
                 continue
-            if wiki_hashes is None or len(wiki_hashes) <= 0:
+            elif str(last_digits) in word and 'my' in word.lower():
                 continue
-            for processed_car in cars:
-                if processed_car.lower() == cleaned_model_name.lower():
-                    cleaned_model_name = processed_car
-            if cleaned_model_name not in cars:
-                cars[cleaned_model_name] = {}
-                cars[cleaned_model_name]['all'] = []
-            cars[cleaned_model_name]['all'].append(cfd_hash_id)
-            if year not in cars[cleaned_model_name]:
-                cars[cleaned_model_name][year] = {}
-                cars[cleaned_model_name][year]['all'] = []
-            cars[cleaned_model_name][year]['all'].append(cfd_hash_id)
-            if description not in cars[cleaned_model_name][year]:
-                cars[cleaned_model_name][year][description] = []
-                cars[cleaned_model_name][year][description].append(cfd_hash_id)
+            elif 'my' in word.lower() and len(word) <= 4:
+                continue
+            else:
+                cleaned_model_name = cleaned_model_name + ' ' + word
+    else:
+        if 'MY' + str(year) in model:
+            cleaned_model_name = model.strip('MY' + str(year))
+        if 'MY' + str(last_digits) in model:
+            cleaned_model_name = model.strip('MY' + str(last_digits))
+    return cleaned_model_name.strip() if len(cleaned_model_name.strip()) > 0 else model
+
+
+def build_cfd_car_ids(cfd_cars: [CarfuelDataCarModel]) -> dict:
+    """
+    Groups the matched cfd cars of a brand by their cleaned model name, year and description.
+    Model names that only differ in their case are merged into the first seen one.
+
+    :return: Returns a dict of model name -> year -> description -> cfd hash ids. Every level holds its ids in 'all'.
+    """
+    cars = {}
+    model_names = {}
+    car: CarfuelDataCarModel
+    for car in cfd_cars:
+        if car.fuel_type not in allowed_fuel_types:
+            continue
+        if car.wiki_hashes is None or len(car.wiki_hashes) <= 0:
+            continue
+        year = str(car.year)
+        description = car.description.strip()
+        cfd_hash_id = car.hash_id
+        cleaned_model_name = clean_cfd_model_name(model=car.model, year=car.year)
+        cleaned_model_name = model_names.setdefault(cleaned_model_name.lower(), cleaned_model_name)
+        if cleaned_model_name not in cars:
+            cars[cleaned_model_name] = {}
+            cars[cleaned_model_name]['all'] = []
+        cars[cleaned_model_name]['all'].append(cfd_hash_id)
+        if year not in cars[cleaned_model_name]:
+            cars[cleaned_model_name][year] = {}
+            cars[cleaned_model_name][year]['all'] = []
+        cars[cleaned_model_name][year]['all'].append(cfd_hash_id)
+        if description not in cars[cleaned_model_name][year]:
+            cars[cleaned_model_name][year][description] = []
+            cars[cleaned_model_name][year][description].append(cfd_hash_id)
     return cars
 
 
 def get_cars(brand: str, carfueldata: bool = True, matched_only: bool = True, wiki_cars: bool = True):
     cars = {}
     if carfueldata:
-        cfd_query = CarFuelData().get_cfd_cars(brand=brand, matched_only=True) if matched_only else \
-            CarFuelData().get_cfd_cars(brand=brand, matched_only=False)
-        cfd_car: CarfuelDataCarModel
-        for cfd_car in cfd_query:
-            wiki_hashes = cfd_car.wiki_hashes
-            wiki_car_objects = Wikipedia().get_cars_by_hashes(hashes=wiki_hashes)
-            wiki_car: WikiCarModel
-            wiki_categories = [wiki_car.category_short_eu for wiki_car in wiki_car_objects]
+        for cfd_car in CarFuelData().get_cfd_car_categories(brand=brand, matched_only=matched_only):
             if str(cfd_car.model) not in cars:
                 cars[cfd_car.model] = {}
                 cars[cfd_car.model]['categories'] = []
-            [cars[cfd_car.model]['categories'].append(category) for category in wiki_categories if
-             category not in cars[cfd_car.model]['categories']]
+            if cfd_car.wiki_hash_id is not None and cfd_car.category_short_eu not in cars[cfd_car.model]['categories']:
+                cars[cfd_car.model]['categories'].append(cfd_car.category_short_eu)
     if wiki_cars:
         wiki_query = Wikipedia().get_cars_by_brand(filter_brand=brand)
         wiki_car: WikiCarModel
@@ -245,6 +252,30 @@ class CarFuelData:
                 brands.append(manufacturer)
         return brands
 
+    def get_car_catalogue(self, brand: str) -> dict or None:
+        """
+        Returns the car ids of a brand stored at the cfd import or None if the brand is not in the catalogue.
+        """
+        catalogue: CarfuelDataCarCatalogueModel = db.session.query(CarfuelDataCarCatalogueModel).get(brand)
+        return catalogue.cars if catalogue is not None else None
+
+    def get_cfd_car_categories(self, brand: str, matched_only: bool = False) -> []:
+        """
+        Returns the model and the category of every matched wikipedia car of the cfd cars of a brand in one query.
+        The wiki hashes are unnested in their stored order. Cars without a matched wikipedia car get a single row
+        without wiki_hash_id.
+        """
+        statement = text("""
+            SELECT cfd.hash_id, cfd.model, wiki.hash_id AS wiki_hash_id, wiki.category_short_eu
+            FROM {cfd_table} AS cfd
+            LEFT JOIN LATERAL unnest(cfd.wiki_hashes) WITH ORDINALITY AS matched(wiki_hash, position) ON TRUE
+            LEFT JOIN {wiki_table} AS wiki ON wiki.hash_id = matched.wiki_hash
+            WHERE cfd.manufacturer = :brand {matched_filter}
+            ORDER BY cfd.hash_id, matched.position
+        """.format(cfd_table=CarfuelDataCarModel.__tablename__, wiki_table=WikiCarModel.__tablename__,
+                   matched_filter='AND cfd.wiki_hashes IS NOT NULL' if matched_only else ''))
+        return db.session.execute(statement, {'brand': brand}).fetchall()
+
     def get_cfd_cars(self, brand: str, matched_only: bool = False):
         return_cars = {}
         if matched_only:
@@ -260,20 +291,52 @@ class CarFuelData:
         return query
 
     def get_cfd_categories(self, cfd_ids: []):
-        return_categories = {}
         if cfd_ids is None:
-            return return_categories
-        for cfd_id in cfd_ids:
-            if cfd_id not in return_categories:
-                return_categories[cfd_id] = []
-            db_entry: CarfuelDataCarModel = db.session.query(CarfuelDataCarModel).filter(CarfuelDataCarModel.hash_id == cfd_id).first()
-            if db_entry is not None:
-                wiki_hashes = db_entry.wiki_hashes
-                categories = Wikipedia().get_categories_by_hashes(wiki_hashes=wiki_hashes)
-                return_categories[cfd_id] = [category for category in categories if category not in return_categories[cfd_id]]
+            return {}
+        cfd_cars = db.session.query(CarfuelDataCarModel.hash_id, CarfuelDataCarModel.wiki_hashes,
+                                    CarfuelDataCarModel.categories).filter(
+            CarfuelDataCarModel.hash_id.in_(cfd_ids)).all()
+        return_categories = {cfd_id: [] for cfd_id in cfd_ids}
+        return_categories.update(self.get_categories_of_cars(cfd_cars=cfd_cars))
+        return return_categories
+
+    @staticmethod
+    def get_categories_of_cars(cfd_cars: []) -> dict:
+        """
+        Returns the categories of loaded cfd cars by their hash_id. Cars imported without stored categories are
+        resolved by their wiki hashes with a single query.
+        """
+        return_categories = {}
+        missing_cars = []
+        for cfd_car in cfd_cars:
+            if cfd_car.categories is not None:
+                return_categories[cfd_car.hash_id] = list(cfd_car.categories)
+            else:
+                missing_cars.append(cfd_car)
+        if len(missing_cars) > 0:
+            wiki_hashes = [wiki_hash for cfd_car in missing_cars for wiki_hash in (cfd_car.wiki_hashes or [])]
+            hash_categories = Wikipedia().get_categories_by_hash_ids(wiki_hashes=wiki_hashes)
+            for cfd_car in missing_cars:
+                return_categories[cfd_car.hash_id] = categories_of_hashes(wiki_hashes=cfd_car.wiki_hashes,
+                                                                          hash_categories=hash_categories)
         return return_categories
 
 
+def categories_of_hashes(wiki_hashes: [], hash_categories: dict) -> []:
+    """
+    Returns the distinct categories of the wiki hashes in their order.
+
+    :param wiki_hashes: The wiki hashes of a car
+    :param hash_categories: Dict of wiki hashes and their category_short_eu
+    """
+    categories = []
+    for wiki_hash in wiki_hashes or []:
+        category = hash_categories.get(wiki_hash)
+        if category is not None and category not in categories:
+            categories.append(category)
+    return categories
+
+
 class Wikipedia:
 
     def get_hashes_by_name(self, wiki_name: str):
@@ -315,14 +378,20 @@ class Wikipedia:
         return return_queries
 
     def get_categories_by_hashes(self, wiki_hashes: []):
-        return_categories = []
         if wiki_hashes is None:
-            return return_categories
-        for wiki_hash in wiki_hashes:
-            db_entry: WikiCarModel = db.session.query(WikiCarModel).filter(WikiCarModel.hash_id == wiki_hash).first()
-            if db_entry is not None:
-                return_categories.append(db_entry.category_short_eu)
-        return return_categories
+            return []
+        hash_categories = self.get_categories_by_hash_ids(wiki_hashes=wiki_hashes)
+        return [hash_categories[wiki_hash] for wiki_hash in wiki_hashes if wiki_hash in hash_categories]
+
+    def get_categories_by_hash_ids(self, wiki_hashes: []) -> dict:
+        """
+        Returns a dict of the wiki hashes and their category_short_eu queried at once.
+        """
+        if wiki_hashes is None or len(wiki_hashes) == 0:
+            return {}
+        query = db.session.query(WikiCarModel.hash_id, WikiCarModel.category_short_eu).filter(
+            WikiCarModel.hash_id.in_(set(wiki_hashes))).all()
+        return {wiki_car.hash_id: wiki_car.category_short_eu for wiki_car in query}
 
     def get_cars_by_brand(self, filter_brand: str = None):
         if filter_brand is None:
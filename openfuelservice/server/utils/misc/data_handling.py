@@ -4,9 +4,8 @@ from pathlib import PosixPath
 
 import yaml
 
-from openfuelservice.server import car_brands, file_folder, basedir
-
-manufacturer_aliases = car_brands['aliases']
+from openfuelservice.server import file_folder, basedir
+from openfuelservice.server.utils.misc.manufacturer_resolver import manufacturer_resolver
 
 
 def save_fixed_brand_matches(manufacturer: str, wikiCarNames: [], uniqueCarName: str):
@@ -221,20 +220,10 @@ def powerset(iterable) -> []:
 
 
 def check_manufacturer(manufacturer_to_check: str) -> str:
-    cleaned_manufacturer_to_check = manufacturer_to_check.casefold().strip()
-    for manufacturer in manufacturer_aliases:
-        if cleaned_manufacturer_to_check == manufacturer.casefold().strip():
-            return manufacturer
-        for sub_alias in manufacturer_aliases[manufacturer]:
-            if cleaned_manufacturer_to_check in sub_alias.casefold().strip():
-                return manufacturer
-    for manufacturer in car_brands['brands']:
-        if manufacturer_to_check == manufacturer:
-            return manufacturer
-        if cleaned_manufacturer_to_check == manufacturer.casefold().strip():
-            return manufacturer
-    print('Missing Manufacturer in brands list:', manufacturer_to_check)
-    return ""
+    real_manufacturer = manufacturer_resolver.resolve(manufacturer_to_check)
+    if real_manufacturer == "":
+        print('Missing Manufacturer in brands list:', manufacturer_to_check)
+    return real_manufacturer
 
 
 def clean_manufacturer_list(manufacturers_to_check: []) -> []:
@@ -1,10 +1,14 @@
 import math
-from functools import partial
+from functools import partial, lru_cache
 
+import numpy
 import pyproj
-from shapely.geometry import LineString
+from numpy import ndarray
+from shapely.geometry.base import BaseGeometry
 from shapely.ops import transform
 
+wgs84_geod = pyproj.Geod(ellps='WGS84')
+
 
 def truncate(f: float, n: int) -> str:
     """Truncates/pads a float f to n decimal places without rounding"""
@@ -34,11 +38,21 @@ def parse_geometry(geometry: list) -> list:
     return geom
 
 
+@lru_cache(maxsize=64)
+def get_projection(init: str) -> pyproj.Proj:
+    """
+    Returns a cached projection, so the projection definitions are only parsed once per worker.
+
+    :param init: The projection definition, e.g. 'epsg:4326'
+    """
+    return pyproj.Proj(init=init)
+
+
 def transform_geom(g1, src_proj: str, dest_proj: str):
     project = partial(
         pyproj.transform,
-        pyproj.Proj(init=src_proj),
-        pyproj.Proj(init=dest_proj))
+        get_projection(src_proj),
+        get_projection(dest_proj))
 
     g2 = transform(project, g1)
 
@@ -76,17 +90,59 @@ def convert_wgs_to_utm_epsg(lon: float, lat: float):
     return epsg_code
 
 
-def true_linestring_length(linestring: LineString) -> float:
+def segment_lengths(coordinates) -> ndarray:
+    """
+    Calculates the geodesic length in meter of every segment of a coordinate sequence in one pass.
+
+    :param coordinates: Sequence or array of lngLat coordinates. Further dimensions are ignored.
+    :return: Returns an array with one length per segment
+    """
+    vertices = numpy.asarray(coordinates, dtype=float)
+    if vertices.ndim != 2 or len(vertices) < 2:
+        return numpy.zeros(0)
+    _, _, distances = wgs84_geod.inv(vertices[:-1, 0], vertices[:-1, 1], vertices[1:, 0], vertices[1:, 1])
+    return numpy.asarray(distances, dtype=float)
+
+
+def true_linestring_length(linestring: BaseGeometry) -> float:
     """
     Calculates the true length in meter from a linestring not the geometric non-unit distance.
-    :param linestring: Shapely BaseGeometry!!!
+    The length is measured on the WGS84 ellipsoid, so it does not depend on a projection.
+
+    :param linestring: Shapely LineString, MultiLineString or GeometryCollection of lines
     :return: Returns the length in float
     """
-    centroid_longitude: float = linestring.centroid.coords.xy[0][0]
-    centroid_latitude: float = linestring.centroid.coords.xy[1][0]
-    destination_epsg = convert_wgs_to_utm_epsg(lon=centroid_longitude, lat=centroid_latitude)
-    transformation_profile = partial(pyproj.transform,
-                                          pyproj.Proj(init='epsg:4326'),
-                                          pyproj.Proj(init='epsg:{}'.format(destination_epsg)))
-    route_length_in_meter = transform(transformation_profile, linestring).length
-    return route_length_in_meter
+    if linestring.is_empty:
+        return 0.0
+    if hasattr(linestring, 'geoms'):
+        return sum(true_linestring_length(linestring=part) for part in linestring.geoms)
+    if linestring.geom_type != 'LineString':
+        return 0.0
+    return float(segment_lengths(linestring.coords).sum())
+
+
+def decode_polyline(polyline: str, precision: int = 5) -> ndarray:
+    """
+    Decodes an encoded polyline (https://developers.google.com/maps/documentation/utilities/polylinealgorithm)
+    without a loop over its characters.
+
+    :param polyline: The encoded polyline in latLng order
+    :param precision: Number of decimals the coordinates were encoded with
+    :return: Returns an array of the coordinates in lngLat order
+    """
+    chunks = numpy.frombuffer(polyline.encode('ascii'), dtype=numpy.uint8).astype(numpy.int64) - 63
+    if len(chunks) == 0 or chunks.min() < 0 or chunks.max() > 63:
+        raise ValueError('Polyline holds invalid characters')
+    # Every value ends with a chunk without the continuation bit
+    value_ends = chunks < 0x20
+    if not value_ends[-1]:
+        raise ValueError('Polyline ends within a value')
+    value_starts = numpy.concatenate(([0], numpy.flatnonzero(value_ends[:-1]) + 1))
+    value_ids = numpy.cumsum(numpy.concatenate(([0], value_ends[:-1].astype(numpy.int64))))
+    shifts = 5 * (numpy.arange(len(chunks)) - value_starts[value_ids])
+    values = numpy.add.reduceat((chunks & 0x1f) << shifts, value_starts)
+    if len(values) % 2 != 0:
+        raise ValueError('Polyline holds an incomplete coordinate')
+    deltas = numpy.where(values & 1, ~(values >> 1), values >> 1)
+    coordinates = numpy.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+    return coordinates[:, ::-1]
@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+from openfuelservice.server import car_brands
+
+manufacturer_memo_size = 4096
+
+
+class ManufacturerResolver(object):
+    def __init__(self, brands: dict, aliases: dict, memo_size: int = manufacturer_memo_size):
+        """
+        Resolves manufacturer names of the data sources to the manufacturers of car_brands.yml with hash lookups.
+        The tables are compiled once and keep the priorities of the former linear scans: the aliases in their order
+        first, then the brands in their order. Resolved names are memoized.
+
+        :param brands: The brands of car_brands.yml
+        :param aliases: The manufacturers and their aliases of car_brands.yml
+        :param memo_size: Number of resolved names to remember
+        """
+        self.exact_aliases: dict = dict()
+        self.substring_aliases: dict = dict()
+        self.brands: dict = dict()
+        for manufacturer in aliases:
+            self.exact_aliases.setdefault(manufacturer.casefold().strip(), manufacturer)
+            self.substring_aliases.setdefault(manufacturer.casefold().strip(), manufacturer)
+            for alias in aliases[manufacturer]:
+                alias = alias.casefold().strip()
+                self.exact_aliases.setdefault(alias, manufacturer)
+                # Every substring of the alias, so a name that is part of an alias is found with one lookup
+                for start in range(len(alias) + 1):
+                    for end in range(start, len(alias) + 1):
+                        self.substring_aliases.setdefault(alias[start:end], manufacturer)
+        for brand in brands:
+            self.brands.setdefault(brand.casefold().strip(), brand)
+        self.resolve = lru_cache(maxsize=memo_size)(self.resolve)
+
+    def resolve(self, manufacturer_to_check: str, substring_aliases: bool = True) -> str:
+        """
+        Returns the manufacturer of car_brands.yml or an empty string.
+
+        :param manufacturer_to_check: The manufacturer name of a data source or a request
+        :param substring_aliases: True to accept names that are only a part of an alias, False to only accept whole
+        aliases
+        """
+        cleaned_manufacturer_to_check = manufacturer_to_check.casefold().strip()
+        aliases = self.substring_aliases if substring_aliases else self.exact_aliases
+        if cleaned_manufacturer_to_check in aliases:
+            return aliases[cleaned_manufacturer_to_check]
+        return self.brands.get(cleaned_manufacturer_to_check, "")
+
+
+manufacturer_resolver = ManufacturerResolver(brands=car_brands['brands'], aliases=car_brands['aliases'])
@@ -0,0 +1,133 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy
+from numpy import ndarray
+
+# Magic bytes with the format version, the length of the json header follows as little endian uint64
+snapshot_magic = b'OFSSNAP\x01'
+snapshot_alignment = 64
+
+
+def aligned(offset: int) -> int:
+    return (offset + snapshot_alignment - 1) // snapshot_alignment * snapshot_alignment
+
+
+def file_identity(path: Path) -> tuple or None:
+    """
+    :return: Returns what changes when a file is replaced or None if it doesn't exist
+    """
+    try:
+        stat = os.stat(path.as_posix())
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def blob_arrays(name: str, values: [bytes]) -> dict:
+    """
+    Stores variable length values, e.g. WKB geometries, as one byte array and the offsets of the values in it.
+
+    :return: Returns the arrays name.data and name.offsets
+    """
+    offsets = numpy.zeros(len(values) + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum([len(value) for value in values])
+    data = numpy.frombuffer(b''.join(values), dtype=numpy.uint8) if len(values) > 0 else numpy.zeros(0, numpy.uint8)
+    return {'{}.data'.format(name): data, '{}.offsets'.format(name): offsets}
+
+
+def write_snapshot_file(path: Path, arrays: dict, meta: dict):
+    """
+    Writes the arrays next to the target and moves the file into place at once. Processes that mapped the previous
+    file keep reading it until they map the new one.
+
+    :param path: Path of the snapshot file
+    :param arrays: Dict of the array names and the numpy arrays. Object arrays are not supported.
+    :param meta: Json serializable information about the content, e.g. the data versions
+    """
+    layout = dict()
+    offset = 0
+    for name in sorted(arrays):
+        array = numpy.ascontiguousarray(arrays[name])
+        if array.dtype.hasobject:
+            raise ValueError('The array {} holds python objects'.format(name))
+        arrays[name] = array
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = aligned(offset + array.nbytes)
+    header = json.dumps({'meta': meta, 'arrays': layout}, sort_keys=True).encode('utf-8')
+    data_start = aligned(len(snapshot_magic) + 8 + len(header))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=path.parent.as_posix(), prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as snapshot_file:
+            snapshot_file.write(snapshot_magic + struct.pack('<Q', len(header)) + header)
+            for name in sorted(arrays):
+                snapshot_file.seek(data_start + layout[name]['offset'])
+                snapshot_file.write(arrays[name].tobytes())
+            snapshot_file.truncate(data_start + offset)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        # mkstemp creates the file for its owner only, the workers may run as another user
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path.as_posix())
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+class SnapshotFile(object):
+    def __init__(self, path: Path):
+        """
+        Maps a snapshot file read-only. The arrays are views on the mapping, so every process that maps the same file
+        shares its pages instead of holding a copy.
+
+        :param path: Path of the snapshot file
+        """
+        with open(path.as_posix(), 'rb') as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self.identity: tuple = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            self.buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(snapshot_magic)] != snapshot_magic:
+            raise ValueError('{} is no snapshot of this version'.format(path))
+        header_length = struct.unpack('<Q', self.buffer[len(snapshot_magic):len(snapshot_magic) + 8])[0]
+        header_start = len(snapshot_magic) + 8
+        header = json.loads(bytes(self.buffer[header_start:header_start + header_length]).decode('utf-8'))
+        self.meta: dict = header['meta']
+        self.layout: dict = header['arrays']
+        self.data_start: int = aligned(header_start + header_length)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.layout
+
+    def array(self, name: str) -> ndarray:
+        """
+        :return: Returns the read-only array without copying it
+        """
+        layout = self.layout[name]
+        dtype = numpy.dtype(layout['dtype'])
+        shape = tuple(layout['shape'])
+        count = int(numpy.prod(shape))
+        if count == 0:
+            return numpy.zeros(shape, dtype=dtype)
+        return numpy.frombuffer(self.buffer, dtype=dtype, count=count,
+                                offset=self.data_start + layout['offset']).reshape(shape)
+
+    def blob(self, name: str, index: int) -> bytes:
+        offsets = self.array('{}.offsets'.format(name))
+        return self.array('{}.data'.format(name))[offsets[index]:offsets[index + 1]].tobytes()
+
+    def blobs(self, name: str) -> [bytes]:
+        offsets = self.array('{}.offsets'.format(name))
+        data = self.array('{}.data'.format(name))
+        return [data[offsets[index]:offsets[index + 1]].tobytes() for index in range(len(offsets) - 1)]
+
+    def strings(self, name: str) -> [str]:
+        """
+        :return: Returns the values of a fixed width bytes array as strings
+        """
+        return [value.decode('utf-8') for value in self.array(name).tolist()]
@@ -0,0 +1,114 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+from openfuelservice.server import ofs_settings
+
+stage_timing = ofs_settings['general']['advanced_settings'].get('stage_timing', True)
+# Upper bounds in seconds of the histogram buckets
+histogram_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram(object):
+    def __init__(self, name: str, documentation: str, label_name: str, buckets: tuple = histogram_buckets):
+        """
+        Cumulative histogram per label value, exposed in the prometheus text format.
+
+        :param name: Metric name
+        :param documentation: Help text of the metric
+        :param label_name: Name of the label that separates the observations, e.g. 'stage'
+        :param buckets: Sorted upper bounds of the buckets
+        """
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_name: str = label_name
+        self.buckets: tuple = buckets
+        self.counts: dict = dict()
+        self.sums: dict = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, label: str, value: float):
+        with self._lock:
+            if label not in self.counts:
+                self.counts[label] = [0] * (len(self.buckets) + 1)
+                self.sums[label] = 0.0
+            counts = self.counts[label]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self.sums[label] += value
+
+    def expose(self) -> [str]:
+        lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} histogram'.format(self.name)]
+        with self._lock:
+            for label in sorted(self.counts):
+                counts = self.counts[label]
+                for index, bound in enumerate(self.buckets):
+                    lines.append('{}_bucket{{{}="{}",le="{}"}} {}'.format(self.name, self.label_name, label, bound,
+                                                                         counts[index]))
+                lines.append('{}_bucket{{{}="{}",le="+Inf"}} {}'.format(self.name, self.label_name, label, counts[-1]))
+                lines.append('{}_sum{{{}="{}"}} {}'.format(self.name, self.label_name, label, self.sums[label]))
+                lines.append('{}_count{{{}="{}"}} {}'.format(self.name, self.label_name, label, counts[-1]))
+        return lines
+
+
+stage_histogram = Histogram(name='ofs_stage_duration_seconds', label_name='stage',
+                            documentation='Time a request spent in each processing stage')
+
+
+def add_stage_time(stage: str, seconds: float):
+    """
+    Adds the time to the stage timings of the current request. Stages that run many times per request, e.g. sql,
+    are summed up. Outside of requests, e.g. in the importers, nothing is recorded.
+    """
+    if stage_timing and has_request_context():
+        if 'stage_timings' not in g:
+            g.stage_timings = dict()
+        g.stage_timings[stage] = g.stage_timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(stage=stage, seconds=time.perf_counter() - start)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('stage_timer_starts', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('stage_timer_starts')
+    if starts:
+        add_stage_time(stage='sql', seconds=time.perf_counter() - starts.pop(-1))
+
+
+def handle_error(exception_context):
+    """
+    Failed statements never reach after_cursor_execute, so their start is popped here. Otherwise the starts pile up
+    on the pooled connection and the next statements are measured against the wrong start.
+    """
+    connection = exception_context.connection
+    if connection is None:
+        return
+    starts = connection.info.get('stage_timer_starts')
+    if starts:
+        add_stage_time(stage='sql', seconds=time.perf_counter() - starts.pop(-1))
+
+
+def server_timing_header(stage_timings: dict) -> str:
+    """
+    Formats the stage timings as Server-Timing header value with the durations in milliseconds.
+    """
+    return ', '.join('{};dur={:.2f}'.format(stage, stage_timings[stage] * 1000) for stage in stage_timings)
+
+
+def record_stage_timings(stage_timings: dict):
+    for stage in stage_timings:
+        stage_histogram.observe(label=stage, value=stage_timings[stage])
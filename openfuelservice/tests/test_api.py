@@ -33,6 +33,76 @@ class TestAPIPost(unittest.TestCase):
         self.assertIn('fuel_stats', json_response)
         self.assertIn('general', json_response)
 
+    def test_coordinate_route_request(self):
+        global simple_cfd_filter
+        with open(test_resources.joinpath('geojson_route_geometry.json'), 'rb') as f:
+            geojson = json.load(f)
+        request_json = {
+            'request': 'route',
+            'geometry': {
+                'coordinates': geojson['coordinates'],
+                'filters': simple_cfd_filter
+            }
+        }
+        response: request = client.post('/fuel?request=route', json=request_json)
+        json_response = json.loads(response.data)
+        self.assertIn('fuel_stats', json_response)
+        self.assertIn('general', json_response)
+
+    def test_batch_route_request(self):
+        global simple_cfd_filter
+        with open(test_resources.joinpath('geojson_route_geometry.json'), 'rb') as f:
+            geojson = json.load(f)
+        request_json = {
+            'request': 'routes',
+            'geometry': {
+                'geojson': {
+                    'type': 'FeatureCollection',
+                    'features': [
+                        {'type': 'Feature', 'properties': {'request_id': 'first'}, 'geometry': geojson},
+                        {'type': 'Feature', 'properties': {'request_id': 'second'}, 'geometry': geojson}
+                    ]
+                },
+                'filters': simple_cfd_filter
+            }
+        }
+        response: request = client.post('/fuel?request=routes', json=request_json)
+        json_response = json.loads(response.data)
+        self.assertIn('routes', json_response)
+        self.assertEqual(len(json_response['routes']), 2)
+        self.assertEqual(json_response['routes'][0]['request_id'], 'first')
+        self.assertEqual(json_response['routes'][1]['request_id'], 'second')
+        for route in json_response['routes']:
+            self.assertIn('attributions', route)
+            self.assertIn('fuel_stats', route)
+            self.assertIn('general', route)
+
+    def test_streamed_batch_route_request(self):
+        global simple_cfd_filter
+        with open(test_resources.joinpath('geojson_route_geometry.json'), 'rb') as f:
+            geojson = json.load(f)
+        request_json = {
+            'request': 'routes',
+            'geometry': {
+                'geojson': {
+                    'type': 'FeatureCollection',
+                    'features': [
+                        {'type': 'Feature', 'properties': {'request_id': 'first'}, 'geometry': geojson},
+                        {'type': 'Feature', 'properties': {'request_id': 'second'}, 'geometry': geojson}
+                    ]
+                },
+                'filters': simple_cfd_filter
+            }
+        }
+        response: request = client.post('/fuel?request=routes&format=ndjson', json=request_json)
+        self.assertIn('application/x-ndjson', response.headers['Content-Type'])
+        routes = [json.loads(line) for line in response.data.splitlines()]
+        self.assertEqual(len(routes), 2)
+        self.assertEqual(routes[0]['request_id'], 'first')
+        self.assertEqual(routes[1]['request_id'], 'second')
+        for route in routes:
+            self.assertIn('fuel_stats', route)
+
 
 class TestAPIGetter(unittest.TestCase):
     def test_categories_validity(self):
@@ -75,3 +145,11 @@ class TestAPIGetter(unittest.TestCase):
         self.assertIn(b'brands', byte_data)
         self.assertIn('brands', json_data)
         self.assertGreater(len(json_data['brands']), 0)
+
+    def test_metrics_validity(self):
+        client.get('/fuel?request=categories')
+        response: request = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/plain', response.headers['Content-Type'])
+        self.assertIn(b'ofs_stage_duration_seconds_bucket{stage="total"', response.data)
+        self.assertIn(b'ofs_route_cache_hits', response.data)
@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from openfuelservice.server import api_exceptions
+from openfuelservice.server.api import views
+from openfuelservice.server.utils.database.catalogue import CatalogueSnapshot
+
+
+class TestBrandRequests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        app = Flask(__name__)
+        app.register_blueprint(views.main_blueprint)
+        cls.client = app.test_client()
+
+    def requested_snapshots(self, queries: [str]) -> [str]:
+        """
+        :return: Returns the names of the catalogue snapshots read to answer the queries
+        """
+        snapshots = mock.Mock()
+        snapshots.get.return_value = CatalogueSnapshot.create({'cars': {}})
+        with mock.patch.object(views, 'catalogue_snapshots', snapshots):
+            for query in queries:
+                self.assertEqual(self.client.get('/fuel?' + query).status_code, 200)
+        return [call[1]['name'] for call in snapshots.get.call_args_list]
+
+    def test_car_ids_brand_case(self):
+        names = self.requested_snapshots(['request=cars&source=cfd&brand=BMW', 'request=cars&source=cfd&brand=bmw',
+                                          'request=cars&source=cfd&brand=%20bmw%20'])
+        self.assertEqual(names, ['car_ids/cfd/BMW'] * 3)
+
+    def test_cars_brand_case(self):
+        self.assertEqual(self.requested_snapshots(['request=cars&brand=BMW', 'request=cars&brand=bmw']),
+                         ['cars/BMW'] * 2)
+
+    def test_resolve_brand(self):
+        self.assertEqual(views.resolve_brand('mercedes'), 'Mercedes-Benz')
+        with self.assertRaises(api_exceptions.InvalidUsage):
+            views.resolve_brand('no brand')
+
+
+if __name__ == '__main__':
+    unittest.main()
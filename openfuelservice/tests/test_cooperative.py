@@ -0,0 +1,59 @@
+import unittest
+from unittest import mock
+
+from psycopg2 import extensions
+
+from openfuelservice.server.config import engine_options
+from openfuelservice.server.utils.database import cooperative
+
+
+class TestEngineOptions(unittest.TestCase):
+    def test_defaults(self):
+        self.assertEqual(engine_options({}), {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30,
+                                              'pool_recycle': 1800, 'pool_pre_ping': True})
+
+    def test_settings(self):
+        options = engine_options({'pool_size': 4, 'max_overflow': 0, 'pool_pre_ping': False, 'host': 'localhost'})
+        self.assertEqual((options['pool_size'], options['max_overflow'], options['pool_pre_ping']), (4, 0, False))
+        self.assertNotIn('host', options)
+
+    def test_statement_timeout(self):
+        self.assertEqual(engine_options({'statement_timeout': 5000})['connect_args'],
+                         {'options': '-c statement_timeout=5000'})
+        # Fractions of a millisecond and string values of the settings are formatted as whole milliseconds
+        self.assertEqual(engine_options({'statement_timeout': 2500.7})['connect_args'],
+                         {'options': '-c statement_timeout=2500'})
+        self.assertEqual(engine_options({'statement_timeout': '300'})['connect_args'],
+                         {'options': '-c statement_timeout=300'})
+        for statement_timeout in [0, None]:
+            self.assertNotIn('connect_args', engine_options({'statement_timeout': statement_timeout}))
+
+
+class TestCooperativeDatabase(unittest.TestCase):
+    def tearDown(self):
+        extensions.set_wait_callback(None)
+
+    def test_without_gevent(self):
+        with mock.patch.object(cooperative, 'monkey', None):
+            self.assertFalse(cooperative.gevent_patched())
+            self.assertFalse(cooperative.init_cooperative_database(enabled=True))
+        self.assertIsNone(extensions.get_wait_callback())
+
+    def test_unpatched_process(self):
+        monkey = mock.Mock()
+        monkey.is_module_patched.return_value = False
+        with mock.patch.object(cooperative, 'monkey', monkey):
+            self.assertFalse(cooperative.init_cooperative_database(enabled=True))
+        monkey.is_module_patched.assert_called_with('socket')
+        self.assertIsNone(extensions.get_wait_callback())
+
+    def test_gevent_worker(self):
+        with mock.patch.object(cooperative, 'gevent_patched', return_value=True):
+            self.assertFalse(cooperative.init_cooperative_database(enabled=False))
+            self.assertIsNone(extensions.get_wait_callback())
+            self.assertTrue(cooperative.init_cooperative_database(enabled=True))
+        self.assertIs(extensions.get_wait_callback(), cooperative.gevent_wait_callback)
+
+
+if __name__ == '__main__':
+    unittest.main()
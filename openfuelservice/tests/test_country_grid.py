@@ -0,0 +1,63 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy
+from shapely.geometry import box, Point
+
+from openfuelservice.server.db_import.countries.country_grid import CountryGrid, NO_COUNTRY, BORDER_CELL
+
+country_geometries = {'AA': box(0, 0, 1, 1), 'BB': box(1, 0, 2, 1), 'CC': Point(0.5, 2.5).buffer(0.6)}
+
+
+class TestCountryGrid(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.grid = CountryGrid.build(country_geometries=country_geometries, cell_size=0.25, origin=(-1, -1),
+                                     extent=(4, 5), block_cells=4)
+
+    def test_cell_lookup(self):
+        rows, columns, values = self.grid.locate(longitudes=[0.5, 1.5, 0.5, -0.6], latitudes=[0.5, 0.5, 2.5, 3.6])
+        self.assertEqual(list(values), [0, 1, 2, NO_COUNTRY])
+        self.assertEqual((rows[0], columns[0]), (6, 6))
+
+    def test_border_cells(self):
+        # The cells on both sides of a shared border and the cells just outside of an outer border are border cells
+        rows, columns, values = self.grid.locate(longitudes=[0.9, 1.1, 0.5, -0.1, 0.5, 0.5],
+                                                 latitudes=[0.5, 0.5, 1.1, 0.5, 3.05, 0.9])
+        self.assertEqual(list(values), [BORDER_CELL] * 5 + [0])
+
+    def test_outside_of_grid(self):
+        rows, columns, values = self.grid.locate(longitudes=numpy.array([-5.0, 10.0, 0.5]),
+                                                 latitudes=numpy.array([0.5, 0.5, -3.0]))
+        self.assertEqual(list(values), [NO_COUNTRY] * 3)
+
+    def test_cells_match_geometries(self):
+        geometries = list(country_geometries.values())
+        for row in range(self.grid.cells.shape[0]):
+            for column in range(self.grid.cells.shape[1]):
+                cell = box(-1 + column * 0.25, -1 + row * 0.25, -1 + (column + 1) * 0.25, -1 + (row + 1) * 0.25)
+                value = self.grid.cells[row, column]
+                touching = [index for index, geometry in enumerate(geometries) if geometry.intersects(cell)]
+                if value == NO_COUNTRY:
+                    self.assertEqual(touching, [])
+                elif value == BORDER_CELL:
+                    self.assertFalse(len(touching) == 1 and geometries[touching[0]].contains(cell))
+                    self.assertGreater(len(touching), 0)
+                else:
+                    self.assertEqual(touching, [value])
+                    self.assertTrue(geometries[value].contains(cell))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder).joinpath('country_grid.npz')
+            self.assertIsNone(CountryGrid.load(path=path))
+            self.grid.save(path=path)
+            grid = CountryGrid.load(path=path)
+        self.assertTrue(numpy.array_equal(grid.cells, self.grid.cells))
+        self.assertEqual(grid.country_codes, ['AA', 'BB', 'CC'])
+        self.assertEqual((grid.origin, grid.cell_size), ((-1.0, -1.0), 0.25))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from geoalchemy2.shape import from_shape
+from shapely.geometry import box, LineString
+
+from openfuelservice.benchmark.micro import build_country_price, route_splitting
+from openfuelservice.server.base_calculations import use_data_provider
+from openfuelservice.server.base_calculations.country_index import CountryIndexCache, get_country_index
+from openfuelservice.server.base_calculations.data_provider import MemoryDataProvider, get_data_provider
+from openfuelservice.server.base_calculations.objects import CountryLinePrice, parse_price_model
+from openfuelservice.server.base_calculations.route_cache import RouteCache
+from openfuelservice.server.db_import.countries.country_grid import CountryGrid
+from openfuelservice.server.utils.misc.geometries import true_linestring_length
+
+# CC is part of the country grid, but has no prices
+country_geometries = {'AA': box(0, 0, 1, 1), 'BB': box(1, 0, 2, 1), 'CC': box(0, 1, 1, 2)}
+price_date = date(2018, 6, 4)
+
+
+def fixture_price(euro_ttc: float) -> dict:
+    return dict(euro_ht=euro_ttc * 0.8, euro_ttc=euro_ttc, euro_quantity=1.0, diesel_ht=1.0, diesel_ttc=1.25,
+                diesel_quantity=1.0, euro_unit='euro/1000L', diesel_unit='euro/1000L', taux=1.0)
+
+
+def fixture_country_price(country_alpha_2: str, euro_ttc: float):
+    return build_country_price(price_date=price_date, price=fixture_price(euro_ttc=euro_ttc),
+                               country_alpha_2=country_alpha_2,
+                               geom=from_shape(country_geometries[country_alpha_2], srid=4326))
+
+
+def build_provider() -> MemoryDataProvider:
+    return MemoryDataProvider(
+        country_prices=[fixture_country_price('AA', euro_ttc=1.5), fixture_country_price('BB', euro_ttc=1.6)],
+        general_price=build_country_price(price_date=price_date, price=fixture_price(euro_ttc=1.4)),
+        data_versions={'countries': 1, 'prices': 1, 'statistics': 1, 'cars': 1},
+        country_grid=CountryGrid.build(country_geometries=country_geometries, cell_size=0.25, origin=(-1, -1),
+                                       extent=(4, 4), block_cells=4))
+
+
+class TestCountryIndexVersions(unittest.TestCase):
+    def setUp(self):
+        self.previous_provider = get_data_provider()
+        self.provider = build_provider()
+        use_data_provider(self.provider)
+
+    def tearDown(self):
+        use_data_provider(self.previous_provider)
+
+    def test_version_bump_rebuilds_the_index(self):
+        country_index_cache = CountryIndexCache(check_interval=0)
+        country_index = country_index_cache.get()
+        self.assertIs(country_index_cache.get(), country_index)
+        self.provider.versions['countries'] = 2
+        rebuilt_index = country_index_cache.get()
+        self.assertIsNot(rebuilt_index, country_index)
+        self.assertIs(country_index_cache.get(), rebuilt_index)
+        # Data sets the index isn't built from keep it
+        self.provider.versions['statistics'] = 2
+        self.assertIs(country_index_cache.get(), rebuilt_index)
+
+    def test_versions_are_checked_per_interval(self):
+        country_index_cache = CountryIndexCache(check_interval=3600)
+        country_index = country_index_cache.get()
+        self.provider.versions['prices'] = 2
+        self.assertIs(country_index_cache.get(), country_index)
+        country_index_cache.clear()
+        self.assertIsNot(country_index_cache.get(), country_index)
+
+    def test_route_cache_drops_the_index(self):
+        country_index_cache = CountryIndexCache(check_interval=3600)
+        route_cache = RouteCache(max_size=4, check_interval=0)
+        route_cache.get_data_versions()
+        self.provider.versions['prices'] = 2
+        with mock.patch('openfuelservice.server.base_calculations.country_index.country_index_cache',
+                        country_index_cache):
+            country_index = country_index_cache.get()
+            # Routes cached under the new versions are priced with a rebuilt index
+            route_cache.get_data_versions()
+            self.assertIsNot(country_index_cache.get(), country_index)
+
+    def test_refreshed_latest_prices_are_used(self):
+        country_index_cache = CountryIndexCache(check_interval=0)
+        route = LineString([(0.2, 0.5), (0.8, 0.5)])
+        with mock.patch('openfuelservice.server.base_calculations.country_index.country_index_cache',
+                        country_index_cache), route_splitting('index'):
+            line_price, = parse_price_model(line_string=route)
+            self.assertAlmostEqual(float(line_price.country_price.euro_ttc), 1.5)
+            # An eurostat import refreshes the latest prices and bumps the prices version
+            self.provider.country_prices[0] = fixture_country_price('AA', euro_ttc=1.7)
+            self.provider.versions['prices'] = 2
+            line_price, = parse_price_model(line_string=route)
+            self.assertAlmostEqual(float(line_price.country_price.euro_ttc), 1.7)
+
+
+class TestSplitLinestring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.previous_provider = get_data_provider()
+        use_data_provider(build_provider())
+        cls.country_index = get_country_index()
+
+    @classmethod
+    def tearDownClass(cls):
+        use_data_provider(cls.previous_provider)
+
+    @staticmethod
+    def split_lengths(route: LineString, splitting: str) -> dict:
+        """
+        :return: Returns the length in meters per country and of the general price parts
+        """
+        lengths = {}
+        with route_splitting(splitting):
+            for line_price in parse_price_model(line_string=route):
+                name = line_price.country_price.country_alpha_2 if isinstance(line_price, CountryLinePrice) else None
+                lengths[name] = lengths.get(name, 0) + line_price.get_length_m()
+        return lengths
+
+    def assert_python_splitting(self, route: LineString) -> dict:
+        lengths = self.split_lengths(route=route, splitting='index')
+        expected = self.split_lengths(route=route, splitting='python')
+        self.assertEqual(sorted(lengths, key=str), sorted(expected, key=str))
+        for name in expected:
+            self.assertAlmostEqual(lengths[name], expected[name], places=3)
+        self.assertAlmostEqual(sum(lengths.values()), true_linestring_length(route), places=3)
+        return lengths
+
+    def test_inside_one_country(self):
+        route = LineString([(0.2, 0.5), (0.5, 0.4), (0.7, 0.6)])
+        country_parts, remaining = self.country_index.split_linestring(line_string=route)
+        self.assertEqual([country_price.country_alpha_2 for country_price, _ in country_parts], ['AA'])
+        self.assertTrue(remaining.is_empty)
+        self.assertEqual(list(self.assert_python_splitting(route=route)), ['AA'])
+
+    def test_border_crossing(self):
+        route = LineString([(0.3, 0.3), (0.6, 0.4), (1.4, 0.6), (1.7, 0.7)])
+        self.assertEqual(self.country_index.locate_segments(coordinates=list(route.coords)), ['AA', None, 'BB'])
+        lengths = self.assert_python_splitting(route=route)
+        self.assertEqual(sorted(lengths), ['AA', 'BB'])
+
+    def test_border_cell(self):
+        # The segments between (0.75, y) and (1.0, y) are in cells touching the border of AA and BB
+        route = LineString([(0.3, 0.3), (0.6, 0.3), (0.8, 0.3), (0.9, 0.6), (0.95, 0.7)])
+        self.assertEqual(self.country_index.locate_segments(coordinates=list(route.coords)),
+                         ['AA', None, None, None])
+        self.assertEqual(list(self.assert_python_splitting(route=route)), ['AA'])
+
+    def test_country_without_prices(self):
+        # The part in CC is priced with the general price, also where the grid assigns it to CC
+        route = LineString([(0.5, 0.5), (0.5, 0.7), (0.5, 1.5), (0.5, 1.7)])
+        self.assertEqual(self.country_index.locate_segments(coordinates=list(route.coords)), ['AA', None, 'CC'])
+        lengths = self.assert_python_splitting(route=route)
+        self.assertEqual(sorted(lengths, key=str), sorted(['AA', None], key=str))
+        self.assertAlmostEqual(lengths[None], true_linestring_length(LineString([(0.5, 1.0), (0.5, 1.7)])), places=3)
+
+    def test_outside_of_all_countries(self):
+        route = LineString([(-0.5, -0.5), (-0.2, -0.8)])
+        country_parts, remaining = self.country_index.split_linestring(line_string=route)
+        self.assertEqual(country_parts, [])
+        self.assertEqual(list(self.assert_python_splitting(route=route)), [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy
+from scipy.interpolate import interp1d
+
+from openfuelservice.server.base_calculations.data_provider import EnvirocarStatisticRow, MemoryDataProvider, \
+    get_data_provider, set_data_provider
+from openfuelservice.server.base_calculations.envirocar import build_ec_category_models, distinct_speeds, \
+    fit_quadratic
+
+
+def statistic_rows(category_short_eu: str, speeds: (float, float), consumptions: (float, float, float),
+                   co2: (float, float, float)) -> [EnvirocarStatisticRow]:
+    rows = []
+    for phenomenon_name, (minimum, average, maximum) in [('Speed', (0,) + tuple(speeds)),
+                                                         ('Consumption', consumptions), ('CO2', co2)]:
+        rows.append(EnvirocarStatisticRow(category_short_eu=category_short_eu, fuel_type='gasoline',
+                                          phenomenon_name=phenomenon_name, min=minimum, average=average, max=maximum,
+                                          measurements=100, numb_sensors=5, unit='l/h'))
+    return rows
+
+
+class TestFitQuadratic(unittest.TestCase):
+    def test_matches_quadratic_interp1d(self):
+        random = numpy.random.RandomState(42)
+        for _ in range(200):
+            speed_average = random.uniform(10, 80)
+            speeds = [0.0, speed_average, random.uniform(speed_average + 5, 200)]
+            values = list(random.uniform(0.5, 20, 3))
+            curve = interp1d(speeds, values, kind='quadratic', fill_value='extrapolate')
+            # The fuel models are also evaluated above the maximum speed
+            kmh = numpy.linspace(1, 1.5 * speeds[2], 50)
+            expected = curve(kmh)
+            relative_difference = numpy.abs(numpy.polyval(fit_quadratic(speeds=speeds, values=values), kmh) -
+                                            expected) / numpy.abs(expected)
+            self.assertLess(relative_difference.max(), 1e-10)
+
+    def test_passes_through_the_points(self):
+        coefficients = fit_quadratic(speeds=[0.0, 60.0, 130.0], values=[3.0, 8.0, 14.0])
+        self.assertTrue(numpy.allclose(numpy.polyval(coefficients, [0.0, 60.0, 130.0]), [3.0, 8.0, 14.0]))
+
+
+class TestDistinctSpeeds(unittest.TestCase):
+    def setUp(self):
+        self.previous_provider = get_data_provider()
+
+    def tearDown(self):
+        set_data_provider(self.previous_provider)
+
+    def test_distinct_speeds(self):
+        self.assertTrue(distinct_speeds(statistic_rows('a', speeds=(60, 130), consumptions=(3, 8, 14),
+                                                       co2=(10, 30, 60))))
+        for speeds in [(60, 60), (0, 130), (0, 0)]:
+            self.assertFalse(distinct_speeds(statistic_rows('a', speeds=speeds, consumptions=(3, 8, 14),
+                                                            co2=(10, 30, 60))))
+        # Without speeds there is nothing to fit
+        self.assertFalse(distinct_speeds(statistic_rows('a', speeds=(60, 130), consumptions=(3, 8, 14),
+                                                        co2=(10, 30, 60))[1:]))
+
+    def test_categories_without_distinct_speeds_are_skipped(self):
+        rows = statistic_rows('a', speeds=(60, 130), consumptions=(3, 8, 14), co2=(10, 30, 60)) + statistic_rows(
+            'b', speeds=(60, 60), consumptions=(3, 8, 14), co2=(10, 30, 60)) + statistic_rows(
+            'c', speeds=(0, 130), consumptions=(3, 8, 14), co2=(10, 30, 60))
+        set_data_provider(MemoryDataProvider(country_prices=[], general_price=None, ec_statistics=rows))
+        keys = [('ec', 'gasoline', category, None) for category in ['a', 'b', 'c']]
+        fuel_models = build_ec_category_models(keys=keys)
+        self.assertEqual(len(fuel_models[keys[0]]['a']), 1)
+        self.assertEqual(fuel_models[keys[1]]['b'], [])
+        self.assertEqual(fuel_models[keys[2]]['c'], [])
+        # The parabola of the skipped speeds is undefined
+        with self.assertRaises(ZeroDivisionError):
+            fit_quadratic(speeds=[0.0, 60.0, 60.0], values=[3.0, 8.0, 14.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
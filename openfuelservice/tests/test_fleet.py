@@ -0,0 +1,76 @@
+import unittest
+
+from openfuelservice.benchmark.micro import build_memory_provider, build_micro_route
+from openfuelservice.server.base_calculations import use_data_provider
+from openfuelservice.server.base_calculations.cfd import DistanceCalculation, parse_cfd_id_model
+from openfuelservice.server.base_calculations.data_provider import get_data_provider
+from openfuelservice.server.objects import Filters
+
+fleet_size = 3
+
+
+class TestFleetCost(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.previous_provider = get_data_provider()
+        cls.provider = build_memory_provider(seed=42)
+        use_data_provider(cls.provider)
+        cls.route = build_micro_route(vertices=60, countries=4)
+        gasoline_cars = [cfd_car for cfd_car in cls.provider.cfd_cars.values() if cfd_car.fuel_type == 'gasoline']
+        diesel_cars = [cfd_car for cfd_car in cls.provider.cfd_cars.values() if cfd_car.fuel_type == 'diesel']
+        # A mixed fleet, every car is priced with its own fuel type
+        cls.cfd_ids = [cfd_car.hash_id for cfd_car in gasoline_cars[:fleet_size] + diesel_cars[:fleet_size]]
+        cls.filters = Filters(filters={'data_source': 'cfd', 'fuel_type': 'gasoline', 'vehicle_type': 'car',
+                                       'cfd_ids': cls.cfd_ids, 'fleet': 'true'})
+        cls.fuel_models = parse_cfd_id_model(filters=cls.filters)
+        cls.fleet_result = DistanceCalculation(geom=cls.route, filters=cls.filters,
+                                               fuel_models=cls.fuel_models).calculate_fleet_cost()
+
+    @classmethod
+    def tearDownClass(cls):
+        use_data_provider(cls.previous_provider)
+
+    def individual_result(self, fuel_model) -> dict:
+        """
+        :return: Returns the result of the single car calculation with the fuel type of the car
+        """
+        filters = Filters(filters={'data_source': 'cfd', 'fuel_type': fuel_model.fuel_type, 'vehicle_type': 'car',
+                                   'cfd_ids': [fuel_model.cfd_car_model.hash_id]})
+        calculation = DistanceCalculation(geom=self.route, filters=filters, fuel_models=[fuel_model])
+        return calculation.calculate_individual_cfd_cost()['individual']
+
+    def test_mixed_fleet(self):
+        self.assertEqual(sorted(set(fuel_model.fuel_type for fuel_model in self.fuel_models)), ['diesel', 'gasoline'])
+        self.assertEqual(self.fleet_result['fleet']['cfd_cars'], 2 * fleet_size)
+        self.assertEqual(self.fleet_result['fleet']['calculated_cars'], 2 * fleet_size)
+
+    def test_vehicles_match_individual_cost(self):
+        vehicles = self.fleet_result['vehicles']
+        self.assertEqual([vehicle['cfd_id'] for vehicle in vehicles],
+                         [fuel_model.cfd_car_model.hash_id for fuel_model in self.fuel_models])
+        for vehicle, fuel_model in zip(vehicles, self.fuel_models):
+            individual = self.individual_result(fuel_model=fuel_model)
+            self.assertEqual(vehicle['car_info']['calculation_errors'],
+                             individual['category_info']['calculation_errors'])
+            self.assertEqual(vehicle['car_info']['fuel_type'], fuel_model.fuel_type)
+            for group in ['total_emissions', 'total_consumption', 'total_cost', 'fuel_factors']:
+                for name, value in individual[group].items():
+                    if name == 'price_date':
+                        self.assertEqual(vehicle[group][name], value)
+                    else:
+                        self.assertAlmostEqual(vehicle[group][name], value, places=6, msg='{} {}'.format(group, name))
+
+    def test_fleet_totals(self):
+        individuals = [self.individual_result(fuel_model=fuel_model) for fuel_model in self.fuel_models]
+        fleet = self.fleet_result['fleet']
+        for group, name in [('total_emissions', 'co2_kg'), ('total_emissions', 'co_g'), ('total_emissions', 'nox_g'),
+                            ('total_emissions', 'thc_g'), ('total_consumption', 'liters'),
+                            ('total_cost', 'w_tax_euro'), ('total_cost', 'wo_tax_euro')]:
+            # The individual results are rounded per car, the totals of the fleet only once
+            self.assertAlmostEqual(fleet[group][name], sum(individual[group][name] for individual in individuals),
+                                   delta=0.005 * len(individuals), msg='{} {}'.format(group, name))
+        self.assertAlmostEqual(fleet['route']['km'], individuals[0]['route']['km'], places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
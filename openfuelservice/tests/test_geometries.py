@@ -0,0 +1,53 @@
+import unittest
+
+import numpy
+import pyproj
+from shapely.geometry import LineString, MultiLineString, Point, GeometryCollection
+
+from openfuelservice.server.utils.misc.geometries import segment_lengths, true_linestring_length
+
+route_coordinates = [(8.6821, 49.4122), (8.6901, 49.4187), (9.1829, 48.7758), (13.4050, 52.5200), (2.3522, 48.8566),
+                     (-0.1276, 51.5072), (-0.1276, 51.5072)]
+
+
+class TestGeodesicLength(unittest.TestCase):
+    geod = pyproj.Geod(ellps='WGS84')
+
+    def scalar_length(self, coordinates: list) -> [float]:
+        lengths = []
+        for (lon_1, lat_1), (lon_2, lat_2) in zip(coordinates[:-1], coordinates[1:]):
+            _, _, distance = self.geod.inv(lon_1, lat_1, lon_2, lat_2)
+            lengths.append(distance)
+        return lengths
+
+    def test_segment_lengths(self):
+        lengths = segment_lengths(route_coordinates)
+        self.assertEqual(len(lengths), len(route_coordinates) - 1)
+        for length, expected in zip(lengths, self.scalar_length(route_coordinates)):
+            self.assertAlmostEqual(length, expected, places=6)
+        # Repeated vertices have no length
+        self.assertEqual(lengths[-1], 0)
+
+    def test_equator_degree(self):
+        self.assertAlmostEqual(float(segment_lengths([(0, 0), (1, 0)])[0]), 111319.4908, places=3)
+
+    def test_further_dimensions_are_ignored(self):
+        coordinates = [(lon, lat, 100 * index) for index, (lon, lat) in enumerate(route_coordinates)]
+        self.assertTrue(numpy.allclose(segment_lengths(coordinates), segment_lengths(route_coordinates)))
+
+    def test_too_few_vertices(self):
+        self.assertEqual(len(segment_lengths([(8.6821, 49.4122)])), 0)
+        self.assertEqual(len(segment_lengths([])), 0)
+
+    def test_true_linestring_length(self):
+        expected = sum(self.scalar_length(route_coordinates))
+        self.assertAlmostEqual(true_linestring_length(LineString(route_coordinates)), expected, places=4)
+        parts = MultiLineString([route_coordinates[:3], route_coordinates[3:]])
+        self.assertAlmostEqual(true_linestring_length(parts), sum(self.scalar_length(route_coordinates[:3])) + sum(
+            self.scalar_length(route_coordinates[3:])), places=4)
+        self.assertEqual(true_linestring_length(Point(8.6821, 49.4122)), 0.0)
+        self.assertEqual(true_linestring_length(GeometryCollection()), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
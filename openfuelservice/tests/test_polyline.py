@@ -0,0 +1,70 @@
+import unittest
+
+import numpy
+
+from openfuelservice.server import api_exceptions
+from openfuelservice.server.api.views import parse_coordinates, parse_polyline
+from openfuelservice.server.utils.misc.geometries import decode_polyline
+
+# Example of the polyline algorithm documentation
+google_polyline = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+google_coordinates = [(-120.2, 38.5), (-120.95, 40.7), (-126.453, 43.252)]
+
+
+def encode_polyline(coordinates: [(float, float)], precision: int = 5) -> str:
+    """
+    Scalar implementation of the polyline algorithm for lngLat coordinates.
+    """
+    encoded = []
+    previous = (0, 0)
+    for lon, lat in coordinates:
+        current = (int(round(lat * 10 ** precision)), int(round(lon * 10 ** precision)))
+        for value in (current[0] - previous[0], current[1] - previous[1]):
+            value = ~(value << 1) if value < 0 else value << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous = current
+    return ''.join(encoded)
+
+
+class TestPolyline(unittest.TestCase):
+    def test_documentation_example(self):
+        self.assertTrue(numpy.allclose(decode_polyline(google_polyline), google_coordinates))
+        self.assertEqual(encode_polyline(google_coordinates), google_polyline)
+
+    def test_random_routes(self):
+        random = numpy.random.RandomState(42)
+        for precision in (5, 6):
+            coordinates = numpy.round(numpy.column_stack((random.uniform(-180, 180, 200),
+                                                          random.uniform(-90, 90, 200))), precision)
+            decoded = decode_polyline(encode_polyline(coordinates, precision=precision), precision=precision)
+            self.assertTrue(numpy.allclose(decoded, coordinates, rtol=0, atol=0.5 * 10 ** -precision))
+
+    def test_invalid_polylines(self):
+        for polyline in ['', 'ab cd', '_p~iF~ps|U_ulLnnqC_mqNvxq', '_p~iF~ps|U_ulL']:
+            with self.assertRaises(ValueError):
+                decode_polyline(polyline)
+
+    def test_parse_polyline(self):
+        linestring = parse_polyline(google_polyline)
+        self.assertTrue(numpy.allclose(numpy.asarray(linestring.coords), google_coordinates))
+        with self.assertRaises(api_exceptions.InvalidUsage) as context:
+            parse_polyline('_p~iF')
+        self.assertEqual(context.exception.error['code'], 4007)
+        with self.assertRaises(api_exceptions.InvalidUsage):
+            parse_polyline('äöü')
+
+    def test_parse_coordinates(self):
+        linestring = parse_coordinates([[8.6821, 49.4122, 110.0], [8.6901, 49.4187, 120.0]])
+        self.assertEqual(linestring.geom_type, 'LineString')
+        self.assertEqual(len(linestring.coords), 2)
+        for coordinates in [[[8.6821, 49.4122]], [8.6821, 49.4122], [[8.6821, 'a'], [8.6901, 49.4187]],
+                            [[8.6821], [8.6901]]]:
+            with self.assertRaises(api_exceptions.InvalidUsage):
+                parse_coordinates(coordinates)
+
+
+if __name__ == '__main__':
+    unittest.main()
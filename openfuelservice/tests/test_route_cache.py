@@ -0,0 +1,119 @@
+import json
+import unittest
+
+from shapely.geometry import LineString
+
+from openfuelservice.benchmark.micro import build_filters, build_memory_provider, build_micro_route, \
+    micro_categories
+from openfuelservice.server.base_calculations import calculate_route, iterate_routes, serialize_route, \
+    use_data_provider
+from openfuelservice.server.base_calculations.route_cache import route_cache
+from openfuelservice.server.base_calculations.data_provider import MemoryDataProvider, get_data_provider, \
+    set_data_provider
+from openfuelservice.server.base_calculations.route_cache import RouteCache
+from openfuelservice.server.objects import Filters
+
+route_geometry = LineString([(8.6821, 49.4122), (8.6901, 49.4187), (8.7011, 49.4203)])
+route_filters = Filters(filters={'data_source': 'cfd', 'fuel_type': 'gasoline', 'vehicle_categories': ['a']})
+
+
+class TestRouteCache(unittest.TestCase):
+    def setUp(self):
+        self.previous_provider = get_data_provider()
+        self.provider = MemoryDataProvider(country_prices=[], general_price=None,
+                                           data_versions={'countries': 1, 'prices': 1, 'statistics': 1, 'cars': 1})
+        set_data_provider(self.provider)
+
+    def tearDown(self):
+        set_data_provider(self.previous_provider)
+
+    def test_lru_eviction_order(self):
+        route_cache = RouteCache(max_size=2)
+        route_cache.put('a', {'a': 1})
+        route_cache.put('b', {'b': 2})
+        # The hit makes b the oldest route
+        self.assertEqual(route_cache.get('a'), {'a': 1})
+        route_cache.put('c', {'c': 3})
+        self.assertIsNone(route_cache.get('b'))
+        self.assertEqual(route_cache.get('a'), {'a': 1})
+        self.assertEqual(route_cache.get('c'), {'c': 3})
+        self.assertEqual(route_cache.statistics()['size'], 2)
+
+    def test_hit_and_miss_counters(self):
+        route_cache = RouteCache(max_size=4)
+        key = route_cache.key(geom=route_geometry, filters=route_filters, data_source='cfd')
+        self.assertIsNone(route_cache.get(key))
+        route_cache.put(key, {'general': {}})
+        route_cache.get(key)
+        route_cache.get(key)
+        statistics = route_cache.statistics()
+        self.assertEqual((statistics['hits'], statistics['misses'], statistics['size']), (2, 1, 1))
+
+    def test_data_versions_in_key(self):
+        route_cache = RouteCache(max_size=4, check_interval=3600)
+        key = route_cache.key(geom=route_geometry, filters=route_filters, data_source='cfd')
+        route_cache.put(key, {'general': {}})
+        self.provider.versions['prices'] = 2
+        # The versions are only checked again after the check interval or a clear
+        self.assertEqual(route_cache.key(geom=route_geometry, filters=route_filters, data_source='cfd'), key)
+        route_cache.clear()
+        new_key = route_cache.key(geom=route_geometry, filters=route_filters, data_source='cfd')
+        self.assertNotEqual(new_key, key)
+        self.assertEqual(new_key[:2], key[:2])
+        self.assertIsNone(route_cache.get(new_key))
+
+    def test_key_ignores_request_id_and_coordinate_noise(self):
+        route_cache = RouteCache(max_size=4)
+        noisy_geometry = LineString([(x + 1e-9, y - 1e-9) for x, y in route_geometry.coords])
+        request_filters = Filters(filters={'data_source': 'cfd', 'fuel_type': 'gasoline', 'vehicle_categories': ['a'],
+                                           'request_id': 'test123'})
+        self.assertEqual(route_cache.key(geom=noisy_geometry, filters=request_filters, data_source='cfd'),
+                         route_cache.key(geom=route_geometry, filters=route_filters, data_source='cfd'))
+
+    def test_serialized_request_id(self):
+        route = {'general': {'fuel_type': 'gasoline'}, 'fuel_stats': {'a': {'total_cost': {'w_tax_euro': 1.5}}},
+                 'attributions': {'price_data_attribution': 'eurostat'}}
+        for request_id in ['test "123"', 123, None]:
+            serialized_route = json.loads(serialize_route(route=route, request_id=request_id))
+            if request_id is None:
+                self.assertEqual(serialized_route, route)
+            else:
+                self.assertEqual(serialized_route, dict(route, request_id=request_id))
+        # The cached route keeps no request id
+        self.assertNotIn('request_id', route)
+        self.assertEqual(serialize_route(route=None, request_id='test123'), 'null')
+
+
+class TestCachedRoutes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.previous_provider = get_data_provider()
+        cls.provider = build_memory_provider(seed=42)
+        use_data_provider(cls.provider)
+        cls.route = build_micro_route(vertices=20, countries=2)
+        cls.filters = build_filters(data_source='cfd', categories=micro_categories(2), provider=cls.provider)
+
+    @classmethod
+    def tearDownClass(cls):
+        use_data_provider(cls.previous_provider)
+
+    def setUp(self):
+        route_cache.clear()
+
+    def test_request_ids_of_cache_hits(self):
+        first = json.loads(calculate_route(geom=self.route, filters=self.filters, request_id='first'))
+        hits = route_cache.statistics()['hits']
+        second = json.loads(calculate_route(geom=self.route, filters=self.filters, request_id='second'))
+        self.assertEqual(route_cache.statistics()['hits'], hits + 1)
+        self.assertEqual((first.pop('request_id'), second.pop('request_id')), ('first', 'second'))
+        self.assertEqual(first, second)
+        self.assertNotIn('request_id', json.loads(calculate_route(geom=self.route, filters=self.filters)))
+
+    def test_request_ids_of_batches(self):
+        routes = [json.loads(route) for route in iterate_routes(geoms=[self.route, self.route, self.route],
+                                                                filters=self.filters, request_ids=['a', None, 7])]
+        self.assertEqual([route.get('request_id') for route in routes], ['a', None, 7])
+        self.assertEqual(route_cache.statistics()['size'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
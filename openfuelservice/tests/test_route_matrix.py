@@ -0,0 +1,109 @@
+import math
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy
+from shapely.geometry import LineString
+
+from openfuelservice.server.base_calculations.objects import CountryLinePrice
+from openfuelservice.server.base_calculations.route_matrix import RouteCostMatrix, sequential_sum
+
+
+def country_line_prices(seed: int, segments: int) -> [CountryLinePrice]:
+    random = numpy.random.RandomState(seed)
+    price_models = []
+    for segment in range(segments):
+        country_price = SimpleNamespace(euro_ttc=random.uniform(1.2, 1.9), euro_ht=random.uniform(0.6, 1.1),
+                                        diesel_ttc=random.uniform(1.1, 1.8), diesel_ht=random.uniform(0.5, 1.0),
+                                        date=datetime(2018, 1, 1 + segment))
+        price_models.append(CountryLinePrice(linestring=LineString([(0, 0), (1, 1)]), country_price=country_price,
+                                             length_m=random.uniform(100, 250000)))
+    return price_models
+
+
+def scalar_costs(price_models: [CountryLinePrice], liters: [float], fuel_type: str, tank_size: int,
+                 refuel_rounding: str) -> (float, float, float):
+    """
+    The per segment refuel loop the route calculations used before RouteCostMatrix.
+    """
+    cost_tax, cost_wo_tax, total_liters = 0, 0, 0
+    previous_price_model = None
+    remaining_fuel: float = 0
+    for price_model, segment_liters in zip(price_models, liters):
+        if previous_price_model is None:
+            previous_price_model = price_model
+        if remaining_fuel > 0:
+            price_calculation = previous_price_model.calculate_cost(liter=remaining_fuel, fuel_type=fuel_type)
+            previous_price_model = price_model
+            cost_tax += price_calculation.fuel_cost_tax
+            cost_wo_tax += price_calculation.fuel_cost_wo_tax
+        total_liters += segment_liters
+        result_fuel_liter_total = segment_liters
+        if remaining_fuel > 0:
+            result_fuel_liter_total -= remaining_fuel
+            remaining_fuel = 0
+        needed_refueling_theory = result_fuel_liter_total / tank_size
+        if refuel_rounding == 'ceil':
+            needed_refueling_actual = math.ceil(needed_refueling_theory)
+            if tank_size * needed_refueling_actual - result_fuel_liter_total > 0:
+                remaining_fuel = tank_size * needed_refueling_actual - result_fuel_liter_total
+        else:
+            needed_refueling_actual = round(needed_refueling_theory, 5)
+            if tank_size * needed_refueling_actual - segment_liters > 0:
+                remaining_fuel = tank_size * needed_refueling_actual - segment_liters
+        price_calculation = price_model.calculate_cost(liter=result_fuel_liter_total, fuel_type=fuel_type)
+        cost_tax += price_calculation.fuel_cost_tax
+        cost_wo_tax += price_calculation.fuel_cost_wo_tax
+    return cost_tax, cost_wo_tax, total_liters
+
+
+class TestRouteCostMatrix(unittest.TestCase):
+    fuel_types = ['gasoline', 'diesel', 'gasoline', 'diesel']
+    tank_sizes = [40, 55, 70, 60]
+
+    def assert_scalar_equivalence(self, refuel_rounding: str, seed: int, segments: int):
+        price_models = country_line_prices(seed=seed, segments=segments)
+        cost_matrix = RouteCostMatrix(price_models=price_models)
+        random = numpy.random.RandomState(seed)
+        liter_per_km = random.uniform(0.04, 0.12, size=(len(self.fuel_types), 1))
+        liters = liter_per_km * cost_matrix.length_m / 1000
+        cost_tax, cost_wo_tax, total_liters = cost_matrix.calculate_costs(
+            liters=liters, fuel_types=self.fuel_types, tank_sizes=self.tank_sizes, refuel_rounding=refuel_rounding)
+        for row, fuel_type in enumerate(self.fuel_types):
+            expected = scalar_costs(price_models=price_models, liters=list(liters[row]), fuel_type=fuel_type,
+                                    tank_size=self.tank_sizes[row], refuel_rounding=refuel_rounding)
+            self.assertAlmostEqual(cost_tax[row], expected[0], places=9)
+            self.assertAlmostEqual(cost_wo_tax[row], expected[1], places=9)
+            self.assertAlmostEqual(total_liters[row], expected[2], places=9)
+
+    def test_envirocar_refuel_rounding(self):
+        for seed in range(5):
+            self.assert_scalar_equivalence(refuel_rounding='ceil', seed=seed, segments=12)
+
+    def test_carfueldata_refuel_rounding(self):
+        for seed in range(5):
+            self.assert_scalar_equivalence(refuel_rounding='round', seed=seed, segments=12)
+
+    def test_single_segment(self):
+        self.assert_scalar_equivalence(refuel_rounding='ceil', seed=7, segments=1)
+
+    def test_route_summary(self):
+        price_models = country_line_prices(seed=3, segments=4)
+        cost_matrix = RouteCostMatrix(price_models=price_models)
+        self.assertEqual(cost_matrix.segment_count, 4)
+        self.assertAlmostEqual(cost_matrix.total_km, sum(model.get_length_m() for model in price_models) / 1000)
+        self.assertEqual(cost_matrix.cost_date, price_models[-1].get_cost_date())
+
+    def test_sequential_sum(self):
+        matrix = numpy.random.RandomState(1).uniform(0, 1000, size=(3, 20))
+        for row in range(3):
+            expected = 0
+            for value in matrix[row]:
+                expected += value
+            self.assertEqual(sequential_sum(matrix)[row], expected)
+        self.assertEqual(list(sequential_sum(numpy.zeros((2, 0)))), [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy
+
+from openfuelservice.benchmark.micro import build_memory_provider, build_micro_route
+from openfuelservice.server.base_calculations import queries
+from openfuelservice.server.base_calculations.data_provider import CatalogueSnapshotRow, MappedDataProvider, \
+    SnapshotDataProvider, text_array, write_reference_snapshot
+from openfuelservice.server.utils.misc.snapshot_file import SnapshotFile, blob_arrays, write_snapshot_file
+
+
+class TestSnapshotFile(unittest.TestCase):
+    def test_round_trip(self):
+        arrays = {'values': numpy.arange(10, dtype=float), 'cells': numpy.arange(12, dtype=numpy.int16).reshape(3, 4),
+                  'codes': text_array(['DE', 'FR', 'Österreich']), 'empty': numpy.zeros(0)}
+        arrays.update(blob_arrays('geom', [b'\x01\x02', b'', b'\x03']))
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder).joinpath('test.snapshot')
+            write_snapshot_file(path=path, arrays=dict(arrays), meta={'data_versions': {'prices': 3}})
+            self.assertEqual(stat.S_IMODE(os.stat(path.as_posix()).st_mode), 0o644)
+            self.assertEqual(os.listdir(folder), ['test.snapshot'])
+            snapshot_file = SnapshotFile(path)
+            self.assertEqual(snapshot_file.meta, {'data_versions': {'prices': 3}})
+            self.assertTrue(numpy.array_equal(snapshot_file.array('values'), arrays['values']))
+            self.assertTrue(numpy.array_equal(snapshot_file.array('cells'), arrays['cells']))
+            self.assertEqual(snapshot_file.array('empty').shape, (0,))
+            self.assertEqual(snapshot_file.strings('codes'), ['DE', 'FR', 'Österreich'])
+            self.assertEqual(snapshot_file.blobs('geom'), [b'\x01\x02', b'', b'\x03'])
+            self.assertEqual(snapshot_file.blob('geom', 2), b'\x03')
+            # The arrays are read-only views on the mapping
+            self.assertFalse(snapshot_file.array('values').flags.writeable)
+
+    def test_object_arrays(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder).joinpath('test.snapshot')
+            with self.assertRaises(ValueError):
+                write_snapshot_file(path=path, arrays={'objects': numpy.array([{}, None])}, meta={})
+            self.assertEqual(os.listdir(folder), [])
+
+    def test_foreign_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder).joinpath('test.snapshot')
+            path.write_bytes(b'PK\x03\x04' + bytes(64))
+            with self.assertRaises(ValueError):
+                SnapshotFile(path)
+
+
+class TestReferenceSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.provider = build_memory_provider(seed=42)
+        cls.provider.catalogue = [CatalogueSnapshotRow(name='categories', payload=b'{"categories": {}}',
+                                                       payload_gzip=b'\x1f\x8b', etag='abc')]
+
+    def write(self, path: Path):
+        # The cars and the categories are the only data read from the database directly
+        with mock.patch.object(queries, 'query_all_cfd_models', return_value=list(self.provider.cfd_cars.values())), \
+                mock.patch.object(queries, 'query_car_categories',
+                                  return_value=list(self.provider.categories.values())):
+            write_reference_snapshot(path=path, provider=self.provider)
+
+    def test_write_and_map(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder).joinpath('reference.snapshot')
+            self.write(path=path)
+            snapshot_provider = SnapshotDataProvider(path=path, check_interval=0)
+            mapped = snapshot_provider.source()
+            self.assertIsInstance(mapped, MappedDataProvider)
+            self.assertTrue(snapshot_provider.offline)
+
+            self.assertEqual([price.country_alpha_2 for price in mapped.latest_country_prices()],
+                             [price.country_alpha_2 for price in self.provider.latest_country_prices()])
+            self.assertAlmostEqual(float(mapped.general_price().euro_ttc),
+                                   float(self.provider.general_price().euro_ttc))
+            for fuel_type in ['gasoline', 'diesel']:
+                self.assertEqual(len(mapped.ec_category_statistics(fuel_type=fuel_type, categories=['a', 'b'])),
+                                 len(self.provider.ec_category_statistics(fuel_type=fuel_type, categories=['a', 'b'])))
+                self.assertEqual(len(mapped.cfd_category_statistics(fuel_type=fuel_type)),
+                                 len(self.provider.cfd_category_statistics(fuel_type=fuel_type)))
+            cfd_ids = list(self.provider.cfd_cars)[:3] + ['unknown']
+            cfd_cars = mapped.cfd_models(cfd_ids=cfd_ids)
+            self.assertEqual([cfd_car.hash_id for cfd_car in cfd_cars], cfd_ids[:3])
+            self.assertEqual(mapped.categories_of_cars(cfd_cars=cfd_cars),
+                             self.provider.categories_of_cars(cfd_cars=cfd_cars))
+            self.assertEqual(mapped.category('a').category_name_en, self.provider.category('a').category_name_en)
+            self.assertEqual(mapped.catalogue_snapshots(), self.provider.catalogue)
+            self.assertTrue(numpy.array_equal(mapped.country_grid().cells, self.provider.country_grid().cells))
+            route = build_micro_route(vertices=100, countries=4)
+            self.assertAlmostEqual(mapped.route_parts_by_linestring(route)[1],
+                                   self.provider.route_parts_by_linestring(route)[1], places=3)
+
+    def test_replaced_snapshot(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder).joinpath('reference.snapshot')
+            self.write(path=path)
+            snapshot_provider = SnapshotDataProvider(path=path, check_interval=0)
+            previous = snapshot_provider.source()
+            previous_version = previous.data_version('prices')
+            self.provider.versions['prices'] = previous_version + 1
+            try:
+                self.write(path=path)
+            finally:
+                self.provider.versions['prices'] = previous_version
+            current = snapshot_provider.source()
+            self.assertIsNot(current, previous)
+            self.assertEqual(current.data_version('prices'), previous_version + 1)
+            # Requests that hold the previous mapping keep reading it
+            self.assertEqual(previous.data_version('prices'), previous_version)
+
+    def test_missing_snapshot(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder).joinpath('reference.snapshot')
+            self.assertIs(SnapshotDataProvider(path=path, fallback=self.provider).source(), self.provider)
+            with self.assertRaises(FileNotFoundError):
+                SnapshotDataProvider(path=path).source()
+
+
+if __name__ == '__main__':
+    unittest.main()